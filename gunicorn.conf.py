@@ -0,0 +1,49 @@
+"""
+Gunicorn configuration for XpertsHub
+
+Serves the WSGI application with sync workers by default. With ASYNC_VIEWS=True
+the ASGI application runs under uvicorn workers so the async home, catalog and
+detail views share one event loop per worker.
+
+With METRICS_ENABLED=True each worker writes its Prometheus samples to
+PROMETHEUS_MULTIPROC_DIR, which the arbiter empties on startup, so /metrics
+reports totals across all workers whichever one serves the scrape.
+"""
+import os
+import shutil
+
+def _flag(name):
+    return os.environ.get(name, '').lower() in ('1', 'true', 'yes', 'on')
+
+ASYNC_VIEWS = _flag('ASYNC_VIEWS')
+METRICS_ENABLED = _flag('METRICS_ENABLED')
+
+if METRICS_ENABLED:
+    # Must be set before workers import prometheus_client, which picks its storage at import time
+    os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join('/tmp', f'xpertshub-metrics-{os.getpid()}'))
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', '1'))
+
+if ASYNC_VIEWS:
+    wsgi_app = 'xpertshub.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+else:
+    wsgi_app = 'xpertshub.wsgi:application'
+
+def on_starting(server):
+    if METRICS_ENABLED:
+        # Samples left by a previous run's workers would otherwise be summed in
+        metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+        os.makedirs(metrics_dir)
+
+def post_worker_init(worker):
+    if METRICS_ENABLED:
+        from xpertshub.metrics import WORKERS
+        WORKERS.set(1)
+
+def child_exit(server, worker):
+    if METRICS_ENABLED:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -2,7 +2,11 @@ from django.contrib import admin
 
 from django.contrib import admin
 from django.utils import timezone
-from .models import Service, ServiceRequest, Rating
+from django.utils.html import format_html
+from xpertshub_app.stats import invalidate_home_cache
+from .models import Service, ServiceRequest, Rating, EmailOutbox, ImageBlob, ImageUpload, recount_pending_requests
+from .images import has_derivatives, smallest_url
+from .page_cache import bump_catalog_version
 
 @admin.register(Service)
 class ServiceAdmin(admin.ModelAdmin):
@@ -29,9 +33,15 @@ class ServiceAdmin(admin.ModelAdmin):
 
     def image_preview(self, obj):
         if obj.image:
-            return f'<img src="{obj.image.url}" style="max-width: 200px; max-height: 200px; border-radius: 8px;">'
+            # The change list shows one preview per row; never send the full-size originals
+            if has_derivatives(obj.image_derivatives):
+                url = smallest_url(obj.image.storage, obj.image_derivatives)
+            else:
+                url = obj.image.url
+            return format_html(
+                '<img src="{}" style="max-width: 200px; max-height: 200px; border-radius: 8px;">', url
+            )
         return "No image"
-    image_preview.allow_tags = True
     image_preview.short_description = "Image Preview"
 
     def save_model(self, request, obj, form, change):
@@ -44,16 +54,24 @@ class ServiceAdmin(admin.ModelAdmin):
     actions = ['approve_services', 'reject_services']
 
     def approve_services(self, request, queryset):
+        company_ids = set(queryset.filter(status='pending').values_list('company_id', flat=True))
         updated = queryset.filter(status='pending').update(
             status='approved',
             approved_by=request.user,
-            date_approved=timezone.now()
+            date_approved=timezone.now(),
+            date_updated=timezone.now()
         )
+        # Queryset updates bypass model signals
+        recount_pending_requests(company_ids)
+        invalidate_home_cache()
+        bump_catalog_version()
         self.message_user(request, f'{updated} services approved successfully.')
     approve_services.short_description = "Approve selected services"
 
     def reject_services(self, request, queryset):
-        updated = queryset.filter(status='pending').update(status='rejected')
+        updated = queryset.filter(status='pending').update(status='rejected', date_updated=timezone.now())
+        invalidate_home_cache()
+        bump_catalog_version()
         self.message_user(request, f'{updated} services rejected.')
     reject_services.short_description = "Reject selected services"
 
@@ -70,3 +88,23 @@ class RatingAdmin(admin.ModelAdmin):
     list_filter = ['rating', 'date_created', 'service__field']
     search_fields = ['service__name', 'customer__username', 'review']
     readonly_fields = ['date_created']
+
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ['subject', 'to_email', 'status', 'attempts', 'next_attempt_at', 'date_created', 'date_sent']
+    list_filter = ['status', 'date_created']
+    search_fields = ['to_email', 'subject']
+    readonly_fields = ['attempts', 'last_error', 'date_created', 'date_sent']
+
+@admin.register(ImageUpload)
+class ImageUploadAdmin(admin.ModelAdmin):
+    list_display = ['original_name', 'service', 'status', 'attempts', 'next_attempt_at', 'date_created', 'date_processed']
+    list_filter = ['status', 'date_created']
+    search_fields = ['original_name', 'service__name']
+    readonly_fields = ['staged_name', 'attempts', 'last_error', 'date_created', 'date_processed']
+
+@admin.register(ImageBlob)
+class ImageBlobAdmin(admin.ModelAdmin):
+    list_display = ['name', 'size', 'ref_count', 'date_created']
+    search_fields = ['sha256', 'name']
+    readonly_fields = ['sha256', 'name', 'size', 'ref_count', 'date_created']
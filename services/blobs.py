@@ -0,0 +1,105 @@
+"""
+Content-addressed storage for service images
+
+Every image is stored once under the SHA-256 of its bytes and tracked by an
+ImageBlob row counting the services that use it. Uploading a file that is
+already stored costs a hash and a row update, not another copy or upload, and
+since a blob's URL never changes content it can be cached forever.
+"""
+import hashlib
+import posixpath
+from django.core.files.storage import default_storage
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.fields.files import ImageFieldFile
+from .images import derivative_names
+
+BLOB_DIRECTORY = 'service_images/sha256'
+
+# Read uploads in chunks this size while hashing so large files never sit in memory whole
+HASH_CHUNK_SIZE = 64 * 1024
+
+def content_hash(content):
+    """SHA-256 hex digest of a File's contents, leaving it rewound for the storage write"""
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+def blob_name(sha256, original_name):
+    extension = posixpath.splitext(original_name)[1].lower()
+    return posixpath.join(BLOB_DIRECTORY, sha256[:2], f'{sha256}{extension}')
+
+def acquire(content, original_name, storage=None):
+    """
+    Store an uploaded file once per distinct content and take a reference to it.
+
+    Returns the storage name to assign to the image field. A file whose hash is
+    already known is not written again. The storage write happens before the
+    row is locked, so concurrent uploads never wait on it.
+    """
+    from .models import ImageBlob
+    storage = storage or default_storage
+    sha256 = content_hash(content)
+    known = ImageBlob.objects.filter(sha256=sha256).exists()
+
+    saved = None
+    name = blob_name(sha256, original_name)
+    if not known and not storage.exists(name):
+        saved = name = storage.save(name, content)
+
+    with transaction.atomic():
+        blob, created = ImageBlob.objects.select_for_update().get_or_create(
+            sha256=sha256, defaults={'name': name, 'size': content.size, 'ref_count': 1}
+        )
+        if not created:
+            ImageBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+
+    if saved is not None and saved != blob.name:
+        # A concurrent upload of the same file recorded its copy first
+        storage.delete(saved)
+    return blob.name
+
+def release(name, storage=None):
+    """
+    Drop one reference to a stored image, deleting the file and its derivatives
+    once nothing uses it. Names that are not blobs (older uploads) are left alone.
+    """
+    from .models import ImageBlob
+    if not name:
+        return
+    storage = storage or default_storage
+    with transaction.atomic():
+        blob = ImageBlob.objects.select_for_update().filter(name=name).first()
+        if blob is None:
+            return
+        if blob.ref_count > 1:
+            ImageBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') - 1)
+            return
+        blob.delete()
+    stored_names = [name, *derivative_names(blob.derivatives)]
+
+    def delete_files():
+        for stored in stored_names:
+            if storage.exists(stored):
+                storage.delete(stored)
+
+    # A rolled-back release must not have removed files that are still referenced
+    transaction.on_commit(delete_files)
+
+class ContentAddressedImageFieldFile(ImageFieldFile):
+    def save(self, name, content, save=True):
+        self.name = acquire(content, name, self.storage)
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = True
+        if save:
+            self.instance.save()
+
+    save.alters_data = True
+
+class ContentAddressedImageField(models.ImageField):
+    """ImageField whose uploads are stored once per distinct content (see services.blobs)"""
+    attr_class = ContentAddressedImageFieldFile
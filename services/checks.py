@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+@register()
+def page_cache_backend_check(app_configs, **kwargs):
+    """The page and home caches rely on invalidations every worker can see"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    if not backend.endswith('.LocMemCache'):
+        return []
+    enabled = [name for name in ('PAGE_CACHE_TIMEOUT', 'HOME_CACHE_TIMEOUT') if getattr(settings, name, 0)]
+    if enabled:
+        return [Warning(
+            f"{' and '.join(enabled)} {'is' if len(enabled) == 1 else 'are'} set but the default cache is per-process memory.",
+            hint='Other gunicorn workers keep serving stale pages and home stats after an edit; '
+                 'point CACHE_URL at redis or memcached, or set the timeouts to 0.',
+            id='services.W001',
+        )]
+    return []
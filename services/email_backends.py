@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.mail.backends.base import BaseEmailBackend
+from .sendgrid_client import get_sendgrid_client
+import logging
+
+logger = logging.getLogger(__name__)
+
+class SendGridBackend(BaseEmailBackend):
+    """Django email backend that delivers through the SendGrid Web API"""
+
+    def send_messages(self, email_messages):
+        from sendgrid.helpers.mail import Mail
+
+        client = get_sendgrid_client()
+        sent = 0
+        for message in email_messages:
+            html_content = next(
+                (content for content, mimetype in getattr(message, 'alternatives', [])
+                 if mimetype == 'text/html'),
+                None
+            )
+            mail = Mail(
+                from_email=message.from_email or settings.DEFAULT_FROM_EMAIL,
+                to_emails=message.to,
+                subject=message.subject,
+                html_content=html_content,
+                plain_text_content=message.body or None,
+            )
+            try:
+                response = client.send(mail)
+            except Exception:
+                if not self.fail_silently:
+                    raise
+                logger.exception("SendGrid email failed")
+                continue
+            logger.info(f"SendGrid email sent successfully. Status: {response.status_code}")
+            sent += 1
+        return sent
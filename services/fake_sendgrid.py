@@ -0,0 +1,72 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Allow keep-alive so connection reuse is observable
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        with self.server.lock:
+            self.server.requests.append({'path': self.path, 'body': body})
+        if self.server.latency:
+            threading.Event().wait(self.server.latency)
+        self.send_response(self.server.status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+class FakeSendGridServer:
+    """
+    Local stand-in for the SendGrid Mail Send API, for offline tests and benchmarks.
+
+    Records every request body and counts TCP connections, so callers can check
+    how many messages, personalizations and connections a send path used.
+
+        with FakeSendGridServer() as server:
+            client = SendGridClient(api_key='test', host=server.url)
+    """
+
+    def __init__(self, latency=0.0, status=202):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.lock = threading.Lock()
+        self.httpd.requests = []
+        self.httpd.connections = 0
+        self.httpd.latency = latency
+        # Response status for every request, e.g. 502 to exercise error handling
+        self.httpd.status = status
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f'http://{host}:{port}'
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    @property
+    def connections(self):
+        return self.httpd.connections
+
+    @property
+    def personalizations(self):
+        return sum(len(r['body'].get('personalizations', [])) for r in self.requests)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
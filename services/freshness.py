@@ -0,0 +1,106 @@
+import hashlib
+from functools import wraps
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from .models import Service, Rating
+
+def _viewer(user):
+    """Pages embed the navbar, so validators differ per user and per pending badge"""
+    if not user.is_authenticated:
+        return 'anonymous'
+    return f'{user.pk}:{user.pending_requests_count}'
+
+def _memoized(request, key, compute):
+    # condition() asks for the ETag and Last-Modified separately; answer both from one query
+    state = request.__dict__.setdefault('_freshness', {})
+    if key not in state:
+        state[key] = compute()
+    return state[key]
+
+def _digest(*parts):
+    return hashlib.sha256('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+def _service_detail_state(pk):
+    """Timestamps and aggregates that a service detail page is rendered from"""
+    latest_rating = Rating.objects.filter(service=OuterRef('pk')).order_by('-date_created')
+    # The related services block lists other approved services in the same field
+    latest_related = Service.objects.filter(status='approved', field=OuterRef('field')).order_by('-date_updated')
+    return Service.objects.filter(pk=pk, status='approved').annotate(
+        latest_rating=Subquery(latest_rating.values('date_created')[:1]),
+        latest_related=Subquery(latest_related.values('date_updated')[:1]),
+    ).values('date_updated', 'rating_sum', 'rating_count', 'latest_rating', 'latest_related')
+
+def _service_detail_validators(pk, state, user):
+    if state is None:
+        return None, None
+    etag = _digest(pk, *state.values(), _viewer(user))
+    last_modified = max(filter(None, (state['date_updated'], state['latest_rating'], state['latest_related'])))
+    return etag, last_modified
+
+def _catalog_state(field):
+    """Approved services whose newest change and size a listing is rendered from"""
+    services = Service.objects.filter(status='approved')
+    if field:
+        services = services.filter(field=field)
+    return services
+
+def _catalog_aggregates():
+    return {'latest': Max('date_updated'), 'total': Count('pk')}
+
+def _catalog_validators(field, state, user):
+    # The count catches removals, which leave the newest timestamp unchanged
+    return _digest(field, state['latest'], state['total'], _viewer(user)), state['latest']
+
+def service_detail_validators(request, pk):
+    return _memoized(request, ('service', pk), lambda: _service_detail_validators(
+        pk, _service_detail_state(pk).first(), request.user
+    ))
+
+def service_detail_etag(request, pk):
+    return service_detail_validators(request, pk)[0]
+
+def service_detail_last_modified(request, pk):
+    return service_detail_validators(request, pk)[1]
+
+def catalog_validators(request, field=None):
+    return _memoized(request, ('catalog', field), lambda: _catalog_validators(
+        field, _catalog_state(field).aggregate(**_catalog_aggregates()), request.user
+    ))
+
+def catalog_etag(request, field=None):
+    return catalog_validators(request, field)[0]
+
+def catalog_last_modified(request, field=None):
+    return catalog_validators(request, field)[1]
+
+async def aservice_detail_validators(request, pk):
+    state = await _service_detail_state(pk).afirst()
+    return _service_detail_validators(pk, state, await request.auser())
+
+async def acatalog_validators(request, field=None):
+    state = await _catalog_state(field).aaggregate(**_catalog_aggregates())
+    return _catalog_validators(field, state, await request.auser())
+
+def async_condition(validators_func):
+    """
+    condition() for async views. ``validators_func`` is awaited with the view's
+    arguments and returns an (etag, last_modified) pair from the async ORM.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        async def inner(request, *args, **kwargs):
+            etag, last_modified = await validators_func(request, *args, **kwargs)
+            etag = quote_etag(etag) if etag else None
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = await view_func(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                if timestamp and not response.has_header('Last-Modified'):
+                    response.headers['Last-Modified'] = http_date(timestamp)
+                if etag:
+                    response.headers.setdefault('ETag', etag)
+            return response
+        return inner
+    return decorator
@@ -0,0 +1,150 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .blobs import acquire
+from .images import delete_derivatives, generate_derivatives, has_derivatives
+from .models import ImageBlob, ImageUpload, Service
+from .outbox import retry_delay
+from .page_cache import bump_catalog_version
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Seconds a claimed upload stays invisible to other workers
+LEASE_SECONDS = 300
+
+def background_uploads_enabled():
+    return getattr(settings, 'BACKGROUND_IMAGE_UPLOADS', False)
+
+def staging_storage():
+    """Local disk the web process stages uploads on; must be shared with the image worker"""
+    return FileSystemStorage(location=settings.IMAGE_STAGING_ROOT)
+
+def stage_upload(service, uploaded_file):
+    """
+    Write an upload to the staging directory and queue it for the image worker.
+
+    Local disk is fast, so the request only pays for this copy. The service keeps
+    an empty image, and pages show their placeholder, until the worker finishes.
+    """
+    staged_name = staging_storage().save(f'{service.pk}/{uploaded_file.name}', uploaded_file)
+    return ImageUpload.objects.create(
+        service=service, staged_name=staged_name, original_name=uploaded_file.name
+    )
+
+def claim_batch(batch_size):
+    """Lease a batch of due uploads to this worker, like services.outbox.claim_batch"""
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            ImageUpload.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        ImageUpload.objects.filter(pk__in=ids).update(
+            attempts=F('attempts') + 1,
+            next_attempt_at=now + timedelta(seconds=LEASE_SECONDS),
+        )
+    return list(ImageUpload.objects.filter(pk__in=ids).select_related('service').order_by('next_attempt_at', 'pk'))
+
+def process(upload):
+    """Push a claimed upload to media storage, build its derivatives and publish it"""
+    staging = staging_storage()
+    service = upload.service
+    try:
+        with staging.open(upload.staged_name, 'rb') as staged:
+            service.image.name = acquire(File(staged), upload.original_name, service.image.storage)
+    except Exception as e:
+        if upload.attempts >= getattr(settings, 'IMAGE_UPLOAD_MAX_ATTEMPTS', 5):
+            upload.status = 'failed'
+        else:
+            upload.next_attempt_at = timezone.now() + retry_delay(upload.attempts)
+        upload.last_error = str(e)
+        upload.save(update_fields=['status', 'next_attempt_at', 'last_error'])
+        logger.error(f"Image upload {upload.pk} for service {service.pk} failed (attempt {upload.attempts}): {str(e)}")
+        return False
+
+    # A queryset update, so a concurrent edit of the service's other fields is not overwritten
+    Service.objects.filter(pk=service.pk).update(
+        image=service.image.name, image_derivatives={}, date_updated=timezone.now()
+    )
+    bump_catalog_version()
+    build_derivatives(service)
+    upload.status = 'done'
+    upload.date_processed = timezone.now()
+    upload.last_error = ''
+    upload.save(update_fields=['status', 'date_processed', 'last_error'])
+    staging.delete(upload.staged_name)
+    logger.info(f"Image upload {upload.pk} published as {service.image.name}")
+    return True
+
+def build_derivatives(service):
+    """
+    Give a service's image its resized copies and record their stored names.
+
+    Copies are made once per blob: services sharing an image reuse the names
+    recorded on its ImageBlob. Pages show the original until this has run.
+    Returns False when the image could not be resized.
+    """
+    name = service.image.name
+    blob = ImageBlob.objects.filter(name=name).first()
+    derivatives = blob.derivatives if blob is not None else {}
+    if not has_derivatives(derivatives):
+        # Resized and stored outside any transaction, so no row lock waits on Pillow or the storage
+        try:
+            derivatives = generate_derivatives(service.image)
+        except Exception as e:
+            logger.error(f"Could not resize image {name} of service {service.pk}: {str(e)}")
+            derivatives = {'error': str(e)}
+        else:
+            if blob is not None:
+                derivatives = record_blob_derivatives(blob, derivatives, service.image.storage)
+                if derivatives is None:
+                    return False
+
+    # Only if the image is still the one that was resized
+    if Service.objects.filter(pk=service.pk, image=name).update(image_derivatives=derivatives):
+        bump_catalog_version()
+    return 'error' not in derivatives
+
+def record_blob_derivatives(blob, derivatives, storage):
+    """
+    Record freshly stored copies on their blob, unless another worker got there
+    first or the blob was released meanwhile; the copies are then deleted.
+    Returns the copies the blob now has, or None once it is gone.
+    """
+    with transaction.atomic():
+        locked = ImageBlob.objects.select_for_update().filter(pk=blob.pk).first()
+        if locked is not None and not has_derivatives(locked.derivatives):
+            ImageBlob.objects.filter(pk=blob.pk).update(derivatives=derivatives)
+            return derivatives
+    delete_derivatives(storage, derivatives)
+    return locked.derivatives if locked is not None else None
+
+def build_missing_derivatives(batch_size=20):
+    """Resize a batch of images saved without copies, e.g. uploaded in the request; returns (done, failed)"""
+    done = failed = 0
+    for service in Service.objects.exclude(image='').filter(image_derivatives={}).order_by('pk')[:batch_size]:
+        if build_derivatives(service):
+            done += 1
+        else:
+            failed += 1
+    return done, failed
+
+def drain(batch_size=20):
+    """Process one batch of due uploads and images missing their copies; returns (done, failed)"""
+    done = failed = 0
+    for upload in claim_batch(batch_size):
+        if process(upload):
+            done += 1
+        else:
+            failed += 1
+    built, not_built = build_missing_derivatives(batch_size)
+    return done + built, failed + not_built
@@ -0,0 +1,73 @@
+import posixpath
+from io import BytesIO
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# Pillow format and encoder options for every derivative format
+DERIVATIVE_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+def derivative_widths():
+    return sorted(settings.IMAGE_DERIVATIVE_WIDTHS)
+
+def derivative_name(name, width, fmt):
+    """Name to request from the storage for an image resized to at most ``width`` pixels"""
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'derivatives', f'{stem}-{width}w.{fmt}')
+
+def derivative_names(derivatives):
+    """Every stored name in a derivatives mapping, as recorded by generate_derivatives"""
+    return [name for fmt in DERIVATIVE_FORMATS for name in derivatives.get(fmt, {}).values()]
+
+def has_derivatives(derivatives):
+    return all(derivatives.get(fmt) for fmt in DERIVATIVE_FORMATS)
+
+def generate_derivatives(image):
+    """
+    Resize an ImageField file to every configured width in every derivative format
+    and save the results on its storage. Narrower originals are never upscaled.
+
+    Returns ``{format: {width: stored name}}`` with the names the storage chose:
+    backends such as Cloudinary add a unique suffix, so the requested name
+    cannot be used to find the file again.
+    """
+    with image.open('rb') as source_file, Image.open(source_file) as original:
+        # Phones store rotation as EXIF metadata, which the re-encoded copies drop
+        source = ImageOps.exif_transpose(original).convert('RGB')
+
+    derivatives = {fmt: {} for fmt in DERIVATIVE_FORMATS}
+    try:
+        for width in derivative_widths():
+            resized = source.copy()
+            # Bound the width only; thumbnail() keeps the aspect ratio and never enlarges
+            resized.thumbnail((width, source.height), Image.Resampling.LANCZOS)
+            for fmt, (pillow_format, options) in DERIVATIVE_FORMATS.items():
+                buffer = BytesIO()
+                resized.save(buffer, pillow_format, **options)
+                derivatives[fmt][str(width)] = image.storage.save(
+                    derivative_name(image.name, width, fmt), ContentFile(buffer.getvalue())
+                )
+    except Exception:
+        # Nothing records a partial set, so nothing would ever delete it
+        delete_derivatives(image.storage, derivatives)
+        raise
+    return derivatives
+
+def delete_derivatives(storage, derivatives):
+    for name in derivative_names(derivatives):
+        if storage.exists(name):
+            storage.delete(name)
+
+def _by_width(derivatives, fmt):
+    return sorted((int(width), name) for width, name in derivatives.get(fmt, {}).items())
+
+def srcset(storage, derivatives, fmt):
+    """``srcset`` attribute value listing every stored width of an image in one format"""
+    return ', '.join(f'{storage.url(name)} {width}w' for width, name in _by_width(derivatives, fmt))
+
+def smallest_url(storage, derivatives, fmt='jpeg'):
+    return storage.url(_by_width(derivatives, fmt)[0][1])
@@ -0,0 +1,28 @@
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from .models import LeaderboardEntry, ServiceRequest
+
+def refresh_leaderboard(window_days, limit=50):
+    """Rebuild the leaderboard from requests for approved services in the last window_days"""
+    now = timezone.now()
+    top = ServiceRequest.objects.filter(
+        date_requested__gte=now - timedelta(days=window_days),
+        service__status='approved',
+    ).values('service').annotate(total=Count('pk')).order_by('-total', 'service')[:limit]
+
+    entries = [
+        LeaderboardEntry(
+            rank=rank,
+            service_id=row['service'],
+            request_count=row['total'],
+            window_days=window_days,
+            date_refreshed=now,
+        )
+        for rank, row in enumerate(top, start=1)
+    ]
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardEntry.objects.bulk_create(entries)
+    return len(entries)
@@ -0,0 +1,53 @@
+import time
+from django.core.management.base import BaseCommand
+from services.fake_sendgrid import FakeSendGridServer
+from services.sendgrid_client import SendGridClient
+
+class Command(BaseCommand):
+    help = 'Benchmark SendGrid send paths offline against a local fake Mail Send API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--messages', type=int, default=200, help='Emails to send per path')
+        parser.add_argument('--latency', type=float, default=0.0, help='Simulated server latency in seconds')
+
+    def handle(self, *args, **options):
+        count = options['messages']
+        recipients = [(f'user{i}@example.com', {'-name-': f'user{i}'}) for i in range(count)]
+
+        self.run('SDK client per message', count, options['latency'], self.sdk_per_message, recipients)
+        self.run('Pooled client per message', count, options['latency'], self.pooled_per_message, recipients)
+        self.run('Pooled client batched', count, options['latency'], self.pooled_batched, recipients)
+
+    def run(self, label, count, latency, send, recipients):
+        with FakeSendGridServer(latency=latency) as server:
+            started = time.perf_counter()
+            send(server.url, recipients)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{label:<28} {count / elapsed:>10.1f} msg/s  '
+                f'{len(server.requests):>5} requests  {server.connections:>5} connections'
+            )
+
+    def sdk_per_message(self, url, recipients):
+        from sendgrid import SendGridAPIClient
+        from sendgrid.helpers.mail import Mail
+
+        for to_email, _ in recipients:
+            client = SendGridAPIClient(api_key='benchmark', host=url)
+            client.send(Mail(from_email='bench@example.com', to_emails=to_email,
+                             subject='Hello', html_content='<p>Hello</p>'))
+
+    def pooled_per_message(self, url, recipients):
+        from sendgrid.helpers.mail import Mail
+
+        client = SendGridClient(api_key='benchmark', host=url)
+        for to_email, _ in recipients:
+            client.send(Mail(from_email='bench@example.com', to_emails=to_email,
+                             subject='Hello', html_content='<p>Hello</p>'))
+        client.close()
+
+    def pooled_batched(self, url, recipients):
+        client = SendGridClient(api_key='benchmark', host=url)
+        client.send_personalized('Hello -name-', '<p>Hello -name-</p>', recipients,
+                                 from_email='bench@example.com')
+        client.close()
@@ -0,0 +1,104 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from statistics import quantiles
+from urllib.error import URLError
+from urllib.request import urlopen
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from services.models import Service
+
+class Command(BaseCommand):
+    help = 'Benchmark the home, catalog and detail pages under sync (WSGI) and async (ASGI) gunicorn workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Gunicorn workers for every mode')
+        parser.add_argument('--concurrency', type=int, default=20, help='Requests in flight at once')
+        parser.add_argument('--requests', type=int, default=300, help='Requests per page per mode')
+        parser.add_argument('--mode', choices=['wsgi', 'asgi'], action='append',
+                            help='Only run this mode (repeatable); defaults to both')
+        parser.add_argument('--page-cache', action='store_true',
+                            help='Keep the anonymous page cache on instead of measuring the views themselves')
+
+    def handle(self, *args, **options):
+        service = Service.objects.filter(status='approved').first()
+        if service is None:
+            raise CommandError('Seed some data first, e.g. manage.py seed_data --scale 1')
+        pages = {
+            'home': reverse('home'),
+            'catalog': reverse('all_services'),
+            'detail': reverse('service_detail', kwargs={'pk': service.pk}),
+        }
+
+        for mode in options['mode'] or ['wsgi', 'asgi']:
+            self.stdout.write(self.style.MIGRATE_HEADING(f"== {mode} ({options['workers']} workers)"))
+            with GunicornServer(mode, options['workers'], options['page_cache']) as base_url:
+                for label, path in pages.items():
+                    self.run(label, base_url + path, options['requests'], options['concurrency'])
+
+    def run(self, label, url, count, concurrency):
+        # Warm up every worker so startup and first-hit template compilation are not measured
+        for _ in range(concurrency):
+            self.fetch(url)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(lambda _: self.fetch(url), range(count)))
+        elapsed = time.perf_counter() - started
+
+        cuts = quantiles(latencies, n=100)
+        self.stdout.write(
+            f'{label:<8} {count / elapsed:>8.1f} req/s  '
+            f'p50 {cuts[49] * 1000:>7.1f} ms  p95 {cuts[94] * 1000:>7.1f} ms'
+        )
+
+    def fetch(self, url):
+        started = time.perf_counter()
+        with urlopen(url, timeout=30) as response:
+            response.read()
+        return time.perf_counter() - started
+
+class GunicornServer:
+    """Run gunicorn.conf.py on a free local port for the duration of a with block"""
+
+    def __init__(self, mode, workers, page_cache=False):
+        self.mode = mode
+        self.workers = workers
+        self.page_cache = page_cache
+
+    def __enter__(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        env = {**os.environ, 'ASYNC_VIEWS': 'True' if self.mode == 'asgi' else 'False'}
+        if not self.page_cache:
+            env['PAGE_CACHE_TIMEOUT'] = '0'
+        self.process = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', str(settings.BASE_DIR / 'gunicorn.conf.py'),
+             '--bind', f'127.0.0.1:{port}', '--workers', str(self.workers), '--log-level', 'warning'],
+            cwd=settings.BASE_DIR, env=env,
+        )
+        base_url = f'http://127.0.0.1:{port}'
+        self.wait_until_ready(base_url)
+        return base_url
+
+    def wait_until_ready(self, base_url, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CommandError(f'gunicorn exited with status {self.process.returncode}')
+            try:
+                urlopen(base_url + reverse('about'), timeout=1).close()
+                return
+            except (URLError, ConnectionError):
+                time.sleep(0.2)
+        self.__exit__()
+        raise CommandError(f'gunicorn did not start within {timeout}s')
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        self.process.wait(timeout=30)
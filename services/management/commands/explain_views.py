@@ -0,0 +1,106 @@
+from contextlib import ExitStack
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.cache import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.http import Http404
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from users.models import User
+from services.models import Service
+from xpertshub.replica import ReplicaPinMiddleware
+
+class Command(BaseCommand):
+    help = "Print the EXPLAIN plan of every query the catalog, detail, request and profile views run"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--view', help='Only explain views whose label contains this text')
+        parser.add_argument('--analyze', action='store_true', help='Run EXPLAIN ANALYZE (PostgreSQL only)')
+
+    def handle(self, *args, **options):
+        if options['analyze'] and any(connections[alias].vendor != 'postgresql' for alias in connections):
+            raise CommandError('--analyze is only supported on PostgreSQL')
+
+        company = User.objects.filter(user_type='company', services_provided__status='approved').first()
+        customer = User.objects.filter(user_type='customer').first()
+        service = Service.objects.filter(status='approved').order_by('-rating_count').first()
+        if not (company and customer and service):
+            raise CommandError('Seed some data first, e.g. manage.py seed_data --scale 1')
+
+        views = [
+            ('catalog', reverse('all_services'), None),
+            ('catalog by category', reverse('all_services') + f'?category={service.field}', None),
+            ('catalog by price range', reverse('all_services') + '?min_price=30&max_price=80&sort=price_low', None),
+            ('catalog by price desc', reverse('all_services') + '?sort=price_high', None),
+            ('catalog by rating', reverse('all_services') + '?sort=rating', None),
+            ('catalog search', reverse('all_services') + '?search=repair', None),
+            ('catalog deep page', reverse('all_services') + '?page=50', None),
+            ('category', reverse('services_by_category', kwargs={'field': service.field}), None),
+            ('service detail', reverse('service_detail', kwargs={'pk': service.pk}), customer),
+            ('service requests', reverse('service_requests'), company),
+            ('customer profile', reverse('profile', kwargs={'username': customer.username}), None),
+            ('company profile', reverse('profile', kwargs={'username': company.username}), None),
+        ]
+        if options['view']:
+            views = [view for view in views if options['view'] in view[0]]
+
+        for label, url, user in views:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'== {label}: {url}'))
+            for alias, sql in self.capture_queries(url, user):
+                if alias != 'default':
+                    self.stdout.write(f'-- on {alias}')
+                self.stdout.write(self.style.SQL_KEYWORD(sql))
+                for line in self.explain(connections[alias], sql, options['analyze']):
+                    self.stdout.write(f'    {line}')
+                self.stdout.write('')
+
+    def capture_queries(self, url, user):
+        """Render a view and return the distinct catalog SELECTs it ran as (database alias, sql)"""
+        request = RequestFactory().get(url)
+        request.user = user or AnonymousUser()
+        request.session = SessionStore()
+        request._messages = FallbackStorage(request)
+        match = resolve(request.path_info)
+
+        def render(request):
+            replica_pin.process_view(request, match.func, match.args, match.kwargs)
+            response = match.func(request, *match.args, **match.kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            return response
+
+        # Routed like a real request, so replica_reads views are explained on the replica
+        replica_pin = ReplicaPinMiddleware(render)
+        with ExitStack() as stack:
+            # A warm page cache would answer without running the view. Factory requests send no
+            # If-None-Match or If-Modified-Since, so condition() never answers 304 either.
+            stack.enter_context(override_settings(PAGE_CACHE_TIMEOUT=0))
+            captured = [
+                (alias, stack.enter_context(CaptureQueriesContext(connections[alias]))) for alias in connections
+            ]
+            try:
+                replica_pin(request)
+            except Http404:
+                # e.g. a page past the end; the queries that ran are still worth explaining
+                self.stdout.write(self.style.WARNING('    (view raised 404)'))
+
+        statements = []
+        for alias, queries in captured:
+            for query in queries.captured_queries:
+                sql = query['sql']
+                if sql.startswith('SELECT') and 'services_' in sql and (alias, sql) not in statements:
+                    statements.append((alias, sql))
+        return statements
+
+    def explain(self, connection, sql, analyze):
+        options = {'analyze': True} if analyze else {}
+        prefix = connection.ops.explain_query_prefix(**options)
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}')
+            rows = cursor.fetchall()
+        if connection.vendor == 'sqlite':
+            # (id, parent, notused, detail)
+            return [row[-1] for row in rows]
+        return [' '.join(str(column) for column in row) for row in rows]
@@ -0,0 +1,39 @@
+import time
+from django.core.management.base import BaseCommand
+from services.image_uploads import drain
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Push staged service image uploads to media storage and resize images missing their thumbnails, polling until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20, help='Uploads claimed per batch')
+        parser.add_argument('--poll-interval', type=float, default=2.0, help='Seconds to sleep when nothing is queued')
+        parser.add_argument('--once', action='store_true', help='Process everything currently due, then exit')
+
+    def handle(self, *args, **options):
+        total_done = total_failed = 0
+        while True:
+            try:
+                done, failed = drain(options['batch_size'])
+            except Exception as e:
+                # Leased rows are retried once their lease expires
+                logger.error(f"Image upload batch failed: {str(e)}")
+                if options['once']:
+                    raise
+                time.sleep(options['poll_interval'])
+                continue
+
+            total_done += done
+            total_failed += failed
+            if done or failed:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Processed {total_done} images, {total_failed} failed')
+        )
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, FloatField, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Cast, Coalesce
+from services.models import Service, Rating
+
+class Command(BaseCommand):
+    help = 'Backfill or repair the denormalized rating aggregates stored on services'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report services whose stored aggregates have drifted',
+        )
+
+    def handle(self, *args, **options):
+        ratings = Rating.objects.filter(service=OuterRef('pk')).order_by().values('service')
+        actual_sum = Coalesce(
+            Subquery(ratings.annotate(total=Sum('rating')).values('total'), output_field=IntegerField()), 0
+        )
+        actual_count = Coalesce(
+            Subquery(ratings.annotate(total=Count('pk')).values('total'), output_field=IntegerField()), 0
+        )
+
+        drifted = Service.objects.annotate(
+            actual_sum=actual_sum,
+            actual_count=actual_count,
+        ).exclude(rating_sum=F('actual_sum'), rating_count=F('actual_count'))
+        drifted_count = drifted.count()
+
+        if options['check']:
+            for service in drifted.only('pk', 'name', 'rating_sum', 'rating_count'):
+                self.stdout.write(
+                    f'{service.pk} {service.name}: stored {service.rating_sum}/{service.rating_count}, '
+                    f'actual {service.actual_sum}/{service.actual_count}'
+                )
+            self.stdout.write(f'{drifted_count} services with drifted rating aggregates')
+            return
+
+        with transaction.atomic():
+            Service.objects.filter(pk__in=drifted.values('pk')).update(
+                rating_sum=actual_sum, rating_count=actual_count
+            )
+            Service.objects.filter(rating_count=0).exclude(rating_avg=0).update(rating_avg=0)
+            Service.objects.filter(rating_count__gt=0).update(
+                rating_avg=Cast(F('rating_sum'), FloatField()) / Cast(F('rating_count'), FloatField())
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt rating aggregates for {drifted_count} services')
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from services.models import recount_pending_requests, recount_service_requests
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized service request counters'
+
+    def handle(self, *args, **options):
+        services = recount_service_requests()
+        companies = recount_pending_requests()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Recounted requests for {services} services and pending requests for {companies} companies'
+            )
+        )
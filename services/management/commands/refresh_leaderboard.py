@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from services.leaderboard import refresh_leaderboard
+from xpertshub_app.stats import invalidate_home_cache
+
+class Command(BaseCommand):
+    help = 'Rebuild the most requested services leaderboard over a recent window'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.FEATURED_SERVICES_WINDOW_DAYS or 30,
+            help='Only count requests made in the last N days',
+        )
+        parser.add_argument('--limit', type=int, default=50, help='Number of services to rank')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days must be a positive integer')
+        ranked = refresh_leaderboard(options['days'], options['limit'])
+        invalidate_home_cache()
+        self.stdout.write(
+            self.style.SUCCESS(f"Ranked {ranked} services by requests in the last {options['days']} days")
+        )
@@ -1,17 +1,101 @@
-from django.core.management.base import BaseCommand
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.hashers import make_password
 from django.utils import timezone
 from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from users.models import User
 from services.models import Service, ServiceRequest, Rating
+from services.page_cache import bump_catalog_version
+from services.search import refresh_search_vectors
+from xpertshub_app.stats import invalidate_home_cache
+from contextlib import contextmanager
+from itertools import islice
 import random
+import time
 from datetime import datetime, timedelta
+from decimal import Decimal
 import requests
-from io import BytesIO
+from io import BytesIO, StringIO
+from PIL import Image
+
+# Rows generated per unit of --scale; --scale 500 gives a million service requests
+SCALE_UNIT = {
+    'customers': 100,
+    'companies': 10,
+    'services': 50,
+    'requests': 2000,
+    'ratings': 1000,
+}
+
+CUSTOMER_PREFIX = 'load_customer_'
+COMPANY_PREFIX = 'load_company_'
+
+# Distinct placeholder colour per field of work
+PLACEHOLDER_COLOURS = [
+    (37, 99, 235), (22, 163, 74), (234, 88, 12), (147, 51, 234), (219, 39, 119), (13, 148, 136),
+    (202, 138, 4), (71, 85, 105), (220, 38, 38), (79, 70, 229), (8, 145, 178), (101, 163, 13),
+]
+
+REVIEWS = [
+    'Excellent service! Highly recommended.',
+    'Great work, very professional.',
+    'Good quality service, will use again.',
+    'Satisfied with the work done.',
+    'Professional and timely service.',
+    '',
+    'Outstanding work quality.',
+    'Very pleased with the results.'
+]
+
+STREETS = ['Main St', 'Oak Ave', 'Pine Rd', 'Elm Dr', 'Maple Ln']
+
+@contextmanager
+def explicit_dates(*models_and_fields):
+    """Let bulk_create keep backdated values on auto_now_add fields"""
+    fields = [model._meta.get_field(name) for model, name in models_and_fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+def bulk_insert(model, rows, batch_size):
+    """Insert a lazily generated stream of rows in fixed-size chunks"""
+    rows = iter(rows)
+    total = 0
+    while batch := list(islice(rows, batch_size)):
+        model.objects.bulk_create(batch)
+        total += len(batch)
+    return total
+
+def placeholder_image(field, colour):
+    """Store one generated placeholder image per field of work and return its name"""
+    name = f'service_images/placeholders/{field.lower().replace(" ", "_")}.jpg'
+    if not default_storage.exists(name):
+        buffer = BytesIO()
+        Image.new('RGB', (400, 300), colour).save(buffer, format='JPEG', quality=80)
+        name = default_storage.save(name, ContentFile(buffer.getvalue()))
+    return name
 
 class Command(BaseCommand):
     help = 'Seed database with sample users and services'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=int,
+            help='Generate synthetic load-testing data in bulk, %(requests)s requests per unit' % SCALE_UNIT,
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for --scale data')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per INSERT for --scale data')
+
     def handle(self, *args, **options):
+        if options['scale']:
+            return self.seed_at_scale(options['scale'], options['seed'], options['batch_size'])
+
         self.stdout.write('Seeding database...')
 
         # Create 15 customers
@@ -67,14 +151,21 @@ class Command(BaseCommand):
             'Water Heaters': 'https://images.unsplash.com/photo-1581244277943-fe4a9c777189?w=400',
         }
 
+        # Several fields share a photo; fetch each URL once (storage dedupes the copies)
+        downloaded = {}
+
         def download_image(url, filename):
-            try:
-                response = requests.get(url, timeout=10)
-                if response.status_code == 200:
-                    return ContentFile(response.content, name=filename)
-            except:
-                pass
-            return None
+            if url not in downloaded:
+                downloaded[url] = None
+                try:
+                    response = requests.get(url, timeout=10)
+                    if response.status_code == 200:
+                        downloaded[url] = response.content
+                except:
+                    pass
+            if downloaded[url] is None:
+                return None
+            return ContentFile(downloaded[url], name=filename)
 
         # Create services for each company
         service_templates = {
@@ -171,3 +262,110 @@ class Command(BaseCommand):
                 f'- 30 ratings'
             )
         )
+
+    def seed_at_scale(self, scale, seed, batch_size):
+        if scale < 1:
+            raise CommandError('--scale must be a positive integer')
+        if User.objects.filter(username__startswith=CUSTOMER_PREFIX).exists():
+            raise CommandError('Load-testing data already exists; flush the database before seeding again')
+
+        counts = {name: per_unit * scale for name, per_unit in SCALE_UNIT.items()}
+        rng = random.Random(seed)
+        now = timezone.now()
+        # Hash once; every generated account shares the same password
+        password = make_password('password123')
+        fields = [value for value, _ in User.FIELD_OF_WORK_CHOICES]
+        specialist_fields = [field for field in fields if field != 'All in One']
+        images = {
+            field: placeholder_image(field, colour)
+            for field, colour in zip(fields, PLACEHOLDER_COLOURS)
+        }
+        started = time.perf_counter()
+
+        def report(label, total):
+            self.stdout.write(f'{label:<18} {total:>10}  ({time.perf_counter() - started:.1f}s)')
+
+        def days_ago(max_days):
+            return now - timedelta(seconds=rng.randint(0, max_days * 86400))
+
+        report('customers', bulk_insert(User, (
+            User(username=f'{CUSTOMER_PREFIX}{i}', email=f'{CUSTOMER_PREFIX}{i}@customer.com',
+                 password=password, user_type='customer', date_joined=days_ago(730))
+            for i in range(counts['customers'])
+        ), batch_size))
+        report('companies', bulk_insert(User, (
+            User(username=f'{COMPANY_PREFIX}{i}', email=f'{COMPANY_PREFIX}{i}@company.com',
+                 password=password, user_type='company', field_of_work=fields[i % len(fields)],
+                 date_joined=days_ago(730))
+            for i in range(counts['companies'])
+        ), batch_size))
+
+        customer_ids = list(
+            User.objects.filter(username__startswith=CUSTOMER_PREFIX).order_by('pk').values_list('pk', flat=True)
+        )
+        companies = list(
+            User.objects.filter(username__startswith=COMPANY_PREFIX).order_by('pk').values_list('pk', 'field_of_work')
+        )
+
+        def services():
+            for i in range(counts['services']):
+                company_id, company_field = companies[i % len(companies)]
+                field = rng.choice(specialist_fields) if company_field == 'All in One' else company_field
+                status = rng.choices(['approved', 'pending', 'rejected'], weights=[85, 10, 5])[0]
+                created = days_ago(365)
+                yield Service(
+                    name=f'{field} service {i}',
+                    description=f'Professional {field.lower()} service provided by experienced technicians.',
+                    field=field,
+                    price_per_hour=Decimal(rng.randint(2500, 15000)) / 100,
+                    image=images[field],
+                    company_id=company_id,
+                    status=status,
+                    date_created=created,
+                    date_approved=created + timedelta(days=rng.randint(0, 7)) if status == 'approved' else None,
+                )
+
+        with explicit_dates((Service, 'date_created')):
+            report('services', bulk_insert(Service, services(), batch_size))
+        generated = Service.objects.filter(company__username__startswith=COMPANY_PREFIX)
+        refresh_search_vectors(generated)
+        service_ids = list(generated.filter(status='approved').order_by('pk').values_list('pk', flat=True))
+
+        def service_requests():
+            for _ in range(counts['requests']):
+                yield ServiceRequest(
+                    service_id=rng.choice(service_ids),
+                    customer_id=rng.choice(customer_ids),
+                    address=f'{rng.randint(100, 9999)} {rng.choice(STREETS)}',
+                    service_time_hours=Decimal(rng.randint(100, 800)) / 100,
+                    date_requested=days_ago(365),
+                )
+
+        def ratings():
+            # Spread ratings evenly so each (service, customer) pair stays unique
+            per_service, remainder = divmod(counts['ratings'], len(service_ids))
+            for index, service_id in enumerate(service_ids):
+                total = min(per_service + (index < remainder), len(customer_ids))
+                for customer_id in rng.sample(customer_ids, total):
+                    yield Rating(
+                        service_id=service_id,
+                        customer_id=customer_id,
+                        rating=rng.choices([1, 2, 3, 4, 5], weights=[5, 5, 15, 35, 40])[0],
+                        review=rng.choice(REVIEWS),
+                        date_created=days_ago(365),
+                    )
+
+        with explicit_dates((ServiceRequest, 'date_requested')):
+            report('service requests', bulk_insert(ServiceRequest, service_requests(), batch_size))
+        with explicit_dates((Rating, 'date_created')):
+            report('ratings', bulk_insert(Rating, ratings(), batch_size))
+
+        # bulk_create bypasses the save hooks and signals that maintain these
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+        call_command('rebuild_request_counters', stdout=StringIO())
+        invalidate_home_cache()
+        bump_catalog_version()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Seeded scale {scale} data in {time.perf_counter() - started:.1f}s')
+        )
@@ -0,0 +1,48 @@
+import time
+from django.core.management.base import BaseCommand
+from prometheus_client import start_http_server
+from services.outbox import drain
+from xpertshub import metrics
+import logging
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Deliver emails queued in the outbox, polling until stopped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50, help='Emails claimed per batch')
+        parser.add_argument('--poll-interval', type=float, default=5.0, help='Seconds to sleep when the outbox is empty')
+        parser.add_argument('--once', action='store_true', help='Drain everything currently due, then exit')
+        parser.add_argument(
+            '--metrics-port', type=int, help='Serve this worker\'s email metrics for Prometheus on this port'
+        )
+
+    def handle(self, *args, **options):
+        if options['metrics_port']:
+            # The worker usually runs apart from the web processes, so it exposes its own /metrics
+            start_http_server(options['metrics_port'], registry=metrics.registry())
+
+        total_sent = total_failed = 0
+        while True:
+            try:
+                sent, failed = drain(options['batch_size'])
+            except Exception as e:
+                # Leased rows are retried once their lease expires
+                logger.error(f"Outbox batch failed: {str(e)}")
+                if options['once']:
+                    raise
+                time.sleep(options['poll_interval'])
+                continue
+
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Sent {total_sent} emails, {total_failed} failed')
+        )
@@ -0,0 +1,57 @@
+import os
+from collections import defaultdict
+from django.core.management.base import BaseCommand
+from xpertshub import slow_queries
+
+class Command(BaseCommand):
+    help = 'Summarize the slow queries recorded in SLOW_QUERY_LOG, worst total time first'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=10, help='Query shapes to show')
+        parser.add_argument('--view', help='Only include queries run by this URL name')
+        parser.add_argument('--plans', action='store_true', help='Print the slowest sampled plan of each shape')
+        parser.add_argument('--clear', action='store_true', help='Delete the log after summarizing it')
+
+    def handle(self, *args, **options):
+        entries = slow_queries.read_log()
+        if options['view']:
+            entries = [entry for entry in entries if entry.get('view') == options['view']]
+        if not entries:
+            self.stdout.write('No slow queries recorded.')
+            return
+
+        shapes = defaultdict(list)
+        for entry in entries:
+            shapes[entry['fingerprint']].append(entry)
+        ranked = sorted(shapes.items(), key=lambda item: sum(entry['ms'] for entry in item[1]), reverse=True)
+
+        self.stdout.write(f'{len(entries)} slow queries in {len(shapes)} shapes')
+        for shape, runs in ranked[:options['limit']]:
+            durations = sorted(entry['ms'] for entry in runs)
+            total = sum(durations)
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'\n{len(runs)}x  total {total:.1f}ms  avg {total / len(runs):.1f}ms  max {durations[-1]:.1f}ms'
+            ))
+            self.stdout.write(self.style.SQL_KEYWORD(shape))
+
+            # The view, GET parameter combination and template behind each shape, most frequent first
+            callers = defaultdict(list)
+            for entry in runs:
+                caller = (entry.get('view') or '-', ','.join(entry.get('filters') or []) or '-', entry.get('template') or '-')
+                callers[caller].append(entry['ms'])
+            for (view, filters, template), times in sorted(callers.items(), key=lambda item: len(item[1]), reverse=True)[:5]:
+                self.stdout.write(f'    {len(times)}x view={view} filters={filters} template={template} max {max(times):.1f}ms')
+
+            if options['plans']:
+                explained = [entry for entry in runs if entry.get('plan')]
+                if explained:
+                    slowest = max(explained, key=lambda entry: entry['ms'])
+                    self.stdout.write(f"    plan ({slowest['ms']:.1f}ms, filters={','.join(slowest['filters']) or '-'}):")
+                    for line in slowest['plan']:
+                        self.stdout.write(f'        {line}')
+
+        if options['clear']:
+            for path in slow_queries.log_paths():
+                if os.path.exists(path):
+                    os.remove(path)
+            self.stdout.write(self.style.SUCCESS('Cleared the slow query log'))
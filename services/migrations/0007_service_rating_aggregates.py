@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:54
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Service = apps.get_model('services', 'Service')
+    Rating = apps.get_model('services', 'Rating')
+    totals = Rating.objects.values('service').annotate(
+        total=Sum('rating'), count=Count('pk'), average=Avg('rating')
+    )
+    for row in totals.iterator():
+        Service.objects.filter(pk=row['service']).update(
+            rating_sum=row['total'],
+            rating_count=row['count'],
+            rating_avg=row['average'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0006_alter_service_image'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
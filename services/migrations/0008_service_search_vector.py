@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:56
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    # GIN indexes and tsvector columns only exist on PostgreSQL
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "CREATE INDEX services_service_search_vector_gin "
+        "ON services_service USING gin (search_vector)"
+    )
+    schema_editor.execute(
+        "UPDATE services_service AS s SET search_vector = "
+        "setweight(to_tsvector('english', COALESCE(s.name, '')), 'A') || "
+        "setweight(to_tsvector('english', COALESCE(u.username, '')), 'B') || "
+        "setweight(to_tsvector('english', COALESCE(s.description, '')), 'C') "
+        "FROM users_user AS u WHERE u.id = s.company_id"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("DROP INDEX IF EXISTS services_service_search_vector_gin")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0007_service_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:30
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def backfill_pending_requests_count(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    ServiceRequest = apps.get_model('services', 'ServiceRequest')
+    totals = ServiceRequest.objects.filter(service__status='approved').values(
+        'service__company'
+    ).annotate(total=Count('pk'))
+    for row in totals.iterator():
+        User.objects.filter(pk=row['service__company']).update(pending_requests_count=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0009_emailoutbox'),
+        ('users', '0002_user_pending_requests_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_pending_requests_count, migrations.RunPython.noop),
+    ]
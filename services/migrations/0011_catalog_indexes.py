@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0010_backfill_pending_requests_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['service', '-date_created'], name='rating_service_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['status', 'field', '-date_created'], name='service_status_field_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['status', 'price_per_hour'], name='service_status_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['company', '-date_created', '-id'], name='service_company_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(condition=models.Q(('status', 'approved')), fields=['-date_created', '-id'], name='service_approved_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(condition=models.Q(('status', 'approved')), fields=['-rating_avg', '-date_created'], name='service_approved_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['service', '-date_requested', '-id'], name='request_service_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['customer', '-date_requested', '-id'], name='request_customer_recent_idx'),
+        ),
+    ]
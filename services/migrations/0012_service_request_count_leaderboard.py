@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_request_count(apps, schema_editor):
+    Service = apps.get_model('services', 'Service')
+    ServiceRequest = apps.get_model('services', 'ServiceRequest')
+    totals = ServiceRequest.objects.values('service').annotate(total=Count('pk'))
+    for row in totals.iterator():
+        Service.objects.filter(pk=row['service']).update(request_count=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0011_catalog_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('rank', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('request_count', models.PositiveIntegerField()),
+                ('window_days', models.PositiveIntegerField()),
+                ('date_refreshed', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name_plural': 'leaderboard entries',
+                'ordering': ['rank'],
+            },
+        ),
+        migrations.AddField(
+            model_name='service',
+            name='request_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_request_count, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(condition=models.Q(('status', 'approved')), fields=['-request_count', '-date_created'], name='service_approved_popular_idx'),
+        ),
+        migrations.AddField(
+            model_name='leaderboardentry',
+            name='service',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entry', to='services.service'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:20
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_date_updated(apps, schema_editor):
+    Service = apps.get_model('services', 'Service')
+    Service.objects.update(date_updated=Coalesce('date_approved', 'date_created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0012_service_request_count_leaderboard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='service',
+            name='date_updated',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_date_updated, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,12 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Q, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.utils import timezone
+from .blobs import ContentAddressedImageField
+from .search import build_search_vector, supports_full_text_search
 
 class Service(models.Model):
     FIELD_OF_WORK_CHOICES = [
@@ -27,10 +33,16 @@ class Service(models.Model):
     description = models.TextField()
     field = models.CharField(max_length=50, choices=FIELD_OF_WORK_CHOICES)
     price_per_hour = models.DecimalField(max_digits=10, decimal_places=2)
-    image = models.ImageField(upload_to='service_images/')
+    # Stored once per distinct file content and shared through ImageBlob (services.blobs)
+    image = ContentAddressedImageField(upload_to='service_images/')
+    # {format: {width: stored name}} of the image's resized copies, filled in by the image worker
+    # (services.image_uploads); empty until then, {'error': ...} if the image could not be resized
+    image_derivatives = models.JSONField(default=dict, blank=True, editable=False)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     date_created = models.DateTimeField(auto_now_add=True)
     date_approved = models.DateTimeField(null=True, blank=True)
+    # Bumped by every change that alters how the service renders, including rating aggregates
+    date_updated = models.DateTimeField(auto_now=True)
     approved_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -44,20 +56,72 @@ class Service(models.Model):
         related_name='services_provided',
         limit_choices_to={'user_type': 'company'}
     )
+    # Denormalized rating aggregates, maintained by Rating.save()/delete()
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_avg = models.FloatField(default=0, editable=False)
+    # Number of requests ever made for this service, maintained by services.signals
+    request_count = models.PositiveIntegerField(default=0, editable=False)
+    # Weighted full-text document, only populated on PostgreSQL (GIN indexed in 0008)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    SEARCH_SOURCE_FIELDS = {'name', 'description', 'company'}
+
+    class Meta:
+        # Match the catalog's filters (status, field, price) and sort keys; the
+        # partial indexes only hold approved rows, which is all the public pages read
+        indexes = [
+            models.Index(fields=['status', 'field', '-date_created'], name='service_status_field_idx'),
+            models.Index(fields=['status', 'price_per_hour'], name='service_status_price_idx'),
+            models.Index(fields=['company', '-date_created', '-id'], name='service_company_recent_idx'),
+            models.Index(
+                fields=['-date_created', '-id'], condition=Q(status='approved'), name='service_approved_recent_idx'
+            ),
+            models.Index(
+                fields=['-rating_avg', '-date_created'], condition=Q(status='approved'), name='service_approved_rating_idx'
+            ),
+            models.Index(
+                fields=['-request_count', '-date_created'], condition=Q(status='approved'), name='service_approved_popular_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.name} - {self.get_status_display()}"
 
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+            if update_fields is None or self.SEARCH_SOURCE_FIELDS & set(update_fields):
+                self.update_search_vector()
+
+    def update_search_vector(self):
+        """Recompute the stored search document for this service"""
+        if not supports_full_text_search(self._state.db):
+            return
+        Service.objects.using(self._state.db).filter(pk=self.pk).update(
+            search_vector=build_search_vector(self.name, self.company.username, self.description)
+        )
+
     @property
     def average_rating(self):
-        ratings = self.ratings.all()
-        if ratings:
-            return sum(r.rating for r in ratings) / len(ratings)
-        return 0
+        return self.rating_avg
 
-    @property
-    def rating_count(self):
-        return self.ratings.count()
+    @classmethod
+    def apply_rating_delta(cls, service_id, sum_delta, count_delta):
+        """Atomically shift the stored rating aggregates of a service"""
+        new_sum = F('rating_sum') + sum_delta
+        new_count = F('rating_count') + count_delta
+        cls.objects.filter(pk=service_id).update(
+            date_updated=timezone.now(),
+            rating_sum=new_sum,
+            rating_count=new_count,
+            rating_avg=Case(
+                When(rating_count=-count_delta, then=Value(0.0)),
+                default=Cast(new_sum, FloatField()) / Cast(new_count, FloatField()),
+                output_field=FloatField(),
+            ),
+        )
 
 class ServiceRequest(models.Model):
     service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='requests')
@@ -71,6 +135,12 @@ class ServiceRequest(models.Model):
     service_time_hours = models.DecimalField(max_digits=5, decimal_places=2)
     date_requested = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['service', '-date_requested', '-id'], name='request_service_recent_idx'),
+            models.Index(fields=['customer', '-date_requested', '-id'], name='request_customer_recent_idx'),
+        ]
+
     @property
     def calculated_cost(self):
         return self.service.price_per_hour * self.service_time_hours
@@ -78,6 +148,48 @@ class ServiceRequest(models.Model):
     def __str__(self):
         return f"Request for {self.service.name} by {self.customer.username}"
 
+def recount_pending_requests(company_ids=None):
+    """Recompute the denormalized pending request counter for companies"""
+    from django.contrib.auth import get_user_model
+
+    counts = ServiceRequest.objects.filter(
+        service__company=OuterRef('pk'), service__status='approved'
+    ).order_by().values('service__company').annotate(total=Count('pk')).values('total')
+    companies = get_user_model().objects.filter(user_type='company')
+    if company_ids is not None:
+        companies = companies.filter(pk__in=company_ids)
+    return companies.update(
+        pending_requests_count=Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+    )
+
+def recount_service_requests(service_ids=None):
+    """Recompute the denormalized all-time request counter for services"""
+    counts = ServiceRequest.objects.filter(
+        service=OuterRef('pk')
+    ).order_by().values('service').annotate(total=Count('pk')).values('total')
+    services = Service.objects.all()
+    if service_ids is not None:
+        services = services.filter(pk__in=service_ids)
+    return services.update(request_count=Coalesce(Subquery(counts, output_field=IntegerField()), 0))
+
+class LeaderboardEntry(models.Model):
+    """
+    Most requested approved services over a recent window, rebuilt by
+    manage.py refresh_leaderboard rather than computed per page view.
+    """
+    rank = models.PositiveIntegerField(primary_key=True)
+    service = models.OneToOneField(Service, on_delete=models.CASCADE, related_name='leaderboard_entry')
+    request_count = models.PositiveIntegerField()
+    window_days = models.PositiveIntegerField()
+    date_refreshed = models.DateTimeField()
+
+    class Meta:
+        ordering = ['rank']
+        verbose_name_plural = 'leaderboard entries'
+
+    def __str__(self):
+        return f"#{self.rank} {self.service.name} ({self.request_count} requests)"
+
 class Rating(models.Model):
     service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='ratings')
     customer = models.ForeignKey(
@@ -92,6 +204,111 @@ class Rating(models.Model):
 
     class Meta:
         unique_together = ('service', 'customer')
+        indexes = [
+            models.Index(fields=['service', '-date_created'], name='rating_service_recent_idx'),
+        ]
 
     def __str__(self):
         return f"{self.customer.username} rated {self.service.name}: {self.rating}/5"
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = None
+            if self.pk:
+                previous = Rating.objects.select_for_update().filter(pk=self.pk).values(
+                    'service_id', 'rating'
+                ).first()
+            super().save(*args, **kwargs)
+
+            if previous is None:
+                Service.apply_rating_delta(self.service_id, self.rating, 1)
+            elif previous['service_id'] != self.service_id:
+                Service.apply_rating_delta(previous['service_id'], -previous['rating'], -1)
+                Service.apply_rating_delta(self.service_id, self.rating, 1)
+            elif previous['rating'] != self.rating:
+                Service.apply_rating_delta(self.service_id, self.rating - previous['rating'], 0)
+        self._refresh_cached_service()
+
+    def delete(self, *args, **kwargs):
+        # The aggregates themselves are adjusted by the post_delete handler in
+        # services.signals so that queryset and cascade deletes are covered too
+        result = super().delete(*args, **kwargs)
+        self._refresh_cached_service()
+        return result
+
+    def _refresh_cached_service(self):
+        """Keep an already-loaded service instance in step with the stored aggregates"""
+        if Rating.service.is_cached(self):
+            self.service.refresh_from_db(fields=['rating_sum', 'rating_count', 'rating_avg'])
+
+class EmailOutbox(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    html_message = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+    date_sent = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'email outbox'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {self.to_email} ({self.get_status_display()})"
+
+class ImageBlob(models.Model):
+    """
+    One stored image file, shared by every service whose upload had the same
+    SHA-256 and deleted by services.blobs.release() when the last one lets go.
+    """
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    # Stored names of the resized copies, shared by every service using the blob and deleted with it
+    derivatives = models.JSONField(default=dict, blank=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.ref_count} references)"
+
+class ImageUpload(models.Model):
+    """
+    A service image staged on local disk, waiting for the image worker to push
+    it to media storage and generate its derivatives (services.image_uploads).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='image_uploads')
+    # Name of the staged file in IMAGE_STAGING_ROOT, and the name it was uploaded with
+    staged_name = models.CharField(max_length=255)
+    original_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+    date_processed = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='upload_status_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.original_name} for {self.service.name} ({self.get_status_display()})"
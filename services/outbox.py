@@ -0,0 +1,106 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from xpertshub.metrics import observe_email
+from .models import EmailOutbox
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+def get_outbox_backend():
+    """Dotted path of the email backend the outbox worker delivers through"""
+    backend = _setting('EMAIL_OUTBOX_BACKEND', None)
+    if backend:
+        return backend
+    if not settings.DEBUG and getattr(settings, 'SENDGRID_API_KEY', ''):
+        return 'services.email_backends.SendGridBackend'
+    return None  # Falls back to settings.EMAIL_BACKEND
+
+def retry_delay(attempts):
+    """Exponential backoff: base * 2^(attempts - 1), capped"""
+    base = _setting('EMAIL_OUTBOX_RETRY_BASE_SECONDS', 30)
+    cap = _setting('EMAIL_OUTBOX_RETRY_MAX_SECONDS', 3600)
+    return timedelta(seconds=min(cap, base * 2 ** max(attempts - 1, 0)))
+
+def claim_batch(batch_size):
+    """
+    Lease a batch of due emails to this worker.
+
+    Rows are locked with SELECT ... FOR UPDATE SKIP LOCKED so concurrent workers
+    never claim the same email, then pushed past the lease window and committed
+    before any network I/O happens. A worker that dies mid-send leaves its rows
+    to be reclaimed once the lease expires.
+    """
+    now = timezone.now()
+    lease = timedelta(seconds=_setting('EMAIL_OUTBOX_LEASE_SECONDS', 300))
+    with transaction.atomic():
+        ids = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        EmailOutbox.objects.filter(pk__in=ids).update(
+            attempts=F('attempts') + 1,
+            next_attempt_at=now + lease,
+        )
+    return list(EmailOutbox.objects.filter(pk__in=ids).order_by('next_attempt_at', 'pk'))
+
+def deliver(entry, connection):
+    """Send a claimed email and record the outcome"""
+    message = EmailMultiAlternatives(
+        subject=entry.subject,
+        body='',
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[entry.to_email],
+        connection=connection,
+    )
+    message.attach_alternative(entry.html_message, 'text/html')
+
+    started = time.perf_counter()
+    try:
+        message.send()
+    except Exception as e:
+        observe_email('outbox', False, time.perf_counter() - started)
+        max_attempts = _setting('EMAIL_OUTBOX_MAX_ATTEMPTS', 5)
+        if entry.attempts >= max_attempts:
+            entry.status = 'failed'
+        else:
+            entry.next_attempt_at = timezone.now() + retry_delay(entry.attempts)
+        entry.last_error = str(e)
+        entry.save(update_fields=['status', 'next_attempt_at', 'last_error'])
+        logger.error(f"Outbox email {entry.pk} to {entry.to_email} failed (attempt {entry.attempts}): {str(e)}")
+        return False
+
+    observe_email('outbox', True, time.perf_counter() - started)
+    entry.status = 'sent'
+    entry.date_sent = timezone.now()
+    entry.last_error = ''
+    entry.save(update_fields=['status', 'date_sent', 'last_error'])
+    logger.info(f"Outbox email {entry.pk} sent to {entry.to_email}")
+    return True
+
+def drain(batch_size=50):
+    """Deliver one batch of due emails; returns (sent, failed)"""
+    entries = claim_batch(batch_size)
+    if not entries:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection(get_outbox_backend())
+    with connection:
+        for entry in entries:
+            if deliver(entry, connection):
+                sent += 1
+            else:
+                failed += 1
+    return sent, failed
@@ -0,0 +1,138 @@
+import hashlib
+import time
+from functools import wraps
+from asgiref.sync import iscoroutinefunction
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+# The only query parameters the cached views read; anything else (tracking tags etc.) shares an entry
+CACHED_QUERY_PARAMS = ('search', 'category', 'min_price', 'max_price', 'sort', 'page', 'cursor')
+
+# Values the views treat exactly like a missing parameter
+DEFAULT_QUERY_VALUES = {'category': 'all', 'sort': 'relevance', 'page': '1'}
+
+def _version_key(namespace):
+    return f'pages:{namespace}:version'
+
+def get_page_version(namespace):
+    """Current version of a page namespace; cached pages from older versions are never read"""
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock so a cache that lost the counter cannot resurrect an old version
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+def bump_page_version(namespace):
+    """
+    Orphan every cached page in a namespace now and again once the surrounding
+    transaction commits, so a concurrent request cannot re-cache pre-commit HTML.
+    """
+    def bump():
+        try:
+            cache.incr(_version_key(namespace))
+        except ValueError:
+            # No counter yet; the next reader starts a fresh one
+            pass
+
+    bump()
+    transaction.on_commit(bump)
+
+def bump_catalog_version():
+    bump_page_version('catalog')
+
+def normalized_query(request):
+    """Query string reduced to the parameters that change the page, in a fixed order"""
+    params = []
+    for name in CACHED_QUERY_PARAMS:
+        value = request.GET.get(name, '')
+        if value and value != DEFAULT_QUERY_VALUES.get(name):
+            params.append((name, value))
+    return urlencode(params)
+
+async def aget_page_version(namespace):
+    key = _version_key(namespace)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+    return version
+
+def _digest(request):
+    return hashlib.md5(f'{request.path}?{normalized_query(request)}'.encode()).hexdigest()
+
+def page_cache_key(request, namespace):
+    return f'pages:{namespace}:{get_page_version(namespace)}:{_digest(request)}'
+
+async def apage_cache_key(request, namespace):
+    return f'pages:{namespace}:{await aget_page_version(namespace)}:{_digest(request)}'
+
+def _is_cacheable(request, user):
+    timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', 0)
+    return bool(timeout) and request.method in ('GET', 'HEAD') and not user.is_authenticated
+
+def _revalidate(request, response):
+    """Answer revalidations of a cached page from the validators stored with it"""
+    return get_conditional_response(
+        request,
+        etag=response.get('ETag'),
+        last_modified=parse_http_date_safe(response.get('Last-Modified', '')),
+        response=response,
+    )
+
+def _store(request, key, response):
+    def store(response):
+        # Never share responses that set cookies or embed a CSRF token
+        if response.status_code != 200 or response.cookies:
+            return
+        if request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+            return
+        cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+
+    if hasattr(response, 'render') and callable(response.render):
+        response.add_post_render_callback(store)
+    else:
+        store(response)
+
+def cache_anonymous_page(namespace):
+    """
+    Serve a view's rendered response to anonymous visitors from the cache.
+
+    Logged-in users always get a fresh render, since pages show their navbar
+    and per-user state. Entries expire after PAGE_CACHE_TIMEOUT seconds or as
+    soon as the namespace version is bumped. Works on sync and async views.
+    """
+    def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def async_wrapper(request, *args, **kwargs):
+                if not _is_cacheable(request, await request.auser()):
+                    return await view_func(request, *args, **kwargs)
+                key = await apage_cache_key(request, namespace)
+                response = await cache.aget(key)
+                if response is not None:
+                    return _revalidate(request, response)
+                response = await view_func(request, *args, **kwargs)
+                _store(request, key, response)
+                return response
+            return async_wrapper
+
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not _is_cacheable(request, request.user):
+                return view_func(request, *args, **kwargs)
+            # Read the version before rendering so a write during the render orphans this entry
+            key = page_cache_key(request, namespace)
+            response = cache.get(key)
+            if response is not None:
+                return _revalidate(request, response)
+            response = view_func(request, *args, **kwargs)
+            _store(request, key, response)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,230 @@
+import base64
+import json
+from django.conf import settings
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.http import Http404
+from django.utils.translation import gettext as _
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class KeysetPage:
+    """A page of results addressed by opaque next/previous cursors instead of a page number"""
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by seeking past the last row seen rather than using OFFSET.
+
+    ``ordering`` lists model fields in order-by syntax and must end in a unique
+    field (normally ``id``) so every row has a distinct position. No COUNT(*) is
+    issued and every page costs the same as the first one.
+    """
+
+    NEXT = 'n'
+    PREVIOUS = 'p'
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = [
+            (name.lstrip('-'), name.startswith('-')) for name in ordering
+        ]
+
+    def page(self, cursor=None):
+        queryset, values, backwards = self._seek(cursor)
+        return self._build_page(list(queryset[:self.per_page + 1]), values, backwards)
+
+    async def apage(self, cursor=None):
+        """page() for async views, fetching the rows with the async ORM"""
+        queryset, values, backwards = self._seek(cursor)
+        rows = [row async for row in queryset[:self.per_page + 1]]
+        return self._build_page(rows, values, backwards)
+
+    def _seek(self, cursor):
+        direction, values = self.decode_cursor(cursor) if cursor else (self.NEXT, None)
+        backwards = direction == self.PREVIOUS
+
+        queryset = self.queryset.order_by(*self._order_by(reverse=backwards))
+        if values is not None:
+            queryset = queryset.filter(self._seek_filter(values, reverse=backwards))
+        return queryset, values, backwards
+
+    def _build_page(self, rows, values, backwards):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        if backwards:
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(self.NEXT, rows[-1])
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(self.PREVIOUS, rows[0])
+        return KeysetPage(rows, self, next_cursor, previous_cursor)
+
+    def encode_cursor(self, direction, obj):
+        values = [
+            self._field(name).value_to_string(obj) for name, _ in self.ordering
+        ]
+        payload = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, raw_values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if direction not in (self.NEXT, self.PREVIOUS) or len(raw_values) != len(self.ordering):
+                raise InvalidCursor(cursor)
+            values = [
+                self._field(name).to_python(raw)
+                for (name, _), raw in zip(self.ordering, raw_values)
+            ]
+        except InvalidCursor:
+            raise
+        except Exception as exc:
+            raise InvalidCursor(cursor) from exc
+        return direction, values
+
+    def _field(self, name):
+        return self.queryset.model._meta.get_field(name)
+
+    def _order_by(self, reverse=False):
+        return [
+            f"{'-' if descending != reverse else ''}{name}" for name, descending in self.ordering
+        ]
+
+    def _seek_filter(self, values, reverse=False):
+        """Rows strictly after ``values`` in the (possibly reversed) ordering"""
+        seek = Q()
+        equal_prefix = Q()
+        for (name, descending), value in zip(self.ordering, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            seek |= equal_prefix & Q(**{f'{name}__{lookup}': value})
+            equal_prefix &= Q(**{name: value})
+
+        # Redundant bound on the leading column so the planner can range-scan its index
+        name, descending = self.ordering[0]
+        lookup = 'lte' if descending != reverse else 'gte'
+        return Q(**{f'{name}__{lookup}': values[0]}) & seek
+
+
+class KeysetPaginationMixin:
+    """
+    Opt-in cursor pagination for ListViews.
+
+    Active when ``settings.KEYSET_PAGINATION`` is on or the request already
+    carries a ``cursor`` parameter, and the view returns an ordering from
+    ``get_keyset_ordering()``. Otherwise the regular offset paginator is used.
+    """
+
+    cursor_kwarg = 'cursor'
+    keyset_ordering = None
+
+    def get_keyset_ordering(self):
+        return self.keyset_ordering
+
+    def uses_keyset_pagination(self):
+        if self.get_keyset_ordering() is None:
+            return False
+        return getattr(settings, 'KEYSET_PAGINATION', False) or self.cursor_kwarg in self.request.GET
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.uses_keyset_pagination():
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = KeysetPaginator(queryset, page_size, self.get_keyset_ordering())
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg) or None)
+        except InvalidCursor:
+            raise Http404('Invalid cursor.')
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['keyset_pagination'] = isinstance(context.get('page_obj'), KeysetPage)
+        return context
+
+
+class AsyncPaginationMixin:
+    """
+    Serve a paginated ListView from an async handler.
+
+    The page is fetched with the async ORM before ``get_context_data()`` runs,
+    which then reuses it instead of paginating synchronously. Works with both
+    offset pages and ``KeysetPaginationMixin``.
+    """
+
+    async def get(self, request, *args, **kwargs):
+        self.object_list = self.get_queryset()
+        self.fetched_page = await self.apaginate_queryset(
+            self.object_list, self.get_paginate_by(self.object_list)
+        )
+        return self.render_to_response(self.get_context_data())
+
+    def paginate_queryset(self, queryset, page_size):
+        return self.fetched_page
+
+    async def apaginate_queryset(self, queryset, page_size):
+        if isinstance(self, KeysetPaginationMixin) and self.uses_keyset_pagination():
+            paginator = KeysetPaginator(queryset, page_size, self.get_keyset_ordering())
+            try:
+                page = await paginator.apage(self.request.GET.get(self.cursor_kwarg) or None)
+            except InvalidCursor:
+                raise Http404('Invalid cursor.')
+            return paginator, page, page.object_list, page.has_other_pages()
+
+        paginator = self.get_paginator(
+            queryset, page_size,
+            orphans=self.get_paginate_orphans(),
+            allow_empty_first_page=self.get_allow_empty(),
+        )
+        # Prime the paginator's cached count so page() does not query synchronously
+        paginator.count = await queryset.acount()
+        page_number = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+        try:
+            page_number = int(page_number)
+        except ValueError:
+            if page_number != 'last':
+                raise Http404(_('Page is not “last”, nor can it be converted to an int.'))
+            page_number = paginator.num_pages
+        try:
+            page = paginator.page(page_number)
+        except InvalidPage as e:
+            raise Http404(_('Invalid page (%(page_number)s): %(message)s') % {
+                'page_number': page_number, 'message': str(e)
+            })
+        page.object_list = [obj async for obj in page.object_list]
+        return paginator, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,45 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.contrib.auth import get_user_model
+from django.db import connections
+from django.db.models import F, OuterRef, Q, Subquery, Value
+
+SEARCH_CONFIG = 'english'
+
+def supports_full_text_search(using):
+    """Full-text search relies on PostgreSQL's tsvector support"""
+    return connections[using].vendor == 'postgresql'
+
+def build_search_vector(name, company_username, description):
+    """Weighted search vector: name (A) > company (B) > description (C)"""
+    return (
+        SearchVector(Value(name), weight='A', config=SEARCH_CONFIG)
+        + SearchVector(Value(company_username), weight='B', config=SEARCH_CONFIG)
+        + SearchVector(Value(description), weight='C', config=SEARCH_CONFIG)
+    )
+
+def refresh_search_vectors(queryset):
+    """Recompute stored search documents in one UPDATE, for rows written without save()"""
+    if not supports_full_text_search(queryset.db):
+        return 0
+    company_username = Subquery(
+        get_user_model().objects.filter(pk=OuterRef('company_id')).values('username')[:1]
+    )
+    return queryset.update(search_vector=(
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(company_username, weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    ))
+
+def search_services(queryset, search_query):
+    """Filter services by a search query, annotating a relevance rank where supported"""
+    if not supports_full_text_search(queryset.db):
+        return queryset.filter(
+            Q(name__icontains=search_query) |
+            Q(description__icontains=search_query) |
+            Q(company__username__icontains=search_query)
+        )
+
+    query = SearchQuery(search_query, search_type='websearch', config=SEARCH_CONFIG)
+    return queryset.filter(search_vector=query).annotate(
+        search_rank=SearchRank(F('search_vector'), query)
+    )
@@ -0,0 +1,113 @@
+import threading
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import logging
+
+logger = logging.getLogger(__name__)
+
+# SendGrid accepts at most 1000 personalizations per Mail Send request
+MAX_PERSONALIZATIONS = 1000
+
+_client = None
+_client_lock = threading.Lock()
+
+class SendGridClient:
+    """
+    Thin SendGrid v3 Mail Send client over a pooled, keep-alive requests.Session.
+
+    The official SDK opens a new urllib connection (and TLS handshake) per call;
+    this client keeps connections open and reuses them across messages.
+    """
+
+    def __init__(self, api_key, host=None, pool_maxsize=None, timeout=None, max_retries=2):
+        self.host = (host or getattr(settings, 'SENDGRID_API_HOST', 'https://api.sendgrid.com')).rstrip('/')
+        self.timeout = timeout or getattr(settings, 'SENDGRID_TIMEOUT', 10)
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+        })
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_maxsize or getattr(settings, 'SENDGRID_POOL_MAXSIZE', 10),
+            # Only failures to connect are retried: a Mail Send POST that reached SendGrid
+            # may have been accepted even if it answered 5xx or timed out, so resending here
+            # could duplicate mail. The outbox worker retries those with backoff instead.
+            max_retries=Retry(
+                total=max_retries,
+                connect=max_retries,
+                read=0,
+                status=0,
+                other=0,
+                backoff_factor=0.5,
+            ),
+        )
+        self.session.mount(self.host, adapter)
+
+    def send(self, message):
+        """Send a sendgrid.helpers.mail.Mail (or its dict body); raises on non-2xx"""
+        body = message if isinstance(message, dict) else message.get()
+        response = self.session.post(f'{self.host}/v3/mail/send', json=body, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    def send_personalized(self, subject, html_content, recipients, from_email=None):
+        """
+        Send one template to many recipients with per-recipient substitutions.
+
+        ``recipients`` is an iterable of ``(to_email, substitutions)`` pairs, where
+        substitutions maps placeholders in the subject/html (e.g. ``-name-``) to
+        values. Recipients are packed up to 1000 per Mail Send request. Returns
+        the number of requests made.
+        """
+        requests_made = 0
+        batch = []
+        for recipient in recipients:
+            batch.append(recipient)
+            if len(batch) == MAX_PERSONALIZATIONS:
+                self._send_personalized_batch(subject, html_content, batch, from_email)
+                requests_made += 1
+                batch = []
+        if batch:
+            self._send_personalized_batch(subject, html_content, batch, from_email)
+            requests_made += 1
+        return requests_made
+
+    def _send_personalized_batch(self, subject, html_content, batch, from_email):
+        from sendgrid.helpers.mail import Mail, Personalization, Substitution, To
+
+        message = Mail(
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            subject=subject,
+            html_content=html_content,
+        )
+        for to_email, substitutions in batch:
+            personalization = Personalization()
+            personalization.add_to(To(to_email))
+            for key, value in (substitutions or {}).items():
+                personalization.add_substitution(Substitution(key, str(value)))
+            message.add_personalization(personalization)
+        self.send(message)
+
+    def close(self):
+        self.session.close()
+
+def get_sendgrid_client():
+    """Process-wide pooled client, created on first use"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = SendGridClient(api_key=settings.SENDGRID_API_KEY)
+    return _client
+
+def reset_sendgrid_client():
+    """Close and drop the shared client (e.g. after settings change or fork)"""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
@@ -0,0 +1,97 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import F
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from .blobs import release
+from .models import Service, ServiceRequest, Rating, recount_pending_requests
+from .page_cache import bump_catalog_version
+from .search import refresh_search_vectors
+
+@receiver(post_delete, sender=Rating)
+def remove_rating_from_aggregates(sender, instance, **kwargs):
+    """Subtract a deleted rating from its service's stored aggregates"""
+    Service.apply_rating_delta(instance.service_id, -instance.rating, -1)
+
+def _shift_pending_requests(service_id, delta):
+    get_user_model().objects.filter(
+        services_provided__pk=service_id,
+        services_provided__status='approved',
+    ).update(pending_requests_count=F('pending_requests_count') + delta)
+
+def _shift_service_requests(service_id, delta):
+    Service.objects.filter(pk=service_id).update(request_count=F('request_count') + delta)
+
+@receiver(post_save, sender=ServiceRequest)
+def count_new_request(sender, instance, created, **kwargs):
+    """Increment the service's request count and the company's pending counter"""
+    if created:
+        _shift_service_requests(instance.service_id, 1)
+        _shift_pending_requests(instance.service_id, 1)
+
+@receiver(post_delete, sender=ServiceRequest)
+def uncount_deleted_request(sender, instance, **kwargs):
+    _shift_service_requests(instance.service_id, -1)
+    _shift_pending_requests(instance.service_id, -1)
+
+@receiver(post_save, sender=Service)
+def recount_company_requests(sender, instance, **kwargs):
+    """A status change moves all of a service's requests in or out of the count"""
+    recount_pending_requests([instance.company_id])
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def purge_catalog_pages(sender, **kwargs):
+    """Cached catalog and detail pages show services and their ratings"""
+    bump_catalog_version()
+
+def _image_name(instance):
+    # None when the image column was deferred, i.e. not loaded and not assigned
+    value = instance.__dict__.get('image')
+    return getattr(value, 'name', value)
+
+@receiver(post_init, sender=Service)
+def remember_image(sender, instance, **kwargs):
+    instance._stored_image_name = _image_name(instance)
+
+@receiver(pre_save, sender=Service)
+def forget_replaced_derivatives(sender, instance, **kwargs):
+    """A new image shows as the original until the image worker records its resized copies"""
+    current = _image_name(instance)
+    if current is not None and current != instance._stored_image_name:
+        instance.image_derivatives = {}
+
+@receiver(post_save, sender=Service)
+def release_replaced_image(sender, instance, created, **kwargs):
+    """Give up the previous image's blob reference when a service's image changes"""
+    current = _image_name(instance)
+    if current is None:
+        return
+    if not created and instance._stored_image_name and instance._stored_image_name != current:
+        release(instance._stored_image_name)
+    instance._stored_image_name = current
+
+@receiver(post_delete, sender=Service)
+def release_deleted_image(sender, instance, **kwargs):
+    release(_image_name(instance))
+
+@receiver(post_init, sender=settings.AUTH_USER_MODEL)
+def remember_username(sender, instance, **kwargs):
+    # None when the username column was deferred
+    instance._stored_username = instance.__dict__.get('username')
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def refresh_renamed_company_services(sender, instance, created, **kwargs):
+    """A company's services are searchable by its username, stored in their search vectors"""
+    current = instance.__dict__.get('username')
+    if created or current is None:
+        return
+    if instance._stored_username is not None and instance._stored_username != current:
+        services = Service.objects.filter(company=instance)
+        if services.exists():
+            refresh_search_vectors(services)
+            # Catalog cards and detail pages show the company name too
+            bump_catalog_version()
+    instance._stored_username = current
@@ -1,16 +1,19 @@
 from django import template
-from services.models import ServiceRequest
+from ..images import has_derivatives, smallest_url, srcset
 
 register = template.Library()
 
 @register.simple_tag
 def get_pending_requests_count(user):
-    """Get count of pending service requests for a company"""
+    """
+    Get count of pending service requests for a company.
+
+    Reads the denormalized counter on the user row that AuthenticationMiddleware
+    already loaded, so the navbar costs no extra query and the value is fixed
+    for the life of the request.
+    """
     if user.is_authenticated and user.user_type == 'company':
-        return ServiceRequest.objects.filter(
-            service__company=user,
-            service__status='approved'
-        ).count()
+        return user.pending_requests_count
     return 0
 
 @register.inclusion_tag('xpertshub_app/components/rating_display.html')
@@ -23,3 +26,23 @@ def show_rating(average_rating, rating_count, star_size="text-sm", text_size="te
         'text_size': text_size,
         'rating_text': rating_text,
     }
+
+@register.inclusion_tag('services/components/responsive_image.html')
+def responsive_image(service, alt, css_class='', sizes='100vw'):
+    """
+    Render a service image as WebP and JPEG thumbnails with srcset, so cards
+    download a copy sized for the layout instead of the original upload. Images
+    the worker has not resized yet are shown as the original.
+    """
+    context = {'alt': alt, 'css_class': css_class, 'sizes': sizes, 'webp_srcset': ''}
+    derivatives = service.image_derivatives
+    if has_derivatives(derivatives):
+        storage = service.image.storage
+        context.update({
+            'src': smallest_url(storage, derivatives),
+            'webp_srcset': srcset(storage, derivatives, 'webp'),
+            'jpeg_srcset': srcset(storage, derivatives, 'jpeg'),
+        })
+    else:
+        context['src'] = service.image.url
+    return context
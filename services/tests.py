@@ -1,8 +1,48 @@
-from django.test import TestCase, Client
+import hashlib
+import os
+import posixpath
+import shutil
+import tempfile
+import requests
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest.mock import patch
+from django.core import mail
+from django.contrib.admin.sites import site as admin_site
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404
+from django.test import AsyncRequestFactory, TestCase, Client, override_settings
+from django.template import Context, Template
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from .models import Service, ServiceRequest, Rating
+from django.utils import timezone
+from .models import Service, ServiceRequest, Rating, EmailOutbox, ImageBlob, ImageUpload, LeaderboardEntry
+from . import image_uploads
+from .admin import ServiceAdmin
+from .blobs import BLOB_DIRECTORY
+from .images import derivative_name
+from .checks import page_cache_backend_check
+from .outbox import drain
+from .views import (
+    AsyncAllServicesView, AsyncServiceDetailView, AsyncServicesByCategoryView, get_most_requested_services
+)
+from .fake_sendgrid import FakeSendGridServer
+from .sendgrid_client import SendGridClient
+from .templatetags.service_tags import get_pending_requests_count
+from PIL import Image
+from sendgrid.helpers.mail import Mail
 from users.models import User
+from xpertshub_app.views import async_home
 
 class ServiceCreationTests(TestCase):
     def setUp(self):
@@ -217,6 +257,316 @@ class ServiceRequestTests(TestCase):
         response = self.client.get(reverse('service_requests'))
         self.assertEqual(response.status_code, 302)  # Redirect to home
 
+class FailingEmailBackend(BaseEmailBackend):
+    def send_messages(self, email_messages):
+        raise ConnectionError('provider unavailable')
+
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.customer = User.objects.create_user(
+            username='customer',
+            email='customer@test.com',
+            password='testpass123',
+            user_type='customer'
+        )
+        self.company = User.objects.create_user(
+            username='company',
+            email='company@test.com',
+            password='testpass123',
+            user_type='company',
+            field_of_work='Plumbing'
+        )
+        self.service = Service.objects.create(
+            name='Test Service',
+            description='Test service',
+            field='Plumbing',
+            price_per_hour=50.00,
+            company=self.company,
+            status='approved'
+        )
+
+    def request_service(self):
+        self.client.login(username='customer@test.com', password='testpass123')
+        return self.client.post(reverse('request_service', kwargs={'service_id': self.service.pk}), {
+            'address': '123 Test Street',
+            'service_time_hours': 2
+        })
+
+    def test_request_queues_emails_without_sending(self):
+        """Test requesting a service writes both emails to the outbox instead of sending"""
+        response = self.request_service()
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(
+            set(EmailOutbox.objects.filter(status='pending').values_list('to_email', flat=True)),
+            {'customer@test.com', 'company@test.com'}
+        )
+
+    def test_worker_delivers_queued_emails(self):
+        """Test the worker command drains the outbox through the configured backend"""
+        self.request_service()
+        out = StringIO()
+        call_command('send_queued_emails', '--once', stdout=out)
+
+        self.assertIn('Sent 2 emails', out.getvalue())
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(EmailOutbox.objects.filter(status='sent').count(), 2)
+        subjects = {message.subject for message in mail.outbox}
+        self.assertIn('Service Request Confirmed - Test Service', subjects)
+        self.assertIn('New Service Request - Test Service', subjects)
+
+    @override_settings(EMAIL_OUTBOX_BACKEND='services.tests.FailingEmailBackend', EMAIL_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failed_delivery_backs_off_then_gives_up(self):
+        """Test failed sends are rescheduled with backoff and marked failed after max attempts"""
+        entry = EmailOutbox.objects.create(to_email='x@test.com', subject='Hello', html_message='<p>Hi</p>')
+
+        self.assertEqual(drain(), (0, 1))
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'pending')
+        self.assertEqual(entry.attempts, 1)
+        self.assertGreater(entry.next_attempt_at, timezone.now())
+        self.assertIn('provider unavailable', entry.last_error)
+
+        # Not due yet, so nothing is claimed
+        self.assertEqual(drain(), (0, 0))
+
+        EmailOutbox.objects.filter(pk=entry.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(drain(), (0, 1))
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'failed')
+        self.assertEqual(entry.attempts, 2)
+
+class SendGridClientTests(TestCase):
+    def test_pooled_client_reuses_connection(self):
+        """Test consecutive sends share a single keep-alive connection"""
+        with FakeSendGridServer() as server:
+            client = SendGridClient(api_key='test', host=server.url)
+            for i in range(5):
+                client.send(Mail(
+                    from_email='noreply@test.com',
+                    to_emails=f'user{i}@test.com',
+                    subject='Hello',
+                    html_content='<p>Hello</p>'
+                ))
+            client.close()
+
+        self.assertEqual(len(server.requests), 5)
+        self.assertEqual(server.connections, 1)
+        self.assertEqual(server.requests[0]['path'], '/v3/mail/send')
+
+    def test_server_errors_are_not_resent(self):
+        """Test a 5xx Mail Send response raises without resending a possibly delivered message"""
+        with FakeSendGridServer(status=502) as server:
+            client = SendGridClient(api_key='test', host=server.url)
+            with self.assertRaises(requests.HTTPError):
+                client.send({'personalizations': [{'to': [{'email': 'user@test.com'}]}]})
+            client.close()
+
+        self.assertEqual(len(server.requests), 1)
+
+    def test_personalized_batch_uses_one_request(self):
+        """Test bulk sends pack recipients and substitutions into one Mail Send call"""
+        recipients = [(f'user{i}@test.com', {'-name-': f'user{i}'}) for i in range(3)]
+        with FakeSendGridServer() as server:
+            client = SendGridClient(api_key='test', host=server.url)
+            requests_made = client.send_personalized(
+                'Hi -name-', '<p>Hi -name-</p>', recipients, from_email='noreply@test.com'
+            )
+            client.close()
+
+        self.assertEqual(requests_made, 1)
+        self.assertEqual(server.personalizations, 3)
+        personalization = server.requests[0]['body']['personalizations'][1]
+        self.assertEqual(personalization['to'][0]['email'], 'user1@test.com')
+        self.assertEqual(personalization['substitutions'], {'-name-': 'user1'})
+
+    def test_personalized_batch_splits_at_sendgrid_limit(self):
+        """Test recipients beyond 1000 are sent in additional requests"""
+        recipients = [(f'user{i}@test.com', {}) for i in range(1001)]
+        with FakeSendGridServer() as server:
+            client = SendGridClient(api_key='test', host=server.url)
+            self.assertEqual(client.send_personalized('Hi', '<p>Hi</p>', recipients, from_email='noreply@test.com'), 2)
+            client.close()
+
+        self.assertEqual(server.personalizations, 1001)
+
+class PendingRequestsCounterTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.customer = User.objects.create_user(
+            username='customer',
+            email='customer@test.com',
+            password='testpass123',
+            user_type='customer'
+        )
+        self.company = User.objects.create_user(
+            username='company',
+            email='company@test.com',
+            password='testpass123',
+            user_type='company',
+            field_of_work='Plumbing'
+        )
+        self.service = Service.objects.create(
+            name='Test Service',
+            description='Test service',
+            field='Plumbing',
+            price_per_hour=50.00,
+            company=self.company,
+            status='approved'
+        )
+
+    def create_request(self, service=None):
+        return ServiceRequest.objects.create(
+            service=service or self.service,
+            customer=self.customer,
+            address='123 Test Street',
+            service_time_hours=2
+        )
+
+    def pending_count(self):
+        return User.objects.get(pk=self.company.pk).pending_requests_count
+
+    def test_counter_tracks_created_and_deleted_requests(self):
+        """Test creating and deleting requests adjusts the company's counter"""
+        first = self.create_request()
+        self.create_request()
+        self.assertEqual(self.pending_count(), 2)
+
+        first.delete()
+        self.assertEqual(self.pending_count(), 1)
+
+    def test_requests_for_unapproved_services_are_not_counted(self):
+        """Test requests on pending services stay out of the counter until approval"""
+        pending = Service.objects.create(
+            name='Pending Service',
+            description='Awaiting approval',
+            field='Plumbing',
+            price_per_hour=40.00,
+            company=self.company
+        )
+        self.create_request(pending)
+        self.assertEqual(self.pending_count(), 0)
+
+        pending.status = 'approved'
+        pending.save()
+        self.assertEqual(self.pending_count(), 1)
+
+        pending.status = 'rejected'
+        pending.save()
+        self.assertEqual(self.pending_count(), 0)
+
+    def test_navbar_count_needs_no_query(self):
+        """Test the navbar tag reads the counter from the already-loaded user"""
+        self.create_request()
+        company = User.objects.get(pk=self.company.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_pending_requests_count(company), 1)
+
+    def test_navbar_shows_pending_count(self):
+        """Test company pages render the pending request badge"""
+        self.create_request()
+        self.client.login(username='company@test.com', password='testpass123')
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['request_count'], 1)
+
+    def test_rebuild_command_repairs_counter(self):
+        """Test the rebuild command recomputes counters from the requests table"""
+        self.create_request()
+        User.objects.filter(pk=self.company.pk).update(pending_requests_count=7)
+        call_command('rebuild_request_counters', stdout=StringIO())
+        self.assertEqual(self.pending_count(), 1)
+
+class RequestCountTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer',
+            email='customer@test.com',
+            password='testpass123',
+            user_type='customer'
+        )
+        self.company = User.objects.create_user(
+            username='company',
+            email='company@test.com',
+            password='testpass123',
+            user_type='company',
+            field_of_work='Plumbing'
+        )
+        self.services = [
+            Service.objects.create(
+                name=f'Service {i}',
+                description='Test service',
+                field='Plumbing',
+                price_per_hour=50.00,
+                company=self.company,
+                status='approved'
+            )
+            for i in range(3)
+        ]
+
+    def create_requests(self, service, count):
+        return [
+            ServiceRequest.objects.create(
+                service=service,
+                customer=self.customer,
+                address='123 Test Street',
+                service_time_hours=2
+            )
+            for _ in range(count)
+        ]
+
+    def request_count(self, service):
+        return Service.objects.get(pk=service.pk).request_count
+
+    def test_count_tracks_created_and_deleted_requests(self):
+        """Test creating and deleting requests adjusts the service's stored count"""
+        first, _ = self.create_requests(self.services[0], 2)
+        self.assertEqual(self.request_count(self.services[0]), 2)
+
+        first.delete()
+        self.assertEqual(self.request_count(self.services[0]), 1)
+
+    def test_rebuild_command_repairs_count(self):
+        """Test the rebuild command recomputes request counts from the requests table"""
+        self.create_requests(self.services[0], 2)
+        Service.objects.filter(pk=self.services[0].pk).update(request_count=9)
+        call_command('rebuild_request_counters', stdout=StringIO())
+        self.assertEqual(self.request_count(self.services[0]), 2)
+
+    def test_featured_services_read_stored_counts(self):
+        """Test featured services are ordered by the stored count without aggregating requests"""
+        self.create_requests(self.services[1], 3)
+        self.create_requests(self.services[2], 1)
+        with CaptureQueriesContext(connection) as queries:
+            featured = list(get_most_requested_services())
+        self.assertEqual(featured[:2], [self.services[1], self.services[2]])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('COUNT(', queries[0]['sql'].upper())
+        self.assertNotIn('JOIN', queries[0]['sql'].upper())
+
+    @override_settings(FEATURED_SERVICES_WINDOW_DAYS=30)
+    def test_featured_services_use_recent_leaderboard(self):
+        """Test the leaderboard ranks only requests inside the window"""
+        old_requests = self.create_requests(self.services[0], 5)
+        ServiceRequest.objects.filter(pk__in=[r.pk for r in old_requests]).update(
+            date_requested=timezone.now() - timedelta(days=60)
+        )
+        self.create_requests(self.services[1], 1)
+        self.create_requests(self.services[2], 2)
+
+        call_command('refresh_leaderboard', stdout=StringIO())
+        self.assertEqual(
+            list(LeaderboardEntry.objects.values_list('service', 'request_count')),
+            [(self.services[2].pk, 2), (self.services[1].pk, 1)]
+        )
+        self.assertEqual(list(get_most_requested_services()), [self.services[2], self.services[1]])
+
+    @override_settings(FEATURED_SERVICES_WINDOW_DAYS=30)
+    def test_featured_services_fall_back_before_first_refresh(self):
+        """Test all-time counts are used until the leaderboard has been built"""
+        self.create_requests(self.services[0], 2)
+        self.assertEqual(list(get_most_requested_services())[0], self.services[0])
+
 class ServiceModelTests(TestCase):
     def setUp(self):
         self.company = User.objects.create_user(
@@ -398,6 +748,219 @@ class RatingSystemTests(TestCase):
         expected_str = f"{self.customer.username} rated {self.service.name}: 4/5"
         self.assertEqual(str(rating), expected_str)
 
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.company = User.objects.create_user(
+            username='company',
+            email='company@test.com',
+            password='testpass123',
+            user_type='company',
+            field_of_work='Plumbing'
+        )
+        self.customers = [
+            User.objects.create_user(
+                username=f'customer{i}',
+                email=f'customer{i}@test.com',
+                password='testpass123',
+                user_type='customer'
+            )
+            for i in range(3)
+        ]
+        self.service = Service.objects.create(
+            name='Test Service',
+            description='Test service',
+            field='Plumbing',
+            price_per_hour=50.00,
+            company=self.company,
+            status='approved'
+        )
+
+    def test_aggregates_track_created_ratings(self):
+        """Test creating ratings updates the stored aggregates"""
+        Rating.objects.create(service=self.service, customer=self.customers[0], rating=5)
+        Rating.objects.create(service=self.service, customer=self.customers[1], rating=2)
+
+        service = Service.objects.get(pk=self.service.pk)
+        self.assertEqual(service.rating_sum, 7)
+        self.assertEqual(service.rating_count, 2)
+        self.assertEqual(service.average_rating, 3.5)
+
+    def test_aggregates_track_updated_ratings(self):
+        """Test changing a rating value adjusts the stored sum and average"""
+        rating = Rating.objects.create(service=self.service, customer=self.customers[0], rating=5)
+        rating.rating = 1
+        rating.save()
+
+        service = Service.objects.get(pk=self.service.pk)
+        self.assertEqual(service.rating_sum, 1)
+        self.assertEqual(service.rating_count, 1)
+        self.assertEqual(service.average_rating, 1.0)
+
+    def test_aggregates_track_deleted_ratings(self):
+        """Test instance and queryset deletes are subtracted from the aggregates"""
+        rating = Rating.objects.create(service=self.service, customer=self.customers[0], rating=5)
+        Rating.objects.create(service=self.service, customer=self.customers[1], rating=3)
+        Rating.objects.create(service=self.service, customer=self.customers[2], rating=4)
+
+        rating.delete()
+        self.assertEqual(self.service.rating_count, 2)
+        self.assertEqual(self.service.average_rating, 3.5)
+
+        Rating.objects.filter(service=self.service).delete()
+        service = Service.objects.get(pk=self.service.pk)
+        self.assertEqual(service.rating_sum, 0)
+        self.assertEqual(service.rating_count, 0)
+        self.assertEqual(service.average_rating, 0)
+
+    def test_rating_properties_do_not_query(self):
+        """Test rendering rating properties does not touch the ratings table"""
+        Rating.objects.create(service=self.service, customer=self.customers[0], rating=4)
+        service = Service.objects.get(pk=self.service.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(service.average_rating, 4.0)
+            self.assertEqual(service.rating_count, 1)
+
+    def test_rebuild_command_repairs_drift(self):
+        """Test the rebuild command restores aggregates from the ratings table"""
+        Rating.objects.create(service=self.service, customer=self.customers[0], rating=5)
+        Rating.objects.create(service=self.service, customer=self.customers[1], rating=4)
+        Service.objects.filter(pk=self.service.pk).update(rating_sum=0, rating_count=0, rating_avg=0)
+
+        out = StringIO()
+        call_command('rebuild_rating_aggregates', stdout=out)
+        self.assertIn('1 services', out.getvalue())
+
+        service = Service.objects.get(pk=self.service.pk)
+        self.assertEqual(service.rating_sum, 9)
+        self.assertEqual(service.rating_count, 2)
+        self.assertEqual(service.average_rating, 4.5)
+
+class SeedDataScaleTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+
+    def seed(self, **options):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            call_command('seed_data', scale=1, stdout=StringIO(), **options)
+
+    def test_scale_generates_unit_row_counts(self):
+        """Test --scale 1 creates one unit of every kind of row"""
+        self.seed()
+        self.assertEqual(User.objects.filter(user_type='customer').count(), 100)
+        self.assertEqual(User.objects.filter(user_type='company').count(), 10)
+        self.assertEqual(Service.objects.count(), 50)
+        self.assertEqual(ServiceRequest.objects.count(), 2000)
+        self.assertEqual(Rating.objects.count(), 1000)
+
+    def test_scale_is_deterministic_for_a_seed(self):
+        """Test the same seed produces the same ratings and requests"""
+        def snapshot():
+            return (
+                list(Rating.objects.order_by('pk').values_list('service__name', 'customer__username', 'rating')),
+                list(ServiceRequest.objects.order_by('pk').values_list('service__name', 'address')),
+            )
+
+        self.seed(seed=7)
+        first = snapshot()
+        User.objects.all().delete()
+        self.seed(seed=7)
+        self.assertEqual(snapshot(), first)
+
+    def test_scale_keeps_denormalized_columns_in_sync(self):
+        """Test aggregates and counters are rebuilt after bulk inserts"""
+        self.seed()
+        out = StringIO()
+        call_command('rebuild_rating_aggregates', check=True, stdout=out)
+        self.assertIn('0 services with drifted rating aggregates', out.getvalue())
+
+        company = User.objects.filter(user_type='company').first()
+        expected = ServiceRequest.objects.filter(service__company=company, service__status='approved').count()
+        company.refresh_from_db()
+        self.assertEqual(company.pending_requests_count, expected)
+
+    def test_scale_uses_local_placeholder_images(self):
+        """Test services share generated placeholder images instead of downloads"""
+        self.seed()
+        images = set(Service.objects.values_list('image', flat=True))
+        self.assertLessEqual(len(images), len(User.FIELD_OF_WORK_CHOICES))
+        for name in images:
+            self.assertTrue(name.startswith('service_images/placeholders/'))
+
+    def test_scale_refuses_to_seed_twice(self):
+        """Test seeding on top of existing load-testing data is rejected"""
+        self.seed()
+        with self.assertRaises(CommandError):
+            self.seed()
+
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'services-tests',
+    }
+}
+
+class ExplainViewsTests(TestCase):
+    databases = {'default', 'replica'}
+
+    def seed(self, using='default'):
+        company = User.objects.db_manager(using).create_user(
+            username='company', email='company@test.com', password='testpass123',
+            user_type='company', field_of_work='Plumbing'
+        )
+        User.objects.db_manager(using).create_user(
+            username='customer', email='customer@test.com', password='testpass123', user_type='customer'
+        )
+        Service.objects.using(using).create(
+            name='Pipe Repair', description='Fixing pipes', field='Plumbing',
+            price_per_hour=50.00, company=company, status='approved'
+        )
+
+    def test_requires_seeded_data(self):
+        """Test the command explains nothing on an empty database"""
+        with self.assertRaises(CommandError):
+            call_command('explain_views', stdout=StringIO())
+
+    def test_prints_plan_for_each_view_query(self):
+        """Test every view is rendered and its queries explained"""
+        self.seed()
+        out = StringIO()
+        call_command('explain_views', stdout=out)
+        output = out.getvalue()
+        for label in ('catalog', 'category', 'service detail', 'service requests', 'company profile'):
+            self.assertIn(f'== {label}:', output)
+        self.assertIn('FROM "services_service"', output)
+        self.assertRegex(output, r'\n    \S')
+
+    def test_filters_views_by_label(self):
+        """Test --view limits the output to matching views"""
+        self.seed()
+        out = StringIO()
+        call_command('explain_views', view='profile', stdout=out)
+        self.assertIn('== company profile:', out.getvalue())
+        self.assertNotIn('== catalog', out.getvalue())
+
+    @override_settings(DATABASE_ROUTERS=['xpertshub.replica.ReplicaRouter'])
+    def test_replica_reads_explained_on_the_replica(self):
+        """Test queries a replica_reads view sends to the replica are captured and explained there"""
+        self.seed()
+        # The test databases are independent, so the replica needs its own copy
+        self.seed(using='replica')
+        out = StringIO()
+        call_command('explain_views', view='company profile', stdout=out)
+        self.assertIn('-- on replica', out.getvalue())
+
+    @override_settings(CACHES=LOCMEM_CACHES, PAGE_CACHE_TIMEOUT=300)
+    def test_warm_page_cache_is_bypassed(self):
+        """Test a cached catalog page is rendered again so its queries are explained"""
+        self.seed()
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client.get(reverse('all_services') + '?sort=rating')
+        out = StringIO()
+        call_command('explain_views', view='catalog by rating', stdout=out)
+        self.assertIn('FROM "services_service"', out.getvalue())
+
 class PaginationTests(TestCase):
     def setUp(self):
         self.client = Client()
@@ -452,6 +1015,456 @@ class PaginationTests(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response.context['page_obj'].number, 1)
 
+@override_settings(KEYSET_PAGINATION=True)
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.company = User.objects.create_user(
+            username='company',
+            email='company@test.com',
+            password='testpass123',
+            user_type='company',
+            field_of_work='Plumbing'
+        )
+        self.customer = User.objects.create_user(
+            username='customer',
+            email='customer@test.com',
+            password='testpass123',
+            user_type='customer'
+        )
+        self.services = []
+        for i in range(14):
+            service = Service.objects.create(
+                name=f'Test Service {i+1}',
+                description=f'Test service {i+1}',
+                field='Plumbing',
+                price_per_hour=50.00 + (i % 4),
+                company=self.company,
+                status='approved'
+            )
+            self.services.append(service)
+
+    def walk(self, url):
+        """Follow next cursors from the first page and collect every row"""
+        seen = []
+        response = self.client.get(url)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.context['keyset_pagination'])
+            seen.extend(response.context['page_obj'].object_list)
+            cursor = response.context['page_obj'].next_cursor
+            if cursor is None:
+                return seen, response
+            separator = '&' if '?' in url else '?'
+            response = self.client.get(f'{url}{separator}cursor={cursor}')
+
+    def test_cursor_pages_cover_newest_ordering(self):
+        """Test following next cursors visits every service once, newest first"""
+        seen, _ = self.walk(reverse('all_services'))
+        self.assertEqual(seen, list(reversed(self.services)))
+
+    def test_cursor_pages_cover_price_ordering_with_ties(self):
+        """Test price sorting with duplicate prices neither skips nor repeats rows"""
+        seen, _ = self.walk(reverse('all_services') + '?sort=price_low')
+        expected = sorted(self.services, key=lambda s: (s.price_per_hour, s.id))
+        self.assertEqual([s.pk for s in seen], [s.pk for s in expected])
+
+    def test_previous_cursor_returns_prior_page(self):
+        """Test the previous cursor steps back to the page that was just left"""
+        url = reverse('services_by_category', kwargs={'field': 'Plumbing'})
+        first = self.client.get(url)
+        second = self.client.get(f"{url}?cursor={first.context['page_obj'].next_cursor}")
+        back = self.client.get(f"{url}?cursor={second.context['page_obj'].previous_cursor}")
+        self.assertEqual(
+            list(back.context['page_obj'].object_list),
+            list(first.context['page_obj'].object_list)
+        )
+        self.assertFalse(back.context['page_obj'].has_previous())
+
+    def test_deep_cursor_page_does_not_count(self):
+        """Test a cursor page costs a single query without a COUNT(*)"""
+        url = reverse('services_by_category', kwargs={'field': 'Plumbing'})
+        first = self.client.get(url)
+        paginator = first.context['paginator']
+        with self.assertNumQueries(1):
+            page = paginator.page(first.context['page_obj'].next_cursor)
+        self.assertEqual(len(page), 6)
+
+    def test_request_inbox_uses_cursor_pagination(self):
+        """Test the company request inbox pages by date requested"""
+        for i in range(12):
+            ServiceRequest.objects.create(
+                service=self.services[0],
+                customer=self.customer,
+                address=f'{i} Test St',
+                service_time_hours=1
+            )
+        self.client.login(username='company@test.com', password='testpass123')
+        seen, _ = self.walk(reverse('service_requests'))
+        self.assertEqual(len(seen), 12)
+        self.assertEqual(len({r.pk for r in seen}), 12)
+
+    def test_invalid_cursor_returns_404(self):
+        """Test a tampered cursor is rejected"""
+        response = self.client.get(reverse('all_services') + '?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_rating_sort_falls_back_to_offset_pagination(self):
+        """Test sorts without a seek key keep numbered pages"""
+        response = self.client.get(reverse('all_services') + '?sort=rating')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context['keyset_pagination'])
+        self.assertEqual(response.context['page_obj'].number, 1)
+
+@override_settings(CACHES=LOCMEM_CACHES, PAGE_CACHE_TIMEOUT=300)
+class AnonymousPageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = Client()
+        self.company = User.objects.create_user(
+            username='company',
+            email='company@test.com',
+            password='testpass123',
+            user_type='company',
+            field_of_work='Plumbing'
+        )
+        self.customer = User.objects.create_user(
+            username='customer',
+            email='customer@test.com',
+            password='testpass123',
+            user_type='customer'
+        )
+        self.service = Service.objects.create(
+            name='Pipe Repair',
+            description='Fixing leaking pipes',
+            field='Plumbing',
+            price_per_hour=50.00,
+            company=self.company,
+            status='approved'
+        )
+
+    def test_repeat_anonymous_views_are_served_from_cache(self):
+        """Test catalog, category and detail pages skip the database once cached"""
+        for url in (
+            reverse('all_services'),
+            reverse('services_by_category', kwargs={'field': 'Plumbing'}),
+            reverse('service_detail', kwargs={'pk': self.service.pk}),
+        ):
+            self.client.get(url)
+            with self.assertNumQueries(0):
+                response = self.client.get(url)
+            self.assertIsNone(response.context)
+            self.assertContains(response, 'Pipe Repair')
+
+    def test_equivalent_query_strings_share_an_entry(self):
+        """Test defaults, parameter order and unknown parameters do not split the cache"""
+        url = reverse('all_services')
+        self.client.get(url + '?min_price=10&sort=price_low')
+        with self.assertNumQueries(0):
+            self.client.get(url + '?sort=price_low&utm_source=mail&category=all&page=1&min_price=10')
+
+    def test_different_filters_are_cached_separately(self):
+        """Test a different search renders its own page"""
+        url = reverse('all_services')
+        self.client.get(url + '?search=pipe')
+        response = self.client.get(url + '?search=garden')
+        self.assertNotContains(response, 'Pipe Repair')
+
+    def test_authenticated_users_bypass_cache(self):
+        """Test logged-in users always get a fresh render"""
+        url = reverse('all_services')
+        self.client.get(url)
+        self.client.force_login(self.customer)
+        response = self.client.get(url)
+        self.assertIsNotNone(response.context)
+
+    def test_service_save_purges_cached_pages(self):
+        """Test editing a service bumps the catalog version"""
+        url = reverse('service_detail', kwargs={'pk': self.service.pk})
+        self.client.get(url)
+        self.service.name = 'Drain Cleaning'
+        self.service.save()
+        self.assertContains(self.client.get(url), 'Drain Cleaning')
+
+    def test_rating_purges_cached_pages(self):
+        """Test a new rating shows up on a previously cached detail page"""
+        url = reverse('service_detail', kwargs={'pk': self.service.pk})
+        self.client.get(url)
+        Rating.objects.create(service=self.service, customer=self.customer, rating=5, review='Spotless work')
+        self.assertContains(self.client.get(url), 'Spotless work')
+
+    def test_admin_approval_purges_cached_pages(self):
+        """Test bulk approval from the admin shows new services to anonymous visitors"""
+        pending = Service.objects.create(
+            name='Boiler Fitting',
+            description='New boilers',
+            field='Plumbing',
+            price_per_hour=80.00,
+            company=self.company
+        )
+        url = reverse('all_services')
+        self.assertNotContains(self.client.get(url), 'Boiler Fitting')
+
+        admin = User.objects.create_superuser(username='admin', email='admin@test.com', password='testpass123')
+        admin_client = Client()
+        admin_client.force_login(admin)
+        admin_client.post(reverse('admin:services_service_changelist'), {
+            'action': 'approve_services',
+            '_selected_action': [pending.pk],
+        })
+        self.assertContains(self.client.get(url), 'Boiler Fitting')
+
+    @override_settings(PAGE_CACHE_TIMEOUT=0)
+    def test_zero_timeout_disables_cache(self):
+        """Test PAGE_CACHE_TIMEOUT=0 renders every request"""
+        url = reverse('all_services')
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertIsNotNone(response.context)
+
+    def test_check_warns_on_per_process_cache(self):
+        """Test the system check flags page or home caching on a cache other workers cannot see"""
+        self.assertEqual([warning.id for warning in page_cache_backend_check(None)], ['services.W001'])
+        with override_settings(PAGE_CACHE_TIMEOUT=0, HOME_CACHE_TIMEOUT=300):
+            self.assertEqual([warning.id for warning in page_cache_backend_check(None)], ['services.W001'])
+        with override_settings(PAGE_CACHE_TIMEOUT=0, HOME_CACHE_TIMEOUT=0):
+            self.assertEqual(page_cache_backend_check(None), [])
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.company = User.objects.create_user(
+            username='company',
+            email='company@test.com',
+            password='testpass123',
+            user_type='company',
+            field_of_work='Plumbing'
+        )
+        self.customer = User.objects.create_user(
+            username='customer',
+            email='customer@test.com',
+            password='testpass123',
+            user_type='customer'
+        )
+        self.service = Service.objects.create(
+            name='Pipe Repair',
+            description='Fixing leaking pipes',
+            field='Plumbing',
+            price_per_hour=50.00,
+            company=self.company,
+            status='approved'
+        )
+        self.detail_url = reverse('service_detail', kwargs={'pk': self.service.pk})
+
+    def etag(self, url):
+        return self.client.get(url)['ETag']
+
+    def test_detail_revalidation_returns_304_from_one_query(self):
+        """Test a matching If-None-Match skips rendering the detail page"""
+        response = self.client.get(self.detail_url)
+        self.assertTrue(response.has_header('Last-Modified'))
+        with self.assertNumQueries(1):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_detail_etag_changes_with_ratings(self):
+        """Test adding and removing a rating changes the detail ETag"""
+        original = self.etag(self.detail_url)
+        rating = Rating.objects.create(service=self.service, customer=self.customer, rating=4)
+        rated = self.etag(self.detail_url)
+        self.assertNotEqual(rated, original)
+
+        rating.delete()
+        self.assertNotEqual(self.etag(self.detail_url), rated)
+
+    def test_detail_etag_changes_with_related_services(self):
+        """Test a new service in the same field changes the related services block"""
+        original = self.etag(self.detail_url)
+        Service.objects.create(
+            name='Drain Cleaning',
+            description='Unblocking drains',
+            field='Plumbing',
+            price_per_hour=40.00,
+            company=self.company,
+            status='approved'
+        )
+        self.assertNotEqual(self.etag(self.detail_url), original)
+
+    def test_etag_differs_per_viewer(self):
+        """Test a browser that logs in does not revalidate the anonymous page"""
+        anonymous = self.etag(self.detail_url)
+        self.client.force_login(self.customer)
+        self.assertNotEqual(self.etag(self.detail_url), anonymous)
+
+    def test_listing_last_modified_revalidation(self):
+        """Test listings answer If-Modified-Since until a service is approved"""
+        url = reverse('all_services')
+        last_modified = self.client.get(url)['Last-Modified']
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+        Service.objects.filter(pk=self.service.pk).update(date_updated=timezone.now() + timedelta(minutes=1))
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 200)
+
+    def test_listing_etag_changes_when_service_removed(self):
+        """Test deleting a service changes listing ETags even though no timestamp moved forward"""
+        other = Service.objects.create(
+            name='Old Service',
+            description='Going away',
+            field='Plumbing',
+            price_per_hour=40.00,
+            company=self.company,
+            status='approved',
+        )
+        Service.objects.filter(pk=other.pk).update(date_updated=timezone.now() - timedelta(days=1))
+        url = reverse('services_by_category', kwargs={'field': 'Plumbing'})
+        original = self.etag(url)
+        other.delete()
+        self.assertNotEqual(self.etag(url), original)
+
+    @override_settings(CACHES=LOCMEM_CACHES, PAGE_CACHE_TIMEOUT=300)
+    def test_cached_page_answers_revalidation(self):
+        """Test pages served from the anonymous cache still return 304s"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        etag = self.etag(self.detail_url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.factory = AsyncRequestFactory()
+        self.company = User.objects.create_user(
+            username='company',
+            email='company@test.com',
+            password='testpass123',
+            user_type='company',
+            field_of_work='Plumbing'
+        )
+        self.customer = User.objects.create_user(
+            username='customer',
+            email='customer@test.com',
+            password='testpass123',
+            user_type='customer'
+        )
+        self.services = [
+            Service.objects.create(
+                name=f'Pipe Repair {i}',
+                description='Fixing leaking pipes',
+                field='Plumbing',
+                price_per_hour=50.00 + i,
+                company=self.company,
+                status='approved'
+            )
+            for i in range(8)
+        ]
+        self.service = self.services[0]
+
+    async def get(self, view, url, user=None, **kwargs):
+        """Call an async view the way the ASGI handler would and render it off the event loop"""
+        headers = kwargs.pop('headers', {})
+        request = self.factory.get(url, headers=headers)
+        request.user = user or AnonymousUser()
+
+        async def auser():
+            return request.user
+        request.auser = auser
+
+        response = await view.as_view()(request, **kwargs)
+        if hasattr(response, 'render'):
+            await sync_to_async(response.render)()
+        return response
+
+    async def test_catalog_pages_match_sync_view(self):
+        """Test the async catalog paginates exactly like the sync view"""
+        for page in ('1', '2'):
+            url = reverse('all_services') + f'?page={page}'
+            response = await self.get(AsyncAllServicesView, url)
+            expected = await sync_to_async(self.client.get)(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(
+                [service.pk for service in response.context_data['services']],
+                [service.pk for service in expected.context['services']],
+            )
+
+    async def test_catalog_invalid_page_is_404(self):
+        """Test out-of-range and malformed page numbers raise Http404"""
+        for page in ('9', 'abc'):
+            with self.assertRaises(Http404):
+                await self.get(AsyncAllServicesView, reverse('all_services') + f'?page={page}')
+
+    @override_settings(KEYSET_PAGINATION=True)
+    async def test_category_keyset_pages(self):
+        """Test the async category view follows cursors through every service"""
+        url = reverse('services_by_category', kwargs={'field': 'Plumbing'})
+        response = await self.get(AsyncServicesByCategoryView, url, field='Plumbing')
+        page = response.context_data['page_obj']
+        self.assertTrue(response.context_data['keyset_pagination'])
+        self.assertTrue(page.has_next())
+
+        next_page = await self.get(AsyncServicesByCategoryView, f'{url}?cursor={page.next_cursor}', field='Plumbing')
+        seen = [s.pk for s in page.object_list] + [s.pk for s in next_page.context_data['page_obj'].object_list]
+        self.assertEqual(sorted(seen), sorted(s.pk for s in self.services))
+
+    async def test_detail_shows_ratings_and_viewer_state(self):
+        """Test the async detail view loads ratings, related services and the customer's rating"""
+        await Rating.objects.acreate(service=self.service, customer=self.customer, rating=5, review='Great job')
+        url = reverse('service_detail', kwargs={'pk': self.service.pk})
+        response = await self.get(AsyncServiceDetailView, url, user=self.customer, pk=self.service.pk)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context_data['user_has_rated'])
+        self.assertEqual(len(response.context_data['related_services']), 3)
+        self.assertContains(response, 'Great job')
+
+        anonymous = await self.get(AsyncServiceDetailView, url, pk=self.service.pk)
+        self.assertFalse(anonymous.context_data['user_has_rated'])
+
+    async def test_detail_of_pending_service_is_404(self):
+        """Test the async detail view hides services that are not approved"""
+        await Service.objects.filter(pk=self.service.pk).aupdate(status='pending')
+        url = reverse('service_detail', kwargs={'pk': self.service.pk})
+        with self.assertRaises(Http404):
+            await self.get(AsyncServiceDetailView, url, pk=self.service.pk)
+
+    async def test_detail_revalidation_returns_304(self):
+        """Test async views answer If-None-Match from their validators"""
+        url = reverse('service_detail', kwargs={'pk': self.service.pk})
+        response = await self.get(AsyncServiceDetailView, url, pk=self.service.pk)
+        response = await self.get(
+            AsyncServiceDetailView, url, pk=self.service.pk, headers={'If-None-Match': response['ETag']}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_home_lists_featured_services(self):
+        """Test the async home view loads stats and featured services"""
+        request = self.factory.get(reverse('home'))
+        request.user = AnonymousUser()
+
+        async def auser():
+            return request.user
+        request.auser = auser
+
+        response = await async_home(request)
+        await sync_to_async(response.render)()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context_data['featured_services']), 6)
+        self.assertIn('services', response.context_data['stats'])
+
+    @override_settings(CACHES=LOCMEM_CACHES, PAGE_CACHE_TIMEOUT=300)
+    def test_anonymous_pages_are_cached(self):
+        """Test repeat anonymous requests to async views skip the database"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        url = reverse('all_services')
+        async_to_sync(self.get)(AsyncAllServicesView, url)
+        with self.assertNumQueries(0):
+            response = async_to_sync(self.get)(AsyncAllServicesView, url)
+        self.assertContains(response, 'Pipe Repair')
+
 class SearchFunctionalityTests(TestCase):
     def setUp(self):
         self.client = Client()
@@ -522,6 +1535,394 @@ class SearchFunctionalityTests(TestCase):
         services = response.context['services']
         self.assertEqual(services[0].name, 'Emergency Plumbing')  # Higher price first
 
+    def test_search_by_company_name(self):
+        """Test search matches the providing company's username"""
+        response = self.client.get(reverse('all_services') + '?search=test_company')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['services']), 2)
+
+    def test_best_match_sort_without_search_falls_back_to_newest(self):
+        """Test relevance sort behaves like newest first when there is no search"""
+        response = self.client.get(reverse('all_services') + '?sort=relevance')
+        self.assertEqual(response.status_code, 200)
+        services = response.context['services']
+        self.assertEqual(services[0].name, 'Regular Maintenance')  # Created last
+
+    def test_renaming_company_refreshes_its_search_vectors(self):
+        """Test a company's services are re-indexed under its new username"""
+        with patch('services.signals.refresh_search_vectors') as refresh:
+            self.company.first_name = 'Unrelated'
+            self.company.save()
+            refresh.assert_not_called()
+
+            company = User.objects.get(pk=self.company.pk)
+            company.username = 'renamed_company'
+            company.save()
+        refresh.assert_called_once()
+        self.assertQuerySetEqual(
+            refresh.call_args.args[0], [self.service1.pk, self.service2.pk], transform=lambda service: service.pk, ordered=False
+        )
+
+    def test_search_vector_not_populated_without_postgres(self):
+        """Test the stored search vector is left empty on non-PostgreSQL databases"""
+        self.service1.refresh_from_db()
+        self.assertIsNone(self.service1.search_vector)
+
+def uploaded_image(size, name='photo.jpg'):
+    image_file = BytesIO()
+    Image.new('RGB', size, color='blue').save(image_file, 'JPEG')
+    return SimpleUploadedFile(name, image_file.getvalue(), content_type='image/jpeg')
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root, IMAGE_DERIVATIVE_WIDTHS=[320, 640])
+        media.enable()
+        self.addCleanup(media.disable)
+        self.company = User.objects.create_user(
+            username='company',
+            email='company@test.com',
+            password='testpass123',
+            user_type='company',
+            field_of_work='Plumbing'
+        )
+
+    def create_service(self, image):
+        return Service.objects.create(
+            name='Pipe Repair',
+            description='Fixing leaking pipes',
+            field='Plumbing',
+            price_per_hour=50.00,
+            company=self.company,
+            status='approved',
+            image=image
+        )
+
+    def resize(self, service):
+        """Run the image worker's resize step and reload the service"""
+        image_uploads.build_missing_derivatives()
+        return Service.objects.get(pk=service.pk)
+
+    def open_derivative(self, service, width, fmt):
+        return Image.open(default_storage.open(service.image_derivatives[fmt][str(width)]))
+
+    def test_worker_generates_every_width_and_format(self):
+        """Test the image worker writes WebP and JPEG copies at each width and records them"""
+        service = self.resize(self.create_service(uploaded_image((1200, 800))))
+        for width in (320, 640):
+            with self.open_derivative(service, width, 'webp') as webp:
+                self.assertEqual(webp.format, 'WEBP')
+                self.assertEqual(webp.width, width)
+                self.assertAlmostEqual(webp.height, width * 2 / 3, delta=1)
+            with self.open_derivative(service, width, 'jpeg') as jpeg:
+                self.assertEqual(jpeg.format, 'JPEG')
+
+    def test_small_originals_are_not_upscaled(self):
+        """Test derivatives wider than the original keep its size"""
+        service = self.resize(self.create_service(uploaded_image((400, 300))))
+        with self.open_derivative(service, 640, 'webp') as webp:
+            self.assertEqual(webp.size, (400, 300))
+
+    def test_saving_does_not_resize_in_the_request(self):
+        """Test uploads render as the original until the worker has resized them"""
+        service = self.create_service(uploaded_image((800, 600)))
+        self.assertEqual(service.image_derivatives, {})
+        self.assertFalse(default_storage.exists(derivative_name(service.image.name, 320, 'webp')))
+        html = Template('{% load service_tags %}{% responsive_image service service.name %}').render(
+            Context({'service': service})
+        )
+        self.assertIn(f'src="{service.image.url}"', html)
+        self.assertNotIn('srcset', html)
+
+    def test_urls_use_the_names_the_storage_chose(self):
+        """Test srcset points at the stored files even when the storage renames them"""
+        service = self.create_service(uploaded_image((800, 600)))
+        requested = derivative_name(service.image.name, 320, 'webp')
+        # Taking the requested name forces the storage to pick another, as Cloudinary always does
+        default_storage.save(requested, uploaded_image((10, 10)))
+        service = self.resize(service)
+        stored = service.image_derivatives['webp']['320']
+        self.assertNotEqual(stored, requested)
+        self.assertTrue(default_storage.exists(stored))
+        html = Template('{% load service_tags %}{% responsive_image service service.name %}').render(
+            Context({'service': service})
+        )
+        self.assertIn(f'{default_storage.url(stored)} 320w', html)
+
+    def test_copies_made_by_a_slower_worker_are_discarded(self):
+        """Test a worker that loses the race to record a blob's copies deletes its own files"""
+        service = self.create_service(uploaded_image((800, 600)))
+        generate = image_uploads.generate_derivatives
+        stored = {}
+
+        def racing(image):
+            # Another worker records its copies while this one is still resizing
+            stored['winner'] = generate(image)
+            ImageBlob.objects.filter(name=image.name).update(derivatives=stored['winner'])
+            stored['loser'] = generate(image)
+            return stored['loser']
+
+        with patch('services.image_uploads.generate_derivatives', racing):
+            service = self.resize(service)
+        self.assertEqual(service.image_derivatives, stored['winner'])
+        self.assertFalse(default_storage.exists(stored['loser']['webp']['320']))
+        self.assertTrue(default_storage.exists(stored['winner']['webp']['320']))
+
+    def test_failed_resize_leaves_no_files(self):
+        """Test copies stored before a resize fails are deleted rather than orphaned"""
+        service = self.create_service(uploaded_image((800, 600)))
+        with patch('services.images.ContentFile', side_effect=[ContentFile(b'copy'), OSError('disk full')]):
+            service = self.resize(service)
+        self.assertIn('error', service.image_derivatives)
+        directory = posixpath.dirname(derivative_name(service.image.name, 320, 'webp'))
+        self.assertEqual(default_storage.listdir(directory)[1], [])
+
+    def test_catalog_cards_use_srcset(self):
+        """Test catalog cards offer WebP thumbnails instead of the original upload"""
+        service = self.resize(self.create_service(uploaded_image((1200, 800))))
+        response = self.client.get(reverse('all_services'))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, default_storage.url(service.image_derivatives['jpeg']['320']))
+        self.assertNotContains(response, f'src="{service.image.url}"')
+
+    def test_unreadable_original_falls_back_to_original_url(self):
+        """Test an image that cannot be resized is recorded as failed and shown as the original"""
+        service = self.create_service('service_images/missing.jpg')
+        self.assertEqual(image_uploads.build_missing_derivatives(), (0, 1))
+        service = Service.objects.get(pk=service.pk)
+        self.assertIn('error', service.image_derivatives)
+        self.assertEqual(image_uploads.build_missing_derivatives(), (0, 0))
+        html = Template('{% load service_tags %}{% responsive_image service service.name %}').render(
+            Context({'service': service})
+        )
+        self.assertIn(f'src="{service.image.url}"', html)
+        self.assertNotIn('srcset', html)
+
+    def test_services_sharing_an_image_share_its_copies(self):
+        """Test an image used by two services is resized once"""
+        first = self.create_service(uploaded_image((800, 600)))
+        second = self.create_service(uploaded_image((800, 600)))
+        image_uploads.build_missing_derivatives()
+        first, second = Service.objects.get(pk=first.pk), Service.objects.get(pk=second.pk)
+        self.assertEqual(first.image_derivatives, second.image_derivatives)
+        self.assertEqual(ImageBlob.objects.get().derivatives, first.image_derivatives)
+
+    def test_replacing_image_forgets_old_copies(self):
+        """Test a new image is shown as the original until it has been resized"""
+        service = self.resize(self.create_service(uploaded_image((800, 600))))
+        service.image = uploaded_image((500, 300), 'new.jpg')
+        service.save()
+        self.assertEqual(Service.objects.get(pk=service.pk).image_derivatives, {})
+
+    def test_admin_preview_uses_thumbnail(self):
+        """Test the admin image preview shows the smallest JPEG copy"""
+        service = self.resize(self.create_service(uploaded_image((1200, 800))))
+        preview = ServiceAdmin(Service, admin_site).image_preview(service)
+        self.assertIn(default_storage.url(service.image_derivatives['jpeg']['320']), preview)
+
+class ImageBlobTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        media = override_settings(MEDIA_ROOT=self.media_root, IMAGE_DERIVATIVE_WIDTHS=[320])
+        media.enable()
+        self.addCleanup(media.disable)
+        self.company = User.objects.create_user(
+            username='company',
+            email='company@test.com',
+            password='testpass123',
+            user_type='company',
+            field_of_work='Plumbing'
+        )
+
+    def create_service(self, image, name='Pipe Repair'):
+        return Service.objects.create(
+            name=name,
+            description='Fixing leaking pipes',
+            field='Plumbing',
+            price_per_hour=50.00,
+            company=self.company,
+            status='approved',
+            image=image
+        )
+
+    def stored_files(self):
+        return [
+            os.path.join(root, name)
+            for root, _, names in os.walk(os.path.join(self.media_root, BLOB_DIRECTORY))
+            for name in names
+        ]
+
+    def test_identical_uploads_share_one_file(self):
+        """Test uploading the same bytes twice stores them once with two references"""
+        first = self.create_service(uploaded_image((400, 300), 'logo.jpg'))
+        second = self.create_service(uploaded_image((400, 300), 'logo-copy.jpg'), name='Drain Cleaning')
+        self.assertEqual(first.image.name, second.image.name)
+        blob = ImageBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(blob.name, first.image.name)
+        self.assertEqual(len([path for path in self.stored_files() if 'derivatives' not in path]), 1)
+
+    def test_blob_named_by_streamed_sha256(self):
+        """Test blobs are stored under the SHA-256 of the uploaded bytes"""
+        upload = uploaded_image((400, 300), 'logo.JPG')
+        expected = hashlib.sha256(upload.read()).hexdigest()
+        service = self.create_service(upload)
+        self.assertEqual(service.image.name, f'{BLOB_DIRECTORY}/{expected[:2]}/{expected}.jpg')
+        self.assertEqual(ImageBlob.objects.get().sha256, expected)
+
+    def test_concurrent_first_uploads_keep_one_file(self):
+        """Test an upload that loses the race to record new bytes deletes the copy it wrote"""
+        upload = uploaded_image((400, 300))
+        sha256 = hashlib.sha256(upload.read()).hexdigest()
+        save = FileSystemStorage.save
+        winner = {}
+
+        def racing_save(storage, name, content, max_length=None):
+            # Another upload of the same bytes writes and records its copy meanwhile
+            winner['name'] = save(storage, name, ContentFile(content.read()))
+            ImageBlob.objects.create(sha256=sha256, name=winner['name'], size=content.size, ref_count=1)
+            return save(storage, name, content, max_length)
+
+        with patch.object(FileSystemStorage, 'save', racing_save):
+            service = self.create_service(upload)
+        self.assertEqual(service.image.name, winner['name'])
+        self.assertEqual(ImageBlob.objects.get().ref_count, 2)
+        self.assertEqual(self.stored_files(), [os.path.join(self.media_root, winner['name'])])
+
+    def test_file_deleted_with_last_reference(self):
+        """Test a shared file and its copies survive until the last service using it is deleted"""
+        first = self.create_service(uploaded_image((400, 300)))
+        second = self.create_service(uploaded_image((400, 300)), name='Drain Cleaning')
+        image_uploads.build_missing_derivatives()
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(default_storage.exists(second.image.name))
+        self.assertEqual(ImageBlob.objects.get().ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(ImageBlob.objects.exists())
+        self.assertEqual(self.stored_files(), [])
+
+    def test_replacing_image_releases_previous_blob(self):
+        """Test changing a service's image drops its reference to the old one"""
+        service = self.create_service(uploaded_image((400, 300)))
+        old_name = service.image.name
+        service = Service.objects.get(pk=service.pk)
+        service.image = uploaded_image((500, 300), 'new.jpg')
+        with self.captureOnCommitCallbacks(execute=True):
+            service.save()
+        self.assertFalse(ImageBlob.objects.filter(name=old_name).exists())
+        self.assertFalse(default_storage.exists(old_name))
+        self.assertEqual(ImageBlob.objects.get().name, service.image.name)
+
+    def test_reupload_after_delete_rebuilds_derivatives(self):
+        """Test deleting the last reference removes the copies, so the same bytes uploaded again get new ones"""
+        service = self.create_service(uploaded_image((400, 300)))
+        image_uploads.build_missing_derivatives()
+        first_copies = ImageBlob.objects.get().derivatives['webp']['320']
+        with self.captureOnCommitCallbacks(execute=True):
+            Service.objects.get(pk=service.pk).delete()
+        self.assertFalse(default_storage.exists(first_copies))
+
+        service = self.create_service(uploaded_image((400, 300)))
+        image_uploads.build_missing_derivatives()
+        copies = Service.objects.get(pk=service.pk).image_derivatives
+        self.assertTrue(default_storage.exists(copies['webp']['320']))
+
+    def test_unrelated_saves_keep_reference(self):
+        """Test saving a service without touching its image leaves the count alone"""
+        service = self.create_service(uploaded_image((400, 300)))
+        service = Service.objects.get(pk=service.pk)
+        service.name = 'Renamed'
+        service.save()
+        self.assertEqual(ImageBlob.objects.get().ref_count, 1)
+
+class BackgroundImageUploadTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.staging_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        self.addCleanup(shutil.rmtree, self.staging_root)
+        background = override_settings(
+            MEDIA_ROOT=self.media_root, IMAGE_STAGING_ROOT=self.staging_root,
+            BACKGROUND_IMAGE_UPLOADS=True, IMAGE_DERIVATIVE_WIDTHS=[320],
+        )
+        background.enable()
+        self.addCleanup(background.disable)
+        self.client = Client()
+        self.company = User.objects.create_user(
+            username='company',
+            email='company@test.com',
+            password='testpass123',
+            user_type='company',
+            field_of_work='Plumbing'
+        )
+
+    def create_service(self):
+        self.client.force_login(self.company)
+        response = self.client.post(reverse('create_service'), {
+            'name': 'Pipe Repair',
+            'description': 'Fixing leaking pipes',
+            'field': 'Plumbing',
+            'price_per_hour': '50.00',
+            'image': uploaded_image((800, 600), 'pipes.jpg'),
+        })
+        self.assertEqual(response.status_code, 302)
+        return Service.objects.get(name='Pipe Repair')
+
+    def test_upload_is_staged_not_stored(self):
+        """Test creating a service only writes the image to the staging directory"""
+        service = self.create_service()
+        self.assertFalse(service.image)
+        upload = ImageUpload.objects.get(service=service)
+        self.assertEqual(upload.status, 'pending')
+        self.assertTrue(os.path.exists(os.path.join(self.staging_root, upload.staged_name)))
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'service_images')))
+
+    def test_detail_shows_placeholder_until_processed(self):
+        """Test the detail page renders a placeholder while the upload is queued"""
+        service = self.create_service()
+        Service.objects.filter(pk=service.pk).update(status='approved')
+        response = self.client.get(reverse('service_detail', kwargs={'pk': service.pk}))
+        self.assertContains(response, 'bx-image')
+
+    def test_worker_publishes_image_and_derivatives(self):
+        """Test the worker moves the upload to media storage and builds thumbnails"""
+        service = self.create_service()
+        upload = ImageUpload.objects.get(service=service)
+        out = StringIO()
+        call_command('process_image_uploads', once=True, stdout=out)
+        self.assertIn('Processed 1 images, 0 failed', out.getvalue())
+
+        service.refresh_from_db()
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, 'done')
+        self.assertTrue(service.image.name.startswith('service_images/sha256/'))
+        self.assertTrue(default_storage.exists(service.image.name))
+        self.assertTrue(default_storage.exists(service.image_derivatives['webp']['320']))
+        self.assertFalse(os.path.exists(os.path.join(self.staging_root, upload.staged_name)))
+
+    @override_settings(IMAGE_UPLOAD_MAX_ATTEMPTS=2)
+    def test_missing_staged_file_retries_then_fails(self):
+        """Test an upload that cannot be read is retried with backoff, then marked failed"""
+        service = self.create_service()
+        upload = ImageUpload.objects.get(service=service)
+        os.remove(os.path.join(self.staging_root, upload.staged_name))
+
+        self.assertEqual(image_uploads.drain(), (0, 1))
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, 'pending')
+        self.assertGreater(upload.next_attempt_at, timezone.now())
+
+        ImageUpload.objects.filter(pk=upload.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(image_uploads.drain(), (0, 1))
+        upload.refresh_from_db()
+        self.assertEqual(upload.status, 'failed')
+        self.assertTrue(upload.last_error)
+
 class ImageUploadTests(TestCase):
     def setUp(self):
         self.client = Client()
@@ -1,12 +1,20 @@
+from django.conf import settings
 from django.urls import path
+from xpertshub.replica import replica_reads
 from .views import CreateServiceView, AllServicesView, ServicesByCategoryView, ServiceDetailView, RequestServiceView, ServiceRequestsView, RateServiceView
+from .views import AsyncAllServicesView, AsyncServicesByCategoryView, AsyncServiceDetailView
+
+if settings.ASYNC_VIEWS:
+    AllServicesView, ServicesByCategoryView, ServiceDetailView = (
+        AsyncAllServicesView, AsyncServicesByCategoryView, AsyncServiceDetailView
+    )
 
 urlpatterns = [
-    path('', AllServicesView.as_view(), name='all_services'),
+    path('', replica_reads(AllServicesView.as_view()), name='all_services'),
     path('create/', CreateServiceView.as_view(), name='create_service'),
     path('requests/', ServiceRequestsView.as_view(), name='service_requests'),
-    path('category/<str:field>/', ServicesByCategoryView.as_view(), name='services_by_category'),
-    path('<int:pk>/', ServiceDetailView.as_view(), name='service_detail'),
+    path('category/<str:field>/', replica_reads(ServicesByCategoryView.as_view()), name='services_by_category'),
+    path('<int:pk>/', replica_reads(ServiceDetailView.as_view()), name='service_detail'),
     path('<int:service_id>/request/', RequestServiceView.as_view(), name='request_service'),
     path('<int:service_id>/rate/', RateServiceView.as_view(), name='rate_service'),
 ]
@@ -2,13 +2,24 @@ from django.shortcuts import render
 
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
-from django.shortcuts import redirect, get_object_or_404
+from django.shortcuts import redirect, get_object_or_404, aget_object_or_404
 from django.urls import reverse_lazy
-from django.views.generic import CreateView, ListView, DetailView
-from django.db.models import Count, Avg, Q
+from django.views.generic import CreateView, ListView, DetailView, View
+from django.conf import settings
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from django.db import transaction
 from .forms import ServiceCreationForm, ServiceRequestForm, RatingForm
 from .models import Service, ServiceRequest, Rating
-from .emails import send_request_confirmation_email, send_new_request_notification_email
+from .image_uploads import background_uploads_enabled, stage_upload
+from .pagination import AsyncPaginationMixin, KeysetPaginationMixin
+from .search import search_services
+from .emails import queue_service_request_emails
+from .page_cache import cache_anonymous_page
+from .freshness import (
+    acatalog_validators, aservice_detail_validators, async_condition,
+    catalog_etag, catalog_last_modified, service_detail_etag, service_detail_last_modified
+)
 
 class CreateServiceView(LoginRequiredMixin, CreateView):
     model = Service
@@ -31,28 +42,35 @@ class CreateServiceView(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         form.instance.company = self.request.user
         messages.success(self.request, 'Service created successfully and is pending approval.')
-        return super().form_valid(form)
+        upload = form.cleaned_data.get('image')
+        if not (upload and background_uploads_enabled()):
+            return super().form_valid(form)
+
+        # Keep the remote storage round-trip out of the request; the image worker publishes it
+        form.instance.image = ''
+        with transaction.atomic():
+            response = super().form_valid(form)
+            stage_upload(self.object, upload)
+        return response
 
     def get_success_url(self):
         return reverse_lazy('profile', kwargs={'username': self.request.user.username})
 
-class AllServicesView(ListView):
+@method_decorator(cache_anonymous_page('catalog'), name='dispatch')
+@method_decorator(condition(catalog_etag, catalog_last_modified), name='dispatch')
+class AllServicesView(KeysetPaginationMixin, ListView):
     model = Service
     template_name = 'services/all_services.html'
     context_object_name = 'services'
     paginate_by = 6
 
     def get_queryset(self):
-        queryset = Service.objects.filter(status='approved')
+        queryset = Service.objects.filter(status='approved').select_related('company')
         
         # Search functionality
         search_query = self.request.GET.get('search')
         if search_query:
-            queryset = queryset.filter(
-                Q(name__icontains=search_query) |
-                Q(description__icontains=search_query) |
-                Q(company__username__icontains=search_query)
-            )
+            queryset = search_services(queryset, search_query)
         
         # Filter by category
         category = self.request.GET.get('category')
@@ -74,63 +92,122 @@ class AllServicesView(ListView):
         elif sort_by == 'price_high':
             queryset = queryset.order_by('-price_per_hour')
         elif sort_by == 'rating':
-            queryset = queryset.annotate(avg_rating=Avg('ratings__rating')).order_by('-avg_rating')
+            queryset = queryset.order_by('-rating_avg', '-date_created')
+        elif sort_by in (None, 'relevance') and 'search_rank' in queryset.query.annotations:
+            queryset = queryset.order_by('-search_rank', '-date_created')
         else:
             queryset = queryset.order_by('-date_created')
         
         return queryset
 
+    def get_keyset_ordering(self):
+        # Rating and relevance sorts have no stable seek key, so they stay on offsets
+        sort_by = self.request.GET.get('sort')
+        if sort_by == 'price_low':
+            return ('price_per_hour', 'id')
+        if sort_by == 'price_high':
+            return ('-price_per_hour', '-id')
+        if sort_by == 'rating':
+            return None
+        if sort_by in (None, 'relevance') and 'search_rank' in self.object_list.query.annotations:
+            return None
+        return ('-date_created', '-id')
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['search_query'] = self.request.GET.get('search', '')
         context['selected_category'] = self.request.GET.get('category', 'all')
         context['min_price'] = self.request.GET.get('min_price', '')
         context['max_price'] = self.request.GET.get('max_price', '')
-        context['sort_by'] = self.request.GET.get('sort', 'newest')
+        context['sort_by'] = self.request.GET.get('sort', 'relevance')
         context['categories'] = Service.FIELD_OF_WORK_CHOICES
         return context
 
-class ServicesByCategoryView(ListView):
+@method_decorator(cache_anonymous_page('catalog'), name='dispatch')
+@method_decorator(condition(catalog_etag, catalog_last_modified), name='dispatch')
+class ServicesByCategoryView(KeysetPaginationMixin, ListView):
     model = Service
     template_name = 'services/category_services.html'
     context_object_name = 'services'
     paginate_by = 6
+    keyset_ordering = ('-date_created', '-id')
 
     def get_queryset(self):
         self.category = self.kwargs['field']
-        return Service.objects.filter(status='approved', field=self.category).order_by('-date_created')
+        return Service.objects.filter(
+            status='approved', field=self.category
+        ).select_related('company').order_by('-date_created')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['category'] = self.category
         return context
 
+@method_decorator(cache_anonymous_page('catalog'), name='dispatch')
+@method_decorator(condition(service_detail_etag, service_detail_last_modified), name='dispatch')
 class ServiceDetailView(DetailView):
     model = Service
     template_name = 'services/service_detail.html'
     context_object_name = 'service'
 
     def get_queryset(self):
-        return Service.objects.filter(status='approved')
+        return Service.objects.filter(status='approved').select_related('company')
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
+    def get_related_services(self):
         # Get related services in the same category (excluding current service)
-        context['related_services'] = Service.objects.filter(
+        return Service.objects.filter(
             status='approved',
             field=self.object.field
         ).exclude(id=self.object.id).order_by('-date_created')[:3]
-        
-        # Get ratings for this service
-        context['ratings'] = self.object.ratings.all().order_by('-date_created')
-        context['user_has_rated'] = False
-        if self.request.user.is_authenticated and self.request.user.user_type == 'customer':
-            context['user_has_rated'] = Rating.objects.filter(
-                service=self.object, customer=self.request.user
-            ).exists()
-        
+
+    def get_ratings(self):
+        return self.object.ratings.select_related('customer').order_by('-date_created')
+
+    def get_user_ratings(self):
+        """The viewing customer's rating of this service, if any"""
+        user = self.request.user
+        if not (user.is_authenticated and user.user_type == 'customer'):
+            return Rating.objects.none()
+        return Rating.objects.filter(service=self.object, customer=user)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['related_services'] = self.get_related_services()
+        context['ratings'] = self.get_ratings()
+        context['user_has_rated'] = self.get_user_ratings().exists()
         return context
 
+class AsyncViewMixin:
+    """Run a class-based view on the event loop, resolving the user with the async ORM first"""
+
+    async def dispatch(self, request, *args, **kwargs):
+        # Templates and permission checks read request.user synchronously
+        request.user = await request.auser()
+        return await View.dispatch(self, request, *args, **kwargs)
+
+@method_decorator(cache_anonymous_page('catalog'), name='dispatch')
+@method_decorator(async_condition(acatalog_validators), name='dispatch')
+class AsyncAllServicesView(AsyncViewMixin, AsyncPaginationMixin, AllServicesView):
+    """AllServicesView for ASGI deployments, fetching the page with the async ORM"""
+
+@method_decorator(cache_anonymous_page('catalog'), name='dispatch')
+@method_decorator(async_condition(acatalog_validators), name='dispatch')
+class AsyncServicesByCategoryView(AsyncViewMixin, AsyncPaginationMixin, ServicesByCategoryView):
+    """ServicesByCategoryView for ASGI deployments, fetching the page with the async ORM"""
+
+@method_decorator(cache_anonymous_page('catalog'), name='dispatch')
+@method_decorator(async_condition(aservice_detail_validators), name='dispatch')
+class AsyncServiceDetailView(AsyncViewMixin, ServiceDetailView):
+    """ServiceDetailView for ASGI deployments, loading the service and its ratings with the async ORM"""
+
+    async def get(self, request, *args, **kwargs):
+        self.object = await aget_object_or_404(self.get_queryset(), pk=self.kwargs['pk'])
+        context = DetailView.get_context_data(self, object=self.object)
+        context['related_services'] = [service async for service in self.get_related_services()]
+        context['ratings'] = [rating async for rating in self.get_ratings()]
+        context['user_has_rated'] = await self.get_user_ratings().aexists()
+        return self.render_to_response(context)
+
 class RequestServiceView(LoginRequiredMixin, CreateView):
     model = ServiceRequest
     form_class = ServiceRequestForm
@@ -159,11 +236,10 @@ class RequestServiceView(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         form.instance.service = self.service
         form.instance.customer = self.request.user
-        response = super().form_valid(form)
-        
-        # Send email notifications
-        send_request_confirmation_email(self.object)
-        send_new_request_notification_email(self.object)
+        with transaction.atomic():
+            response = super().form_valid(form)
+            # Queue email notifications for the send_queued_emails worker
+            queue_service_request_emails(self.object)
         
         messages.success(self.request, f'Service request for "{self.service.name}" submitted successfully!')
         return response
@@ -171,11 +247,12 @@ class RequestServiceView(LoginRequiredMixin, CreateView):
     def get_success_url(self):
         return reverse_lazy('profile', kwargs={'username': self.request.user.username})
 
-class ServiceRequestsView(LoginRequiredMixin, ListView):
+class ServiceRequestsView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = ServiceRequest
     template_name = 'services/service_requests.html'
     context_object_name = 'service_requests'
     paginate_by = 10
+    keyset_ordering = ('-date_requested', '-id')
 
     def dispatch(self, request, *args, **kwargs):
         # Only allow company users to view service requests
@@ -188,13 +265,30 @@ class ServiceRequestsView(LoginRequiredMixin, ListView):
         return ServiceRequest.objects.filter(
             service__company=self.request.user,
             service__status='approved'
-        ).order_by('-date_requested')
+        ).select_related('service', 'customer').order_by('-date_requested')
+
+def _most_requested_querysets():
+    services = Service.objects.filter(status='approved')
+    ranked = None
+    if settings.FEATURED_SERVICES_WINDOW_DAYS:
+        # Recent leaderboard from refresh_leaderboard; all-time counts until it has been built
+        ranked = services.filter(leaderboard_entry__isnull=False).order_by('leaderboard_entry__rank')[:6]
+    return ranked, services.order_by('-request_count', '-date_created')[:6]
 
 def get_most_requested_services():
     """Helper function to get most requested services for home page"""
-    return Service.objects.filter(status='approved').annotate(
-        request_count=Count('requests')
-    ).order_by('-request_count', '-date_created')[:6]
+    ranked, all_time = _most_requested_querysets()
+    if ranked is not None and ranked:
+        return ranked
+    return all_time
+
+async def aget_most_requested_services():
+    ranked, all_time = _most_requested_querysets()
+    if ranked is not None:
+        services = [service async for service in ranked]
+        if services:
+            return services
+    return [service async for service in all_time]
 
 class RateServiceView(LoginRequiredMixin, CreateView):
     model = Rating
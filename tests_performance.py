@@ -0,0 +1,190 @@
+"""
+Query-count regression tests for every page in XpertsHub
+
+Each page is rendered against a production-sized fixture as an anonymous visitor,
+a customer and a company, and must stay within a fixed query budget and total SQL
+time. Budgets are independent of fixture size, so an N+1 regression fails here
+long before it shows up in production. A summary is written to the path in the
+QUERY_REPORT_PATH environment variable (default: query_report.md).
+"""
+import os
+import random
+from io import StringIO
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from users.models import User
+from services.models import Service, ServiceRequest, Rating
+
+COMPANIES = 30
+CUSTOMERS = 150
+SERVICES = 300
+RATINGS = 3000
+REQUESTS = 3000
+
+# Total SQL time allowed for a single page render, in seconds
+MAX_SQL_SECONDS = 0.5
+
+# Maximum queries per (page, role). Session and user lookups for logged-in
+# roles are included, as is the conditional GET validator query on catalog pages.
+QUERY_BUDGETS = {
+    ('home', 'anonymous'): 5, ('home', 'customer'): 7, ('home', 'company'): 7,
+    ('about', 'anonymous'): 0, ('about', 'customer'): 2, ('about', 'company'): 2,
+    ('admin', 'anonymous'): 0, ('admin', 'customer'): 2, ('admin', 'company'): 2,
+    ('all_services', 'anonymous'): 3, ('all_services', 'customer'): 5, ('all_services', 'company'): 5,
+    ('all_services_search', 'anonymous'): 3, ('all_services_search', 'customer'): 5, ('all_services_search', 'company'): 5,
+    ('all_services_filtered', 'anonymous'): 3, ('all_services_filtered', 'customer'): 5, ('all_services_filtered', 'company'): 5,
+    ('all_services_rating', 'anonymous'): 3, ('all_services_rating', 'customer'): 5, ('all_services_rating', 'company'): 5,
+    ('all_services_deep_page', 'anonymous'): 3, ('all_services_deep_page', 'customer'): 5, ('all_services_deep_page', 'company'): 5,
+    ('services_by_category', 'anonymous'): 3, ('services_by_category', 'customer'): 5, ('services_by_category', 'company'): 5,
+    ('service_detail', 'anonymous'): 4, ('service_detail', 'customer'): 7, ('service_detail', 'company'): 6,
+    ('create_service', 'anonymous'): 0, ('create_service', 'customer'): 2, ('create_service', 'company'): 2,
+    ('service_requests', 'anonymous'): 0, ('service_requests', 'customer'): 2, ('service_requests', 'company'): 4,
+    ('request_service', 'anonymous'): 0, ('request_service', 'customer'): 4, ('request_service', 'company'): 2,
+    ('rate_service', 'anonymous'): 0, ('rate_service', 'customer'): 4, ('rate_service', 'company'): 2,
+    ('customer_register', 'anonymous'): 0, ('customer_register', 'customer'): 2, ('customer_register', 'company'): 2,
+    ('company_register', 'anonymous'): 0, ('company_register', 'customer'): 2, ('company_register', 'company'): 2,
+    ('login', 'anonymous'): 0, ('login', 'customer'): 2, ('login', 'company'): 2,
+    ('customer_profile', 'anonymous'): 3, ('customer_profile', 'customer'): 5, ('customer_profile', 'company'): 5,
+    ('company_profile', 'anonymous'): 3, ('company_profile', 'customer'): 5, ('company_profile', 'company'): 5,
+    ('logout', 'anonymous'): 0, ('logout', 'customer'): 4, ('logout', 'company'): 4,
+}
+
+class QueryBudgetTests(TestCase):
+    """Render every URL as each kind of user and hold it to its query budget"""
+
+    results = []
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(2024)
+        password = make_password('testpass123')
+        fields = [value for value, _ in Service.FIELD_OF_WORK_CHOICES]
+
+        companies = User.objects.bulk_create([
+            User(username=f'company{i}', email=f'company{i}@test.com', password=password,
+                 user_type='company', field_of_work=fields[i % len(fields)])
+            for i in range(COMPANIES)
+        ])
+        customers = User.objects.bulk_create([
+            User(username=f'customer{i}', email=f'customer{i}@test.com', password=password,
+                 user_type='customer')
+            for i in range(CUSTOMERS)
+        ])
+        services = Service.objects.bulk_create([
+            Service(name=f'Service {i}', description=f'Professional service number {i}',
+                    field=companies[i % COMPANIES].field_of_work,
+                    price_per_hour=rng.randint(20, 150), company=companies[i % COMPANIES],
+                    status='pending' if i % 7 == 0 else 'approved', image='service_images/test.jpg')
+            for i in range(SERVICES)
+        ])
+        approved = [service for service in services if service.status == 'approved']
+
+        pairs = set()
+        while len(pairs) < RATINGS:
+            pairs.add((rng.randrange(len(approved)), rng.randrange(CUSTOMERS)))
+        Rating.objects.bulk_create([
+            Rating(service=approved[s], customer=customers[c], rating=rng.randint(1, 5), review='Solid work')
+            for s, c in pairs
+        ])
+        ServiceRequest.objects.bulk_create([
+            ServiceRequest(service=rng.choice(approved), customer=rng.choice(customers),
+                           address=f'{i} Main St', service_time_hours=rng.randint(1, 8))
+            for i in range(REQUESTS)
+        ])
+        # bulk_create skips the signal/save hooks that maintain denormalized columns
+        call_command('rebuild_rating_aggregates', stdout=StringIO())
+        call_command('rebuild_request_counters', stdout=StringIO())
+
+        cls.company = companies[0]
+        cls.customer = customers[0]
+        cls.service = next(s for s in approved if s.company_id == cls.company.pk)
+        rated = set(Rating.objects.filter(customer=cls.customer).values_list('service_id', flat=True))
+        cls.unrated_service = next(s for s in approved if s.pk not in rated)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.write_report()
+        super().tearDownClass()
+
+    def pages(self):
+        return {
+            'home': reverse('home'),
+            'about': reverse('about'),
+            'admin': reverse('admin:index'),
+            'all_services': reverse('all_services'),
+            'all_services_search': reverse('all_services') + '?search=Service+1',
+            'all_services_filtered': reverse('all_services') + f'?category={self.service.field}&min_price=30&max_price=120&sort=price_low',
+            'all_services_rating': reverse('all_services') + '?sort=rating',
+            'all_services_deep_page': reverse('all_services') + '?page=30',
+            'services_by_category': reverse('services_by_category', kwargs={'field': self.service.field}),
+            'service_detail': reverse('service_detail', kwargs={'pk': self.service.pk}),
+            'create_service': reverse('create_service'),
+            'service_requests': reverse('service_requests'),
+            'request_service': reverse('request_service', kwargs={'service_id': self.service.pk}),
+            'rate_service': reverse('rate_service', kwargs={'service_id': self.unrated_service.pk}),
+            'customer_register': reverse('customer_register'),
+            'company_register': reverse('company_register'),
+            'login': reverse('login'),
+            'customer_profile': reverse('profile', kwargs={'username': self.customer.username}),
+            'company_profile': reverse('profile', kwargs={'username': self.company.username}),
+            'logout': reverse('logout'),
+        }
+
+    def client_for(self, role):
+        client = Client()
+        if role != 'anonymous':
+            client.force_login(getattr(self, role))
+        return client
+
+    def measure(self, role):
+        for page, url in self.pages().items():
+            with self.subTest(page=page, role=role):
+                client = self.client_for(role)
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get(url)
+                self.assertIn(response.status_code, (200, 302))
+
+                sql_seconds = sum(float(query['time']) for query in queries.captured_queries)
+                budget = QUERY_BUDGETS[(page, role)]
+                self.results.append((page, role, response.status_code, len(queries), budget, sql_seconds))
+
+                self.assertLessEqual(
+                    len(queries), budget,
+                    f'{page} as {role}: {len(queries)} queries, budget {budget}\n'
+                    + '\n'.join(query['sql'] for query in queries.captured_queries)
+                )
+                self.assertLessEqual(sql_seconds, MAX_SQL_SECONDS, f'{page} as {role}: {sql_seconds:.3f}s of SQL')
+
+    def test_anonymous_query_budgets(self):
+        """Test every page stays within budget for anonymous visitors"""
+        self.measure('anonymous')
+
+    def test_customer_query_budgets(self):
+        """Test every page stays within budget for customers"""
+        self.measure('customer')
+
+    def test_company_query_budgets(self):
+        """Test every page stays within budget for companies"""
+        self.measure('company')
+
+    @classmethod
+    def write_report(cls):
+        path = os.environ.get('QUERY_REPORT_PATH', 'query_report.md')
+        lines = [
+            '# Query budget report',
+            '',
+            f'Fixture: {COMPANIES} companies, {CUSTOMERS} customers, {SERVICES} services, '
+            f'{RATINGS} ratings, {REQUESTS} requests.',
+            '',
+            '| Page | Role | Status | Queries | Budget | SQL ms |',
+            '| --- | --- | --- | --- | --- | --- |',
+        ]
+        for page, role, status, count, budget, seconds in sorted(cls.results):
+            flag = ' **over**' if count > budget else ''
+            lines.append(f'| {page} | {role} | {status} | {count}{flag} | {budget} | {seconds * 1000:.1f} |')
+        with open(path, 'w') as report:
+            report.write('\n'.join(lines) + '\n')
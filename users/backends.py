@@ -1,14 +1,43 @@
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
+from django.core.exceptions import PermissionDenied
 
 User = get_user_model()
 
 class EmailBackend(ModelBackend):
+    """
+    Log in with an email address, matched case-insensitively, or a username.
+
+    Every attempt costs one query and one password hash whether or not the
+    account exists, so response times do not reveal registered emails. Once this
+    backend has checked an attempt it decides it: a failure stops the chain
+    instead of letting ModelBackend repeat the same query and hash.
+    """
+
     def authenticate(self, request, username=None, password=None, **kwargs):
-        try:
-            user = User.objects.get(email=username)
-            if user.check_password(password):
-                return user
-        except User.DoesNotExist:
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if not username or password is None:
             return None
-        return None
+
+        user = self.get_login_user(username)
+        if user is None:
+            # Hash anyway so a miss costs the same as a wrong password
+            User().set_password(password)
+            raise PermissionDenied
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        raise PermissionDenied
+
+    def get_login_user(self, identifier):
+        """The account whose email (any case) or username is ``identifier``; email wins a tie"""
+        normalized = identifier.lower()
+        # A UNION rather than an OR, so each branch is served by its own unique index; excluding
+        # blank emails lets the partial email index apply
+        by_email = User.objects.exclude(email='').filter(email__lower=normalized)
+        by_username = User.objects.filter(username=identifier)
+        candidates = list(by_email.union(by_username))
+        for candidate in candidates:
+            if candidate.email.lower() == normalized:
+                return candidate
+        return candidates[0] if candidates else None
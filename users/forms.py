@@ -34,7 +34,7 @@ class CustomerRegistrationForm(forms.ModelForm):
 
     def clean_email(self):
         email = self.cleaned_data.get('email')
-        if User.objects.filter(email=email).exists():
+        if email and User.objects.exclude(email='').filter(email__lower=email.lower()).exists():
             raise forms.ValidationError("A user with this email already exists.")
         return email
 
@@ -85,7 +85,7 @@ class CompanyRegistrationForm(forms.ModelForm):
 
     def clean_email(self):
         email = self.cleaned_data.get('email')
-        if User.objects.filter(email=email).exists():
+        if email and User.objects.exclude(email='').filter(email__lower=email.lower()).exists():
             raise forms.ValidationError("A user with this email already exists.")
         return email
 
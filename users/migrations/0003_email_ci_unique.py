@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:38
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_duplicate_emails(apps, schema_editor):
+    """Fail with the offending addresses rather than an opaque IntegrityError"""
+    User = apps.get_model('users', 'User')
+    duplicates = list(
+        User.objects.exclude(email='').annotate(normalized=Lower('email'))
+        .values('normalized').annotate(total=Count('pk')).filter(total__gt=1)
+        .values_list('normalized', flat=True)
+    )
+    if duplicates:
+        raise RuntimeError(
+            'Accounts share these emails (ignoring case); merge or change them before migrating: '
+            + ', '.join(duplicates)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0002_user_pending_requests_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='user',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('email'), condition=models.Q(('email', ''), _negated=True), name='users_user_email_ci_unique', violation_error_message='A user with this email already exists.'),
+        ),
+    ]
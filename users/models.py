@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Lower
 
 class User(AbstractUser):
     USER_TYPE_CHOICES = (
@@ -24,3 +26,20 @@ class User(AbstractUser):
     user_type = models.CharField(max_length=20, choices=USER_TYPE_CHOICES)
     date_of_birth = models.DateField(null=True, blank=True)
     field_of_work = models.CharField(max_length=50, choices=FIELD_OF_WORK_CHOICES, null=True, blank=True)
+    # Requests on this company's approved services, maintained by services.signals
+    pending_requests_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta(AbstractUser.Meta):
+        constraints = [
+            # Emails log users in, so they must be unique regardless of case; blank ones (e.g. superusers) may repeat
+            models.UniqueConstraint(
+                Lower('email'),
+                name='users_user_email_ci_unique',
+                condition=~Q(email=''),
+                violation_error_message='A user with this email already exists.',
+            ),
+        ]
+
+# email__lower=value.lower() compiles to LOWER(email) = %s. The index above is partial, so only
+# lookups that also exclude blank emails (.exclude(email='')) can use it
+User._meta.get_field('email').register_lookup(Lower)
@@ -1,6 +1,13 @@
-from django.test import TestCase, Client
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import MD5PasswordHasher
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from services.models import Service, ServiceRequest
+from .forms import CustomerRegistrationForm
 from .models import User
 
 class UserRegistrationTests(TestCase):
@@ -128,6 +135,150 @@ class UserLoginTests(TestCase):
         self.assertEqual(response.status_code, 302)  # Redirect after logout
         self.assertFalse('_auth_user_id' in self.client.session)
 
+class CountingHasher(MD5PasswordHasher):
+    """MD5 hasher that counts how many times a password is hashed"""
+    encodes = 0
+
+    def encode(self, password, salt):
+        CountingHasher.encodes += 1
+        return super().encode(password, salt)
+
+@override_settings(PASSWORD_HASHERS=['users.tests.CountingHasher'])
+class EmailBackendTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user(
+            username='customer',
+            email='Customer@Test.com',
+            password='testpass123',
+            user_type='customer'
+        )
+        CountingHasher.encodes = 0
+
+    def attempt(self, username, password):
+        """Authenticate, returning the user and the queries and hashes it cost"""
+        CountingHasher.encodes = 0
+        with CaptureQueriesContext(connection) as queries:
+            user = authenticate(username=username, password=password)
+        return user, len(queries), CountingHasher.encodes
+
+    def test_email_matches_case_insensitively(self):
+        """Test the email lookup ignores case"""
+        user, _, _ = self.attempt('customer@test.COM', 'testpass123')
+        self.assertEqual(user, self.customer)
+
+    def test_username_still_logs_in(self):
+        """Test usernames authenticate through the same single lookup"""
+        user, queries, hashes = self.attempt('customer', 'testpass123')
+        self.assertEqual(user, self.customer)
+        self.assertEqual((queries, hashes), (1, 1))
+
+    def test_hit_and_miss_cost_the_same(self):
+        """Test a wrong password and an unknown email each cost one query and one hash"""
+        for username in ('customer@test.com', 'nobody@test.com'):
+            user, queries, hashes = self.attempt(username, 'wrongpass')
+            self.assertIsNone(user)
+            self.assertEqual((queries, hashes), (1, 1), username)
+
+    def test_inactive_user_rejected_after_hashing(self):
+        """Test inactive accounts are refused without a cheaper path"""
+        User.objects.filter(pk=self.customer.pk).update(is_active=False)
+        user, queries, hashes = self.attempt('customer@test.com', 'testpass123')
+        self.assertIsNone(user)
+        self.assertEqual((queries, hashes), (1, 1))
+
+    def test_login_lookup_uses_indexes(self):
+        """Test the email and username lookups are index searches, not table scans"""
+        with CaptureQueriesContext(connection) as queries:
+            authenticate(username='customer@test.com', password='wrongpass')
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {queries.captured_queries[0]['sql']}")
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('USING INDEX users_user_email_ci_unique', plan)
+        self.assertNotIn('SCAN users_user', plan)
+
+    def test_email_unique_regardless_of_case(self):
+        """Test the database refuses a second account with the same email in another case"""
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create_user(username='other', email='CUSTOMER@test.com', password='x', user_type='customer')
+        User.objects.create_user(username='blank1', email='', password='x', user_type='customer')
+        User.objects.create_user(username='blank2', email='', password='x', user_type='customer')
+
+    def test_registration_rejects_email_in_another_case(self):
+        """Test registration reports a case-insensitive duplicate email"""
+        form = CustomerRegistrationForm(data={
+            'username': 'newcustomer',
+            'email': 'customer@TEST.com',
+            'password': 'testpass123',
+            'password_confirmation': 'testpass123',
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn('email', form.errors)
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'users-ratelimit'}},
+    PASSWORD_HASHERS=['users.tests.CountingHasher'],
+    RATE_LIMITS={
+        'login': {'ip': '10/300', 'identifier': '3/300'},
+        'register': {'ip': '2/3600', 'identifier': ''},
+    },
+)
+class LoginRateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.client = Client()
+        User.objects.create_user(
+            username='customer',
+            email='customer@test.com',
+            password='testpass123',
+            user_type='customer'
+        )
+
+    def login(self, email, password='wrongpass', ip='10.0.0.1'):
+        return self.client.post(reverse('login'), {'username': email, 'password': password}, REMOTE_ADDR=ip)
+
+    def test_identifier_limit_rejects_before_hashing(self):
+        """Test attempts past the per-email limit get a 429 without running the hasher"""
+        for _ in range(3):
+            self.assertEqual(self.login('customer@test.com').status_code, 200)
+        CountingHasher.encodes = 0
+        response = self.login(' Customer@TEST.com ', 'testpass123', ip='10.0.0.2')
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(int(response['Retry-After']) > 0)
+        self.assertEqual(CountingHasher.encodes, 0)
+
+    def test_refused_attempts_spend_no_ip_tokens(self):
+        """Test attempts the per-email bucket refuses leave the IP bucket untouched"""
+        for _ in range(3):
+            self.login('customer@test.com')
+        for _ in range(10):
+            self.assertEqual(self.login('customer@test.com').status_code, 429)
+        # 3 of the address's 10 tokens spent; the refused attempts cost nothing
+        for number in range(7):
+            self.assertEqual(self.login(f'user{number}@test.com').status_code, 200)
+        self.assertEqual(self.login('another@test.com').status_code, 429)
+
+    def test_ip_limit_spans_identifiers(self):
+        """Test one address cycling through emails is limited by its IP bucket"""
+        for number in range(10):
+            self.assertEqual(self.login(f'user{number}@test.com').status_code, 200)
+        self.assertEqual(self.login('another@test.com').status_code, 429)
+        self.assertEqual(self.login('another@test.com', ip='10.0.0.9').status_code, 200)
+
+    def test_page_views_are_not_limited(self):
+        """Test only POSTs spend tokens"""
+        for _ in range(5):
+            self.assertEqual(self.client.get(reverse('login')).status_code, 200)
+        self.assertEqual(self.login('customer@test.com', 'testpass123').status_code, 302)
+
+    def test_registration_has_its_own_limit(self):
+        """Test registration forms are limited per endpoint"""
+        for number in range(2):
+            self.client.post(reverse('customer_register'), {'email': f'new{number}@test.com'})
+        response = self.client.post(reverse('company_register'), {'email': 'new9@test.com'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.login('customer@test.com', 'testpass123').status_code, 302)
+
 class ProfileViewTests(TestCase):
     def setUp(self):
         self.client = Client()
@@ -164,3 +315,63 @@ class ProfileViewTests(TestCase):
         """Test viewing nonexistent profile"""
         response = self.client.get(reverse('profile', kwargs={'username': 'nonexistent'}))
         self.assertEqual(response.status_code, 404)
+
+class ProfileQueryTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.customer = User.objects.create_user(
+            username='customer',
+            email='customer@test.com',
+            password='testpass123',
+            user_type='customer'
+        )
+        self.company = User.objects.create_user(
+            username='company',
+            email='company@test.com',
+            password='testpass123',
+            user_type='company',
+            field_of_work='Plumbing'
+        )
+
+    def add_history(self, count):
+        for i in range(count):
+            service = Service.objects.create(
+                name=f'Service {i}',
+                description='Test service',
+                field='Plumbing',
+                price_per_hour=50.00,
+                company=self.company,
+                status='approved'
+            )
+            ServiceRequest.objects.create(
+                service=service,
+                customer=self.customer,
+                address=f'{i} Test Street',
+                service_time_hours=2
+            )
+
+    def count_queries(self, username):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('profile', kwargs={'username': username}))
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_profile_query_count_is_constant(self):
+        """Test profile pages cost the same number of queries for small and large histories"""
+        self.add_history(2)
+        small = (self.count_queries('customer'), self.count_queries('company'))
+        self.add_history(25)
+        large = (self.count_queries('customer'), self.count_queries('company'))
+        self.assertEqual(small, large)
+
+    def test_profile_sections_are_paginated(self):
+        """Test long request and service lists are split into pages"""
+        self.add_history(12)
+        response = self.client.get(reverse('profile', kwargs={'username': 'customer'}))
+        self.assertEqual(len(response.context['service_requests_page']), 10)
+
+        response = self.client.get(reverse('profile', kwargs={'username': 'customer'}) + '?requests_page=2')
+        self.assertEqual(len(response.context['service_requests_page']), 2)
+
+        response = self.client.get(reverse('profile', kwargs={'username': 'company'}) + '?services_page=2')
+        self.assertEqual(len(response.context['services_page']), 2)
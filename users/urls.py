@@ -1,11 +1,13 @@
 from django.urls import path
 from .views import CustomerRegisterView, CompanyRegisterView, UserLoginView, ProfileView
 from xpertshub_app.views import UserLogoutView
+from xpertshub.ratelimit import rate_limit
+from xpertshub.replica import replica_reads
 
 urlpatterns = [
-    path('register/customer/', CustomerRegisterView.as_view(), name='customer_register'),
-    path('register/company/', CompanyRegisterView.as_view(), name='company_register'),
-    path('login/', UserLoginView.as_view(), name='login'),
+    path('register/customer/', rate_limit('register', 'email')(CustomerRegisterView.as_view()), name='customer_register'),
+    path('register/company/', rate_limit('register', 'email')(CompanyRegisterView.as_view()), name='company_register'),
+    path('login/', rate_limit('login', 'username')(UserLoginView.as_view()), name='login'),
     path('logout/', UserLogoutView.as_view(), name='logout'),
-    path('profile/<str:username>/', ProfileView.as_view(), name='profile'),
+    path('profile/<str:username>/', replica_reads(ProfileView.as_view()), name='profile'),
 ]
@@ -1,9 +1,11 @@
 from django.contrib.auth import login
 from django.contrib.auth.views import LoginView
+from django.core.paginator import Paginator
 from django.shortcuts import redirect, get_object_or_404
 from django.urls import reverse_lazy
 from django.views.generic import CreateView, DetailView
 from .forms import CustomerRegistrationForm, CompanyRegistrationForm, LoginForm
+from services.models import Service, ServiceRequest
 from .models import User
 
 class CustomerRegisterView(CreateView):
@@ -42,6 +44,27 @@ class ProfileView(DetailView):
     slug_field = 'username'
     slug_url_kwarg = 'username'
 
+    sections_paginate_by = 10
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # Each section is one joined, paginated query regardless of history size
+        if self.object.user_type == 'customer':
+            service_requests = ServiceRequest.objects.filter(
+                customer=self.object
+            ).select_related('service', 'service__company').order_by('-date_requested', '-id')
+            context['service_requests_page'] = Paginator(
+                service_requests, self.sections_paginate_by
+            ).get_page(self.request.GET.get('requests_page'))
+        else:
+            services = Service.objects.filter(
+                company=self.object
+            ).defer('description', 'search_vector').order_by('-date_created', '-id')
+            context['services_page'] = Paginator(
+                services, self.sections_paginate_by
+            ).get_page(self.request.GET.get('services_page'))
+        return context
+
     def get_template_names(self):
         if self.object.user_type == 'customer':
             return ['users/customer_profile.html']
@@ -0,0 +1,109 @@
+"""
+Prometheus metrics for XpertsHub
+
+Request latency per URL name, database queries per URL name, email delivery
+outcomes and latency, and the number of live gunicorn workers. Under gunicorn,
+set PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py does when METRICS_ENABLED is on)
+so every worker writes to a shared directory and /metrics reports the sum.
+"""
+import os
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+)
+from .query_wrappers import wrap_queries
+
+REQUEST_SECONDS = Histogram(
+    'xpertshub_request_duration_seconds', 'Time to serve a request, by URL name', ['view', 'method']
+)
+REQUESTS = Counter(
+    'xpertshub_requests_total', 'Requests served, by URL name and status class', ['view', 'method', 'status']
+)
+DB_QUERIES = Counter(
+    'xpertshub_db_queries_total', 'Database queries run while serving requests, by URL name', ['view', 'database']
+)
+DB_QUERY_SECONDS = Counter(
+    'xpertshub_db_query_seconds_total', 'Time spent in database queries, by URL name', ['view', 'database']
+)
+EMAILS = Counter('xpertshub_emails_total', 'Emails sent, by channel and outcome', ['channel', 'outcome'])
+EMAIL_SECONDS = Histogram('xpertshub_email_send_duration_seconds', 'Time to hand an email to the mail provider', ['channel'])
+WORKERS = Gauge('xpertshub_gunicorn_workers', 'Live gunicorn worker processes', multiprocess_mode='livesum')
+
+def observe_email(channel, sent, seconds):
+    """Record one delivery attempt through ``channel``, e.g. 'outbox'"""
+    EMAILS.labels(channel=channel, outcome='success' if sent else 'failure').inc()
+    EMAIL_SECONDS.labels(channel=channel).observe(seconds)
+
+def view_label(request):
+    """URL name of the matched route; admin pages share one label to bound cardinality"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    if match.namespace == 'admin':
+        return 'admin'
+    return match.view_name or 'unnamed'
+
+def registry():
+    """Registry to export: every worker's samples when running multiprocess, else this process's"""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        collected = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collected)
+        return collected
+    return REGISTRY
+
+def render():
+    return generate_latest(registry()), CONTENT_TYPE_LATEST
+
+class QueryTally:
+    def __init__(self):
+        self.databases = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            alias = context['connection'].alias
+            count, seconds = self.databases.get(alias, (0, 0.0))
+            self.databases[alias] = (count + 1, seconds + time.perf_counter() - started)
+
+class MetricsMiddleware:
+    """Time every request and count its queries under the URL name it resolved to"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        tally = QueryTally()
+        started = time.perf_counter()
+        with wrap_queries(tally):
+            response = self.get_response(request)
+        return self.record(request, response, tally, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        tally = QueryTally()
+        started = time.perf_counter()
+        with wrap_queries(tally):
+            response = await self.get_response(request)
+        return self.record(request, response, tally, time.perf_counter() - started)
+
+    def record(self, request, response, tally, elapsed):
+        view = view_label(request)
+        REQUEST_SECONDS.labels(view=view, method=request.method).observe(elapsed)
+        REQUESTS.labels(view=view, method=request.method, status=f'{response.status_code // 100}xx').inc()
+        for alias, (count, seconds) in tally.databases.items():
+            DB_QUERIES.labels(view=view, database=alias).inc(count)
+            DB_QUERY_SECONDS.labels(view=view, database=alias).inc(seconds)
+        return response
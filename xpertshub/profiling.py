@@ -0,0 +1,167 @@
+"""
+Opt-in per-request SQL and template profiling
+
+With SQL_PROFILING=True, SQLProfilingMiddleware counts every query a request
+runs, its total SQL time and statements executed more than once with the same
+parameters, times template rendering, and reports them in a Server-Timing
+header that browser devtools display. The SQL_PROFILING_SLOWEST slowest
+requests seen by each process are logged with their most repeated query
+shapes. When disabled, the middleware removes itself at startup.
+"""
+import heapq
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.template.backends.django import Template
+from .query_wrappers import wrap_queries
+import logging
+
+logger = logging.getLogger(__name__)
+
+_current_profile = ContextVar('request_profile', default=None)
+
+# (duration, sequence, summary) of the slowest requests this process has served
+_slowest = []
+_slowest_lock = threading.Lock()
+_sequence = 0
+
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+
+def fingerprint(sql):
+    """Query shape: whitespace folded and IN lists of any length collapsed"""
+    return _PLACEHOLDER_LIST.sub('(%s, ...)', _WHITESPACE.sub(' ', sql).strip())
+
+class RequestProfile:
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.statements = Counter()
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += time.perf_counter() - started
+            self.queries += 1
+            self.shapes[fingerprint(sql)] += 1
+            try:
+                self.statements[(sql, repr(params))] += 1
+            except Exception:
+                pass
+
+    @property
+    def duplicates(self):
+        """Executions beyond the first of statements repeated with identical parameters"""
+        return sum(count - 1 for count in self.statements.values() if count > 1)
+
+    def repeated_shapes(self, limit=3):
+        return [(shape, count) for shape, count in self.shapes.most_common(limit) if count > 1]
+
+    def server_timing(self, total_seconds):
+        return ', '.join([
+            f'sql;dur={self.sql_seconds * 1000:.1f};desc="{self.queries} queries, {self.duplicates} duplicate"',
+            f'tpl;dur={self.template_seconds * 1000:.1f}',
+            f'total;dur={total_seconds * 1000:.1f}',
+        ])
+
+def _timed_render(render):
+    def timed(self, *args, **kwargs):
+        profile = _current_profile.get()
+        if profile is None:
+            return render(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            # Includes queries run lazily by the template, which sql also counts
+            profile.template_seconds += time.perf_counter() - started
+    timed.profiled = True
+    return timed
+
+def record_slow_request(request, total_seconds, profile):
+    """Keep the slowest requests per process and log each one that makes the list"""
+    global _sequence
+    limit = settings.SQL_PROFILING_SLOWEST
+    with _slowest_lock:
+        if len(_slowest) >= limit and total_seconds <= _slowest[0][0]:
+            return
+        _sequence += 1
+        summary = {
+            'path': request.get_full_path(),
+            'method': request.method,
+            'total_ms': round(total_seconds * 1000, 1),
+            'sql_ms': round(profile.sql_seconds * 1000, 1),
+            'template_ms': round(profile.template_seconds * 1000, 1),
+            'queries': profile.queries,
+            'duplicates': profile.duplicates,
+            'repeated': profile.repeated_shapes(),
+        }
+        entry = (total_seconds, _sequence, summary)
+        if len(_slowest) >= limit:
+            heapq.heapreplace(_slowest, entry)
+        else:
+            heapq.heappush(_slowest, entry)
+
+    repeated = ''.join(f'\n    {count}x {shape}' for shape, count in summary['repeated'])
+    logger.warning(
+        f"Slow request {summary['method']} {summary['path']}: {summary['total_ms']}ms total, "
+        f"{summary['sql_ms']}ms SQL in {summary['queries']} queries ({summary['duplicates']} duplicate), "
+        f"{summary['template_ms']}ms templates{repeated}"
+    )
+
+def slowest_requests():
+    """Summaries of the slowest requests this process has served, slowest first"""
+    with _slowest_lock:
+        return [summary for _, _, summary in sorted(_slowest, reverse=True)]
+
+class SQLProfilingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SQL_PROFILING', False):
+            # Dropped from the middleware chain, so disabled profiling costs nothing per request
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        if not getattr(Template.render, 'profiled', False):
+            Template.render = _timed_render(Template.render)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            with wrap_queries(profile):
+                response = self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        return self.report(request, response, profile, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        profile = RequestProfile()
+        token = _current_profile.set(profile)
+        started = time.perf_counter()
+        try:
+            with wrap_queries(profile):
+                response = await self.get_response(request)
+        finally:
+            _current_profile.reset(token)
+        return self.report(request, response, profile, time.perf_counter() - started)
+
+    def report(self, request, response, profile, total_seconds):
+        response['Server-Timing'] = profile.server_timing(total_seconds)
+        record_slow_request(request, total_seconds, profile)
+        return response
@@ -0,0 +1,42 @@
+"""
+Query wrappers for sync and async requests
+
+connection.execute_wrapper() only sees queries on the calling thread's
+connection, but async views run theirs in sync_to_async threads the middleware
+never enters. Instead every connection gets one permanent wrapper as it
+connects, which passes each query through the wrappers registered with
+wrap_queries for the current context; context variables follow a request into
+those threads.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+_wrappers = ContextVar('request_query_wrappers', default=())
+
+def _dispatch(execute, sql, params, many, context):
+    wrappers = _wrappers.get()
+    # Registered first means outermost, like nested execute_wrapper() blocks
+    for wrapper in reversed(wrappers):
+        execute = partial(wrapper, execute)
+    return execute(sql, params, many, context)
+
+@receiver(connection_created)
+def install(sender, connection, **kwargs):
+    if _dispatch not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_dispatch)
+
+@contextmanager
+def wrap_queries(wrapper):
+    """Pass every query run in this context, on any database and thread, through ``wrapper``"""
+    # Connections this thread opened before the receiver was registered
+    for connection in connections.all(initialized_only=True):
+        install(None, connection)
+    token = _wrappers.set((*_wrappers.get(), wrapper))
+    try:
+        yield
+    finally:
+        _wrappers.reset(token)
@@ -0,0 +1,134 @@
+"""
+Token-bucket rate limiting for login and registration
+
+Each endpoint in RATE_LIMITS has a bucket per client IP and per normalized
+identifier (the email or username being tried), both written as
+'attempts/seconds': a full bucket allows that many attempts at once and refills
+at that rate. Buckets live in the default cache and are updated only with
+add/incr/decr. With CACHE_URL pointing at Redis or Memcached those are atomic
+and shared, so every process enforces the same limits; on the per-process
+memory cache each gunicorn worker keeps its own buckets, multiplying the limits
+by the worker count (see the xpertshub_app.W002 check). Over-limit POSTs are
+refused with a 429 before the form, and so the password hasher, ever runs.
+"""
+import hashlib
+import math
+import time
+from functools import wraps
+from django.conf import settings
+from django.core.cache import cache
+from django.shortcuts import render
+
+def parse_limit(limit):
+    """'5/300' -> (5, 300.0); empty means unlimited"""
+    if not limit:
+        return None
+    attempts, seconds = limit.split('/')
+    return int(attempts), float(seconds)
+
+def client_ip(request):
+    """The client's address, skipping RATE_LIMIT_PROXY_COUNT trusted proxies in X-Forwarded-For"""
+    proxies = getattr(settings, 'RATE_LIMIT_PROXY_COUNT', 1)
+    forwarded = [hop.strip() for hop in request.META.get('HTTP_X_FORWARDED_FOR', '').split(',') if hop.strip()]
+    if proxies and len(forwarded) >= proxies:
+        return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+def _interval(limit):
+    capacity, seconds = limit
+    return max(int(seconds * 1000 / capacity), 1)
+
+def wait_time(key, limit):
+    """Seconds until the bucket at ``key`` has a token, without taking one"""
+    capacity, _ = limit
+    interval = _interval(limit)
+    now = int(time.time() * 1000)
+    arrival = max(cache.get(key) or now, now) + interval
+    return max(arrival - now - capacity * interval, 0) / 1000
+
+def refund(key, limit):
+    """Return a token taken by consume()"""
+    try:
+        cache.decr(key, _interval(limit))
+    except ValueError:
+        pass
+
+def consume(key, limit):
+    """
+    Take one token from the bucket at ``key``; returns seconds to wait, 0 if allowed.
+
+    The bucket is stored as its theoretical arrival time (GCRA): the moment it
+    would be full again, in milliseconds. Each attempt pushes that time one
+    refill interval forward with incr, and is allowed while it stays within the
+    bucket's capacity of now.
+    """
+    capacity, seconds = limit
+    interval = _interval(limit)
+    timeout = math.ceil(seconds)
+    now = int(time.time() * 1000)
+
+    # A bucket nobody has touched for `seconds` is full, so it may simply expire
+    cache.add(key, now, timeout)
+    try:
+        arrival = cache.incr(key, interval)
+    except ValueError:
+        # Expired between add and incr
+        arrival = now + interval
+        cache.set(key, arrival, timeout)
+    if arrival - interval < now:
+        # Refilled past full while idle; credit beyond capacity does not accumulate
+        arrival = cache.incr(key, now - (arrival - interval))
+
+    if arrival - now > capacity * interval:
+        # Refused attempts do not spend a token
+        cache.decr(key, interval)
+        return (arrival - now - capacity * interval) / 1000
+    cache.touch(key, timeout)
+    return 0
+
+def bucket_key(endpoint, kind, value):
+    digest = hashlib.sha256(value.encode()).hexdigest()[:32]
+    return f'ratelimit:{endpoint}:{kind}:{digest}'
+
+def check(request, endpoint, field):
+    """Seconds the client must wait before ``endpoint`` accepts another attempt, 0 if allowed"""
+    limits = settings.RATE_LIMITS.get(endpoint, {})
+    values = [('ip', client_ip(request))]
+    identifier = request.POST.get(field, '').strip().lower()
+    if identifier:
+        values.append(('identifier', identifier))
+    buckets = [
+        (bucket_key(endpoint, kind, value), parse_limit(limits.get(kind)))
+        for kind, value in values if parse_limit(limits.get(kind))
+    ]
+
+    # Look at every bucket first, so an attempt one bucket refuses spends no token from the others
+    wait = max([wait_time(key, limit) for key, limit in buckets], default=0)
+    if wait:
+        return wait
+    taken = []
+    for key, limit in buckets:
+        wait = consume(key, limit)
+        if wait:
+            # Emptied by a concurrent attempt since the look above
+            for taken_key, taken_limit in taken:
+                refund(taken_key, taken_limit)
+            return wait
+        taken.append((key, limit))
+    return 0
+
+def rate_limit(endpoint, field):
+    """Limit POSTs to a view by client IP and by the normalized value of ``field``"""
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped(request, *args, **kwargs):
+            if request.method == 'POST':
+                wait = check(request, endpoint, field)
+                if wait:
+                    retry_after = math.ceil(wait)
+                    response = render(request, '429.html', {'retry_after': retry_after}, status=429)
+                    response['Retry-After'] = str(retry_after)
+                    return response
+            return view_func(request, *args, **kwargs)
+        return wrapped
+    return decorator
@@ -0,0 +1,100 @@
+"""
+Read-replica routing for catalog pages
+
+Views wrapped in ``replica_reads`` (listings, service detail, home and profiles)
+read from the ``replica`` database; everything else, every write and every read
+after a write in the same request stays on ``default``. A request that writes
+also sets a short-lived cookie that keeps the browser's next requests on the
+primary, so a redirect after posting a request or rating never shows a replica
+that has not caught up yet.
+"""
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+REPLICA_ALIAS = 'replica'
+PIN_COOKIE = 'primary_pin'
+
+_request_state = ContextVar('replica_request_state', default=None)
+
+class RequestState:
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.use_replica = False
+        self.wrote = False
+
+def replica_reads(view_func):
+    """Mark a read-only view whose queries may be served by the replica database"""
+    view_func.replica_reads = True
+    return view_func
+
+class ReplicaRouter:
+    """Send reads to the replica only inside replica_reads views that have not written"""
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if state is not None and state.use_replica and not state.wrote:
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica receives schema changes through replication
+        return db != REPLICA_ALIAS
+
+class ReplicaPinMiddleware:
+    """
+    Track database use per request for ReplicaRouter and pin writers to the primary.
+
+    Sits above SessionMiddleware so session saves count as writes.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = RequestState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _request_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.pin(state, response)
+
+    async def __acall__(self, request):
+        state = RequestState(pinned=PIN_COOKIE in request.COOKIES)
+        token = _request_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+        return self.pin(state, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _request_state.get()
+        if state is not None and getattr(view_func, 'replica_reads', False) and not state.pinned:
+            state.use_replica = True
+
+    def pin(self, state, response):
+        if state.wrote:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax',
+                secure=settings.SESSION_COOKIE_SECURE,
+            )
+        return response
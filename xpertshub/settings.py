@@ -78,6 +78,12 @@ LOGOUT_REDIRECT_URL = '/'
 TAILWIND_APP_NAME = 'theme'
 
 MIDDLEWARE = [
+    # Outermost so its timings cover the whole stack; removes itself unless SQL_PROFILING is on
+    'xpertshub.profiling.SQLProfilingMiddleware',
+    # Per-URL-name latency and query counters for /metrics; removes itself unless METRICS_ENABLED is on
+    'xpertshub.metrics.MetricsMiddleware',
+    # Records queries slower than SLOW_QUERY_MS; removes itself when no threshold is set
+    'xpertshub.slow_queries.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -114,6 +120,10 @@ WSGI_APPLICATION = 'xpertshub.wsgi.application'
 import dj_database_url
 import os
 
+# Route home, catalog and detail pages to their async views; serve with gunicorn's
+# uvicorn worker (see gunicorn.conf.py) to run them on an event loop
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', default=False)
+
 # Try DATABASE_URL first, fallback to individual variables
 DATABASE_URL = os.environ.get('DATABASE_URL')
 
@@ -133,6 +143,48 @@ else:
         }
     }
 
+# Connection reuse for PostgreSQL. DB_POOL=True gives every worker process a psycopg
+# connection pool (requires psycopg 3); otherwise each thread keeps its connection
+# open for DB_CONN_MAX_AGE seconds instead of reconnecting on every request. Under
+# ASYNC_VIEWS that would leak a connection per request, so use DB_POOL there.
+if DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql':
+    # Pings reused connections first; with a pool, connections are checked as they are handed out
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = env.bool('DB_CONN_HEALTH_CHECKS', default=True)
+    if env.bool('DB_POOL', default=False):
+        DATABASES['default'].setdefault('OPTIONS', {})['pool'] = {
+            'min_size': env.int('DB_POOL_MIN_SIZE', default=2),
+            'max_size': env.int('DB_POOL_MAX_SIZE', default=10),
+            # Seconds a request waits for a free connection before failing
+            'timeout': env.float('DB_POOL_TIMEOUT', default=10.0),
+            'max_idle': env.float('DB_POOL_MAX_IDLE', default=300.0),
+            'max_lifetime': env.float('DB_POOL_MAX_LIFETIME', default=3600.0),
+        }
+        # The pool manages connection lifetime; Django rejects persistent connections alongside it
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+    elif ASYNC_VIEWS:
+        # Each ASGI request runs its queries in a new thread-sensitive context (see Django's
+        # "Persistent connections" docs), so connections kept open are never reused
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = env.int('DB_CONN_MAX_AGE', default=60)
+
+
+# Optional read replica for catalog listings, service detail, home and profiles.
+# Views opt in with xpertshub.replica.replica_reads; writes and the requests that
+# follow them for REPLICA_PIN_SECONDS stay on the primary.
+REPLICA_DATABASE_URL = os.environ.get('REPLICA_DATABASE_URL')
+REPLICA_PIN_SECONDS = env.int('REPLICA_PIN_SECONDS', default=10)
+
+if REPLICA_DATABASE_URL:
+    DATABASES['replica'] = dj_database_url.parse(REPLICA_DATABASE_URL)
+    for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS', 'OPTIONS'):
+        if key in DATABASES['default']:
+            DATABASES['replica'][key] = DATABASES['default'][key]
+    # Tests read and write one database
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+    DATABASE_ROUTERS = ['xpertshub.replica.ReplicaRouter']
+    MIDDLEWARE.insert(0, 'xpertshub.replica.ReplicaPinMiddleware')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -217,6 +269,10 @@ if not DEBUG:
 if not DEBUG:
     # Production: Use SendGrid Web API (faster than SMTP)
     SENDGRID_API_KEY = env('SENDGRID_API_KEY', default='')
+    # Pooled keep-alive client settings (services.sendgrid_client)
+    SENDGRID_API_HOST = env('SENDGRID_API_HOST', default='https://api.sendgrid.com')
+    SENDGRID_POOL_MAXSIZE = env.int('SENDGRID_POOL_MAXSIZE', default=10)
+    SENDGRID_TIMEOUT = env.float('SENDGRID_TIMEOUT', default=10.0)
     DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL', default='noreply@xpertshub.com')
     SERVER_EMAIL = env('DEFAULT_FROM_EMAIL', default='noreply@xpertshub.com')
 else:
@@ -230,6 +286,87 @@ else:
     DEFAULT_FROM_EMAIL = env('EMAIL_HOST_USER', default='')
     SERVER_EMAIL = env('EMAIL_HOST_USER', default='')
 
+# Cache
+# Defaults to a per-process memory cache; point CACHE_URL at redis/memcached so
+# signal-driven invalidation reaches every worker.
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# The home and page caches below are off by default on the per-process cache, where an
+# edit only invalidates the worker that made it and every other worker keeps serving stale data
+_per_process_cache = CACHES['default']['BACKEND'].endswith('.LocMemCache')
+
+# Seconds home page stats and featured services stay cached between invalidations; 0 disables
+HOME_CACHE_TIMEOUT = env.int('HOME_CACHE_TIMEOUT', default=0 if _per_process_cache else 300)
+
+# Seconds rendered catalog, detail and home pages stay cached for anonymous visitors; 0 disables
+PAGE_CACHE_TIMEOUT = env.int('PAGE_CACHE_TIMEOUT', default=0 if _per_process_cache else 300)
+
+# Feature services by requests in this many recent days (manage.py refresh_leaderboard);
+# 0 ranks by all-time request count
+FEATURED_SERVICES_WINDOW_DAYS = env.int('FEATURED_SERVICES_WINDOW_DAYS', default=0)
+
+# Cursor (keyset) pagination for catalog and request listings; offset pages otherwise
+KEYSET_PAGINATION = env.bool('KEYSET_PAGINATION', default=False)
+
+# Widths, in pixels, of the WebP and JPEG copies the image worker (manage.py process_image_uploads)
+# makes of every service image
+IMAGE_DERIVATIVE_WIDTHS = env.list('IMAGE_DERIVATIVE_WIDTHS', cast=int, default=[320, 640, 960])
+
+# Stage service image uploads on local disk and let the image worker push them to media
+# storage (manage.py process_image_uploads, the Procfile's images process). Only enable it
+# when that process can read the web process's IMAGE_STAGING_ROOT, e.g. on a shared volume.
+BACKGROUND_IMAGE_UPLOADS = env.bool('BACKGROUND_IMAGE_UPLOADS', default=False)
+IMAGE_STAGING_ROOT = env('IMAGE_STAGING_ROOT', default=str(BASE_DIR / 'media_staging'))
+IMAGE_UPLOAD_MAX_ATTEMPTS = env.int('IMAGE_UPLOAD_MAX_ATTEMPTS', default=5)
+
+# Per-request query counts, SQL and template time as Server-Timing headers, and a log of
+# the slowest SQL_PROFILING_SLOWEST requests per process (xpertshub/profiling.py)
+SQL_PROFILING = env.bool('SQL_PROFILING', default=False)
+SQL_PROFILING_SLOWEST = env.int('SQL_PROFILING_SLOWEST', default=10)
+
+# Prometheus metrics at /metrics (xpertshub/metrics.py). Under gunicorn every worker writes
+# to PROMETHEUS_MULTIPROC_DIR and the endpoint sums them. Scrapers must send
+# "Authorization: Bearer <METRICS_TOKEN>" when a token is set.
+METRICS_ENABLED = env.bool('METRICS_ENABLED', default=False)
+METRICS_TOKEN = env('METRICS_TOKEN', default='')
+
+# Record queries slower than SLOW_QUERY_MS milliseconds (0 disables) with their fingerprint,
+# URL name, GET parameter names and template to SLOW_QUERY_LOG, plus the query plan for a
+# SLOW_QUERY_EXPLAIN_RATE sample of them (xpertshub/slow_queries.py; manage.py slow_queries)
+SLOW_QUERY_MS = env.float('SLOW_QUERY_MS', default=0)
+SLOW_QUERY_EXPLAIN_RATE = env.float('SLOW_QUERY_EXPLAIN_RATE', default=0.1)
+SLOW_QUERY_LOG = env('SLOW_QUERY_LOG', default=str(BASE_DIR / 'slow_queries.log'))
+SLOW_QUERY_LOG_MAX_BYTES = env.int('SLOW_QUERY_LOG_MAX_BYTES', default=5 * 1024 * 1024)
+SLOW_QUERY_BUFFER = env.int('SLOW_QUERY_BUFFER', default=200)
+
+# Token buckets for login and registration POSTs, per client IP and per email tried, as
+# 'attempts/seconds'; empty disables a bucket (xpertshub/ratelimit.py). Buckets live in the
+# default cache, which must be shared and atomic (Redis, Memcached) to hold across workers.
+RATE_LIMITS = {
+    'login': {
+        'ip': env('RATE_LIMIT_LOGIN_IP', default='30/300'),
+        'identifier': env('RATE_LIMIT_LOGIN_IDENTIFIER', default='5/300'),
+    },
+    'register': {
+        'ip': env('RATE_LIMIT_REGISTER_IP', default='10/3600'),
+        'identifier': env('RATE_LIMIT_REGISTER_IDENTIFIER', default='5/3600'),
+    },
+}
+# Reverse proxies in front of gunicorn that append to X-Forwarded-For: 1 for Railway's edge proxy.
+# Set 0 only when clients connect to gunicorn directly; behind a proxy that would put every
+# visitor in the proxy's IP bucket, and one busy moment would lock everyone out.
+RATE_LIMIT_PROXY_COUNT = env.int('RATE_LIMIT_PROXY_COUNT', default=1)
+
+# Email outbox worker (python manage.py send_queued_emails, the Procfile's worker process)
+# Leave EMAIL_OUTBOX_BACKEND empty to use SendGrid in production and EMAIL_BACKEND otherwise
+EMAIL_OUTBOX_BACKEND = env('EMAIL_OUTBOX_BACKEND', default='')
+EMAIL_OUTBOX_MAX_ATTEMPTS = env.int('EMAIL_OUTBOX_MAX_ATTEMPTS', default=5)
+EMAIL_OUTBOX_RETRY_BASE_SECONDS = env.int('EMAIL_OUTBOX_RETRY_BASE_SECONDS', default=30)
+EMAIL_OUTBOX_RETRY_MAX_SECONDS = env.int('EMAIL_OUTBOX_RETRY_MAX_SECONDS', default=3600)
+EMAIL_OUTBOX_LEASE_SECONDS = env.int('EMAIL_OUTBOX_LEASE_SECONDS', default=300)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,176 @@
+"""
+Slow query capture
+
+With SLOW_QUERY_MS set, SlowQueryMiddleware times every query a request runs
+and records those slower than the threshold: the query's fingerprint, the URL
+name and GET parameter names of the request, the template being rendered and,
+for a SLOW_QUERY_EXPLAIN_RATE sample of SELECTs, the query plan (EXPLAIN
+ANALYZE on PostgreSQL). Records go to a per-process ring buffer and, as JSON
+lines, to SLOW_QUERY_LOG, which rotates once so it never grows past twice
+SLOW_QUERY_LOG_MAX_BYTES. ``manage.py slow_queries`` summarizes the log.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import transaction
+from django.template.base import Template
+from django.utils import timezone
+from .profiling import fingerprint
+from .query_wrappers import wrap_queries
+
+logger = logging.getLogger(__name__)
+
+# Records are written by their own logger so they can go to a file nothing else logs to
+record_logger = logging.getLogger('xpertshub.slow_queries.records')
+record_logger.propagate = False
+
+_current_template = ContextVar('slow_query_template', default=None)
+_explaining = ContextVar('slow_query_explaining', default=False)
+
+_recent = deque()
+_recent_lock = threading.Lock()
+
+def log_paths():
+    """The active log file and its one rotated backup, oldest first"""
+    path = settings.SLOW_QUERY_LOG
+    return [f'{path}.1', path]
+
+def _configure_log():
+    path = settings.SLOW_QUERY_LOG
+    for handler in record_logger.handlers:
+        if getattr(handler, 'baseFilename', None) == os.path.abspath(path):
+            return
+    for handler in list(record_logger.handlers):
+        record_logger.removeHandler(handler)
+        handler.close()
+    handler = RotatingFileHandler(path, maxBytes=settings.SLOW_QUERY_LOG_MAX_BYTES, backupCount=1, delay=True)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    record_logger.addHandler(handler)
+    record_logger.setLevel(logging.INFO)
+
+def _tracked_render(render):
+    def tracked(self, context):
+        token = _current_template.set(self.name)
+        try:
+            return render(self, context)
+        finally:
+            _current_template.reset(token)
+    tracked.tracked = True
+    return tracked
+
+def explain(connection, sql, params):
+    """Query plan lines for a SELECT; EXPLAIN ANALYZE re-runs it, so never pass writes"""
+    analyze = connection.vendor == 'postgresql'
+    prefix = connection.ops.explain_query_prefix(**({'analyze': True} if analyze else {}))
+    token = _explaining.set(True)
+    try:
+        # A savepoint, so a failed EXPLAIN cannot break the request's transaction
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            rows = cursor.fetchall()
+    finally:
+        _explaining.reset(token)
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail)
+        return [row[-1] for row in rows]
+    return [' '.join(str(column) for column in row) for row in rows]
+
+def record(entry):
+    with _recent_lock:
+        _recent.append(entry)
+        while len(_recent) > settings.SLOW_QUERY_BUFFER:
+            _recent.popleft()
+    record_logger.info(json.dumps(entry, default=str))
+
+def recent():
+    """Slow queries recorded by this process, newest last"""
+    with _recent_lock:
+        return list(_recent)
+
+def clear():
+    with _recent_lock:
+        _recent.clear()
+
+def read_log():
+    """Every record in the log file and its backup, oldest first; unreadable lines are skipped"""
+    entries = []
+    for path in log_paths():
+        if not os.path.exists(path):
+            continue
+        with open(path) as log:
+            for line in log:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    continue
+    return entries
+
+class SlowQueryCapture:
+    def __init__(self, request):
+        self.request = request
+
+    def __call__(self, execute, sql, params, many, context):
+        if _explaining.get():
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        result = execute(sql, params, many, context)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms >= settings.SLOW_QUERY_MS:
+            self.capture(context['connection'], sql, params, many, elapsed_ms)
+        return result
+
+    def capture(self, connection, sql, params, many, elapsed_ms):
+        match = getattr(self.request, 'resolver_match', None)
+        entry = {
+            'time': timezone.now().isoformat(),
+            'pid': os.getpid(),
+            'database': connection.alias,
+            'ms': round(elapsed_ms, 2),
+            'fingerprint': fingerprint(sql),
+            'view': match.view_name if match else None,
+            'path': self.request.path,
+            # Names only: the combination of filters is the useful part, and values may be personal
+            'filters': sorted(self.request.GET.keys()),
+            'template': _current_template.get(),
+            'plan': None,
+        }
+        is_select = sql.lstrip().upper().startswith('SELECT')
+        if not many and is_select and random.random() < settings.SLOW_QUERY_EXPLAIN_RATE:
+            try:
+                entry['plan'] = explain(connection, sql, params)
+            except Exception as e:
+                logger.warning(f"Could not explain slow query {entry['fingerprint']}: {str(e)}")
+        record(entry)
+
+class SlowQueryMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'SLOW_QUERY_MS', 0):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+        _configure_log()
+        if not getattr(Template.render, 'tracked', False):
+            Template.render = _tracked_render(Template.render)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with wrap_queries(SlowQueryCapture(request)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with wrap_queries(SlowQueryCapture(request)):
+            return await self.get_response(request)
@@ -1,3 +1,6 @@
+import atexit
+import shutil
+import tempfile
 from .settings import *
 
 # Override database for testing
@@ -5,8 +8,14 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': ':memory:',
-    }
+    },
+    # A separate database, so replica routing tests can tell which one was read
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
 }
+DATABASE_ROUTERS = []
 
 # Disable migrations for faster testing
 class DisableMigrations:
@@ -25,3 +34,25 @@ AUTH_PASSWORD_VALIDATORS = []
 PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.MD5PasswordHasher',
 ]
+
+# Keep tests independent of one another; caching tests opt back in with override_settings
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+    }
+}
+
+# Outbox worker delivers into django.core.mail.outbox
+EMAIL_OUTBOX_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+# Keep uploads offline and out of the repo whatever DEBUG and Cloudinary credentials say
+MEDIA_ROOT = tempfile.mkdtemp(prefix='xpertshub-test-media-')
+atexit.register(shutil.rmtree, MEDIA_ROOT, ignore_errors=True)
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
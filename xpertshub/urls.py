@@ -19,11 +19,14 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from xpertshub_app import views as main_views
+from .replica import replica_reads
 
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('', main_views.home, name='home'),
+    path('', replica_reads(main_views.async_home if settings.ASYNC_VIEWS else main_views.home), name='home'),
     path('about/', main_views.about, name='about'),
+    path('health/db-pool/', main_views.db_pool_stats, name='db_pool_stats'),
+    path('metrics', main_views.metrics, name='metrics'),
     path('auth/', include('users.urls')),
     path('services/', include('services.urls')),
 ]
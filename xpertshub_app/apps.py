@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class XpertshubAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'xpertshub_app'
+
+    def ready(self):
+        from . import checks, signals  # noqa: F401
+        # Registers its connection_created receiver before any connection opens
+        from xpertshub import query_wrappers  # noqa: F401
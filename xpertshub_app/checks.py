@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+@register()
+def async_persistent_connections_check(app_configs, **kwargs):
+    """Persistent connections leak under ASGI, where each request gets a fresh thread context"""
+    if not getattr(settings, 'ASYNC_VIEWS', False):
+        return []
+    return [
+        Warning(
+            f"Database '{alias}' keeps connections open (CONN_MAX_AGE) while ASYNC_VIEWS is on.",
+            hint='Each async request would leave a connection behind; set CONN_MAX_AGE to 0 '
+                 'and use DB_POOL to reuse connections.',
+            id='xpertshub_app.W001',
+        )
+        for alias, database in settings.DATABASES.items()
+        if database.get('CONN_MAX_AGE', 0) != 0
+    ]
+
+@register()
+def rate_limit_cache_check(app_configs, **kwargs):
+    """Rate limit buckets are only shared by every worker through a shared cache"""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    limits = getattr(settings, 'RATE_LIMITS', {})
+    if backend.endswith('.LocMemCache') and any(any(endpoint.values()) for endpoint in limits.values()):
+        return [Warning(
+            'RATE_LIMITS are set but the default cache is per-process memory.',
+            hint='Each gunicorn worker keeps its own buckets, so clients get the limits once per worker; '
+                 'point CACHE_URL at redis or memcached.',
+            id='xpertshub_app.W002',
+        )]
+    return []
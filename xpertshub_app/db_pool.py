@@ -0,0 +1,27 @@
+import os
+from django.db import connections
+
+def pool_stats():
+    """
+    Connection pool usage for every database, as seen by this worker process.
+
+    Each gunicorn worker owns its own pool, so numbers are per process (see ``pid``).
+    ``saturation`` is the share of the pool's maximum size checked out right now;
+    ``requests_waiting`` above zero means requests are queueing for a connection.
+    """
+    stats = {'pid': os.getpid(), 'databases': {}}
+    for alias in connections:
+        # Only the PostgreSQL backend has pools; it returns None when OPTIONS['pool'] is unset
+        pool = getattr(connections[alias], 'pool', None)
+        if pool is None:
+            stats['databases'][alias] = {'pooled': False}
+            continue
+        counters = pool.get_stats()
+        in_use = counters['pool_size'] - counters['pool_available']
+        stats['databases'][alias] = {
+            'pooled': True,
+            'in_use': in_use,
+            'saturation': round(in_use / counters['pool_max'], 2),
+            **counters,
+        }
+    return stats
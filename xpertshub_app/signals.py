@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from services.models import Service, ServiceRequest, Rating
+from users.models import User
+from .stats import invalidate_home_cache
+
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+@receiver(post_save, sender=ServiceRequest)
+@receiver(post_delete, sender=ServiceRequest)
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def clear_home_cache(sender, **kwargs):
+    """Home stats and featured services depend on all of these tables"""
+    invalidate_home_cache()
+
+@receiver(post_save, sender=User)
+def clear_home_cache_for_user(sender, instance, created, update_fields=None, **kwargs):
+    """Skip partial saves such as the last_login update performed on every login"""
+    if created or update_fields is None or 'user_type' in update_fields:
+        invalidate_home_cache()
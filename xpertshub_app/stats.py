@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from services.models import Service, ServiceRequest
+from services.page_cache import bump_page_version
+from services.views import aget_most_requested_services, get_most_requested_services
+from users.models import User
+
+STATS_CACHE_KEY = 'home:stats'
+FEATURED_SERVICES_CACHE_KEY = 'home:featured_services'
+
+def _timeout():
+    return getattr(settings, 'HOME_CACHE_TIMEOUT', 0)
+
+def format_stat(count):
+    """Format statistics with + suffix"""
+    if count < 10:
+        return "1+"
+    elif count < 100:
+        return f"{(count // 10) * 10}+"
+    else:
+        return f"{(count // 100) * 100}+"
+
+def _stat_querysets():
+    return {
+        'providers': User.objects.filter(user_type='company'),
+        'customers': User.objects.filter(user_type='customer'),
+        'services': Service.objects.filter(status='approved'),
+        'requests': ServiceRequest.objects.all(),
+    }
+
+def compute_home_stats():
+    """Count providers, customers, approved services and requests"""
+    return {name: format_stat(queryset.count()) for name, queryset in _stat_querysets().items()}
+
+async def acompute_home_stats():
+    return {name: format_stat(await queryset.acount()) for name, queryset in _stat_querysets().items()}
+
+def get_home_stats():
+    """Home page statistics, served from the cache when warm"""
+    if not _timeout():
+        return compute_home_stats()
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        stats = compute_home_stats()
+        cache.set(STATS_CACHE_KEY, stats, _timeout())
+    return stats
+
+async def aget_home_stats():
+    if not _timeout():
+        return await acompute_home_stats()
+    stats = await cache.aget(STATS_CACHE_KEY)
+    if stats is None:
+        stats = await acompute_home_stats()
+        await cache.aset(STATS_CACHE_KEY, stats, _timeout())
+    return stats
+
+def get_featured_services():
+    """Most requested services for the home page, served from the cache when warm"""
+    if not _timeout():
+        return list(get_most_requested_services())
+    services = cache.get(FEATURED_SERVICES_CACHE_KEY)
+    if services is None:
+        services = list(get_most_requested_services())
+        cache.set(FEATURED_SERVICES_CACHE_KEY, services, _timeout())
+    return services
+
+async def aget_featured_services():
+    if not _timeout():
+        return await aget_most_requested_services()
+    services = await cache.aget(FEATURED_SERVICES_CACHE_KEY)
+    if services is None:
+        services = await aget_most_requested_services()
+        await cache.aset(FEATURED_SERVICES_CACHE_KEY, services, _timeout())
+    return services
+
+def invalidate_home_cache():
+    """
+    Drop cached home page data now and again once the surrounding transaction
+    commits, so a concurrent request cannot re-cache pre-commit numbers.
+    """
+    cache.delete_many([STATS_CACHE_KEY, FEATURED_SERVICES_CACHE_KEY])
+    transaction.on_commit(
+        lambda: cache.delete_many([STATS_CACHE_KEY, FEATURED_SERVICES_CACHE_KEY])
+    )
+    # Rendered home pages cached for anonymous visitors
+    bump_page_version('home')
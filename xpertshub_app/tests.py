@@ -1,7 +1,30 @@
-from django.test import TestCase, Client
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from unittest.mock import patch
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import TestCase, Client, RequestFactory, override_settings
 from django.urls import reverse
 from users.models import User
-from services.models import Service
+from services.models import EmailOutbox, Service, ServiceRequest
+from prometheus_client import REGISTRY
+from services.outbox import drain
+from xpertshub import metrics, profiling, ratelimit, slow_queries
+from xpertshub.replica import PIN_COOKIE, ReplicaRouter
+from .checks import async_persistent_connections_check, rate_limit_cache_check
+from .db_pool import pool_stats
+
+async def count_users_async(request):
+    """An async view running one query, like the ASYNC_VIEWS pages"""
+    await User.objects.acount()
+    return HttpResponse()
 
 class NavigationTests(TestCase):
     def setUp(self):
@@ -100,6 +123,92 @@ class HomePageTests(TestCase):
         service_url = reverse('service_detail', kwargs={'pk': self.service1.pk})
         self.assertContains(response, service_url)
 
+LOCMEM_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'xpertshub-tests',
+    }
+}
+
+@override_settings(CACHES=LOCMEM_CACHES, HOME_CACHE_TIMEOUT=300)
+class HomePageCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.company = User.objects.create_user(
+            username='company',
+            email='company@test.com',
+            password='testpass123',
+            user_type='company',
+            field_of_work='Plumbing'
+        )
+        self.customer = User.objects.create_user(
+            username='customer',
+            email='customer@test.com',
+            password='testpass123',
+            user_type='customer'
+        )
+        self.service = Service.objects.create(
+            name='Popular Service',
+            description='Most requested service',
+            field='Plumbing',
+            price_per_hour=50.00,
+            company=self.company,
+            status='approved'
+        )
+
+    def tearDown(self):
+        cache.clear()
+
+    def test_warm_home_page_does_not_query_database(self):
+        """Test anonymous home page views are served from the cache once warm"""
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Popular Service')
+
+    def test_new_service_invalidates_featured_services(self):
+        """Test saving a service refreshes the cached featured services"""
+        self.client.get(reverse('home'))
+        Service.objects.create(
+            name='Brand New Service',
+            description='Just approved',
+            field='Plumbing',
+            price_per_hour=40.00,
+            company=self.company,
+            status='approved'
+        )
+        response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Brand New Service')
+
+    def test_new_requests_invalidate_stats(self):
+        """Test creating service requests refreshes the cached request count"""
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['stats']['requests'], '1+')
+        for i in range(10):
+            ServiceRequest.objects.create(
+                service=self.service,
+                customer=self.customer,
+                address=f'{i} Test St',
+                service_time_hours=1
+            )
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['stats']['requests'], '10+')
+
+    def test_login_does_not_invalidate_cache(self):
+        """Test last_login updates leave the cached stats in place"""
+        self.client.get(reverse('home'))
+        self.client.login(username='customer@test.com', password='testpass123')
+        self.assertIsNotNone(cache.get('home:stats'))
+
+    @override_settings(HOME_CACHE_TIMEOUT=0)
+    def test_zero_timeout_disables_cache(self):
+        """Test HOME_CACHE_TIMEOUT=0 counts on every request and stores nothing"""
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(cache.get('home:stats'))
+        self.assertIsNone(cache.get('home:featured_services'))
+
 class ErrorPageTests(TestCase):
     def setUp(self):
         self.client = Client()
@@ -214,3 +323,400 @@ class SecurityTests(TestCase):
         self.client.login(username='company@test.com', password='testpass123')
         response = self.client.get(reverse('request_service', kwargs={'service_id': self.service.pk}))
         self.assertEqual(response.status_code, 302)  # Redirect to home
+
+class StubPool:
+    def get_stats(self):
+        return {'pool_min': 2, 'pool_max': 10, 'pool_size': 6, 'pool_available': 1, 'requests_waiting': 3}
+
+class DatabasePoolStatsTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.staff = User.objects.create_user(
+            username='staff',
+            email='staff@test.com',
+            password='testpass123',
+            is_staff=True
+        )
+
+    def test_pool_stats_require_staff(self):
+        """Test pool stats are hidden from anonymous visitors"""
+        response = self.client.get(reverse('db_pool_stats'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_unpooled_database_reported(self):
+        """Test databases without a pool are reported as unpooled"""
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('db_pool_stats'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['databases']['default'], {'pooled': False})
+
+    def test_saturation_computed_from_pool_counters(self):
+        """Test saturation is the share of the maximum pool size checked out"""
+        connection.pool = StubPool()
+        self.addCleanup(delattr, connection, 'pool')
+        stats = pool_stats()['databases']['default']
+        self.assertEqual(stats['in_use'], 5)
+        self.assertEqual(stats['saturation'], 0.5)
+        self.assertEqual(stats['requests_waiting'], 3)
+
+    def test_check_warns_on_persistent_connections_with_async_views(self):
+        """Test the system check flags CONN_MAX_AGE under ASGI, where it leaks a connection per request"""
+        with patch.dict(settings.DATABASES['default'], {'CONN_MAX_AGE': 60}):
+            with override_settings(ASYNC_VIEWS=True):
+                self.assertEqual(
+                    [warning.id for warning in async_persistent_connections_check(None)], ['xpertshub_app.W001']
+                )
+            with override_settings(ASYNC_VIEWS=False):
+                self.assertEqual(async_persistent_connections_check(None), [])
+
+@override_settings(
+    DATABASE_ROUTERS=['xpertshub.replica.ReplicaRouter'],
+    MIDDLEWARE=['xpertshub.replica.ReplicaPinMiddleware', *settings.MIDDLEWARE],
+)
+class ReplicaRoutingTests(TestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.client = Client()
+        self.company = User.objects.create_user(
+            username='company',
+            email='company@test.com',
+            password='testpass123',
+            user_type='company',
+            field_of_work='Plumbing'
+        )
+        self.customer = User.objects.create_user(
+            username='customer',
+            email='customer@test.com',
+            password='testpass123',
+            user_type='customer'
+        )
+        # The test databases are independent, so each service shows which one a page read
+        self.primary_service = Service.objects.create(
+            name='Primary Pipes',
+            description='Only on the primary',
+            field='Plumbing',
+            price_per_hour=50.00,
+            company=self.company,
+            status='approved'
+        )
+        replica_company = User.objects.db_manager('replica').create_user(
+            username='replica_company',
+            email='replica@test.com',
+            password='testpass123',
+            user_type='company',
+            field_of_work='Plumbing'
+        )
+        Service.objects.using('replica').create(
+            name='Replica Pipes',
+            description='Only on the replica',
+            field='Plumbing',
+            price_per_hour=50.00,
+            company=replica_company,
+            status='approved'
+        )
+
+    def test_catalog_reads_from_replica(self):
+        """Test listings marked with replica_reads are served from the replica"""
+        response = self.client.get(reverse('all_services'))
+        self.assertContains(response, 'Replica Pipes')
+        self.assertNotContains(response, 'Primary Pipes')
+
+    def test_unmarked_views_read_from_primary(self):
+        """Test views without replica_reads keep reading the primary"""
+        self.client.force_login(self.customer)
+        response = self.client.get(reverse('rate_service', kwargs={'service_id': self.primary_service.pk}))
+        self.assertEqual(response.status_code, 200)
+
+    def test_write_pins_next_requests_to_primary(self):
+        """Test a browser that just wrote reads its own write on the next page"""
+        self.client.force_login(self.customer)
+        response = self.client.post(
+            reverse('rate_service', kwargs={'service_id': self.primary_service.pk}),
+            {'rating': 5, 'review': 'Fresh review'},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        response = self.client.get(response.url)
+        self.assertContains(response, 'Fresh review')
+
+    def test_reads_outside_requests_use_primary(self):
+        """Test management commands and workers never read the replica"""
+        router = ReplicaRouter()
+        self.assertIsNone(router.db_for_read(Service))
+        self.assertFalse(router.allow_migrate('replica', 'services'))
+        self.assertTrue(router.allow_migrate('default', 'services'))
+
+@override_settings(SQL_PROFILING=True, SQL_PROFILING_SLOWEST=2)
+class SQLProfilingTests(TestCase):
+    def setUp(self):
+        profiling._slowest.clear()
+        self.addCleanup(profiling._slowest.clear)
+        self.client = Client()
+        self.company = User.objects.create_user(
+            username='company',
+            email='company@test.com',
+            password='testpass123',
+            user_type='company',
+            field_of_work='Plumbing'
+        )
+        Service.objects.create(
+            name='Pipe Repair',
+            description='Fixing leaking pipes',
+            field='Plumbing',
+            price_per_hour=50.00,
+            company=self.company,
+            status='approved'
+        )
+
+    def test_server_timing_header(self):
+        """Test responses report query count, SQL, template and total time"""
+        response = self.client.get(reverse('all_services'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'sql;dur=[\d.]+;desc="\d+ queries, 0 duplicate"')
+        self.assertRegex(timing, r'tpl;dur=[\d.]+')
+        self.assertRegex(timing, r'total;dur=[\d.]+')
+        self.assertNotIn('desc="0 queries', timing)
+
+    @override_settings(SQL_PROFILING=False)
+    def test_disabled_profiling_leaves_responses_alone(self):
+        """Test the middleware drops out of the chain when profiling is off"""
+        response = self.client.get(reverse('all_services'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+    def test_duplicates_and_repeated_shapes(self):
+        """Test identical statements count as duplicates and IN lists share a shape"""
+        profile = profiling.RequestProfile()
+        execute = lambda sql, params, many, context: None
+        profile(execute, 'SELECT * FROM t WHERE id = %s', (1,), False, {})
+        profile(execute, 'SELECT * FROM t WHERE id = %s', (1,), False, {})
+        profile(execute, 'SELECT * FROM t WHERE id = %s', (2,), False, {})
+        profile(execute, 'SELECT * FROM t WHERE id IN (%s, %s)', (1, 2), False, {})
+        profile(execute, 'SELECT * FROM t WHERE id IN (%s)', (3,), False, {})
+        self.assertEqual(profile.queries, 5)
+        self.assertEqual(profile.duplicates, 1)
+        self.assertEqual(profile.repeated_shapes(), [
+            ('SELECT * FROM t WHERE id = %s', 3),
+            ('SELECT * FROM t WHERE id IN (%s, ...)', 2),
+        ])
+
+    def test_async_requests_profiled_without_thread_adaptation(self):
+        """Test async views keep their event loop and queries run through sync_to_async are profiled"""
+        middleware = profiling.SQLProfilingMiddleware(count_users_async)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get('/'))
+        self.assertIn('desc="1 queries, 0 duplicate"', response['Server-Timing'])
+
+    def test_slowest_requests_logged(self):
+        """Test each request that ranks among the slowest is logged and kept"""
+        with self.assertLogs('xpertshub.profiling', 'WARNING') as logs:
+            self.client.get(reverse('all_services'))
+            self.client.get(reverse('about'))
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn('Slow request GET /services/', logs.output[0])
+        self.assertEqual(len(profiling.slowest_requests()), 2)
+
+@override_settings(METRICS_ENABLED=True, METRICS_TOKEN='')
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_request_latency_and_queries_by_url_name(self):
+        """Test requests are timed and their queries counted under the route's URL name"""
+        before = self.sample('xpertshub_request_duration_seconds_count', view='all_services', method='GET')
+        queries_before = self.sample('xpertshub_db_queries_total', view='all_services', database='default')
+        self.client.get(reverse('all_services'))
+        self.assertEqual(
+            self.sample('xpertshub_request_duration_seconds_count', view='all_services', method='GET'), before + 1
+        )
+        self.assertGreater(self.sample('xpertshub_db_queries_total', view='all_services', database='default'), queries_before)
+
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'xpertshub_request_duration_seconds_bucket{', response.content)
+        self.assertIn(b'view="all_services"', response.content)
+        self.assertIn(b'xpertshub_db_queries_total{', response.content)
+
+    def test_unmatched_and_admin_routes_share_labels(self):
+        """Test 404s and admin pages do not create a label per path"""
+        before = self.sample('xpertshub_requests_total', view='unmatched', method='GET', status='4xx')
+        self.client.get('/no-such-page/')
+        self.assertEqual(self.sample('xpertshub_requests_total', view='unmatched', method='GET', status='4xx'), before + 1)
+
+        before = self.sample('xpertshub_request_duration_seconds_count', view='admin', method='GET')
+        self.client.get('/admin/login/')
+        self.assertEqual(self.sample('xpertshub_request_duration_seconds_count', view='admin', method='GET'), before + 1)
+
+    def test_async_requests_counted_without_thread_adaptation(self):
+        """Test async views keep their event loop and queries run through sync_to_async are counted"""
+        middleware = metrics.MetricsMiddleware(count_users_async)
+        self.assertTrue(iscoroutinefunction(middleware))
+        before = self.sample('xpertshub_db_queries_total', view='unmatched', database='default')
+        async_to_sync(middleware)(RequestFactory().get('/'))
+        self.assertEqual(self.sample('xpertshub_db_queries_total', view='unmatched', database='default'), before + 1)
+
+    def test_email_sends_are_counted(self):
+        """Test outbox deliveries record their outcome and latency"""
+        before = self.sample('xpertshub_emails_total', channel='outbox', outcome='success')
+        timed = self.sample('xpertshub_email_send_duration_seconds_count', channel='outbox')
+        EmailOutbox.objects.create(to_email='customer@test.com', subject='Subject', html_message='<p>Hello</p>')
+        drain()
+        self.assertEqual(self.sample('xpertshub_emails_total', channel='outbox', outcome='success'), before + 1)
+        self.assertEqual(self.sample('xpertshub_email_send_duration_seconds_count', channel='outbox'), timed + 1)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_token_required_when_configured(self):
+        """Test scrapes without the bearer token are rejected"""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 401)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled_metrics(self):
+        """Test the endpoint is hidden and requests go untimed when metrics are off"""
+        before = self.sample('xpertshub_request_duration_seconds_count', view='about', method='GET')
+        self.client.get(reverse('about'))
+        self.assertEqual(self.sample('xpertshub_request_duration_seconds_count', view='about', method='GET'), before)
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+    def test_multiprocess_registry(self):
+        """Test a shared metrics directory switches the endpoint to the multiprocess collector"""
+        with tempfile.TemporaryDirectory() as metrics_dir, patch.dict(os.environ, PROMETHEUS_MULTIPROC_DIR=metrics_dir):
+            self.assertIsNot(metrics.registry(), REGISTRY)
+        self.assertIs(metrics.registry(), REGISTRY)
+
+class SlowQueryTests(TestCase):
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.log_dir, ignore_errors=True)
+        slow_queries.clear()
+        self.addCleanup(slow_queries.clear)
+        # Every query counts as slow, and every SELECT is explained
+        self.enterContext(override_settings(
+            SLOW_QUERY_MS=0.0001,
+            SLOW_QUERY_EXPLAIN_RATE=1.0,
+            SLOW_QUERY_LOG=os.path.join(self.log_dir, 'slow.log'),
+        ))
+        self.client = Client()
+        company = User.objects.create_user(
+            username='company',
+            email='company@test.com',
+            password='testpass123',
+            user_type='company',
+            field_of_work='Plumbing'
+        )
+        Service.objects.create(
+            name='Pipe Repair',
+            description='Fixing leaking pipes',
+            field='Plumbing',
+            price_per_hour=50.00,
+            company=company,
+            status='approved'
+        )
+
+    def test_async_requests_captured_without_thread_adaptation(self):
+        """Test async views keep their event loop and queries run through sync_to_async are recorded"""
+        middleware = slow_queries.SlowQueryMiddleware(count_users_async)
+        self.assertTrue(iscoroutinefunction(middleware))
+        async_to_sync(middleware)(RequestFactory().get('/?search=pipes'))
+        self.assertEqual([(entry['path'], entry['filters']) for entry in slow_queries.recent()], [('/', ['search'])])
+
+    def test_records_view_filters_template_and_plan(self):
+        """Test slow queries are recorded with their caller and a sampled plan"""
+        self.client.get(reverse('all_services') + '?sort=price_low&category=Plumbing&search=pipe')
+        entries = slow_queries.recent()
+        self.assertTrue(entries)
+        self.assertEqual({entry['view'] for entry in entries}, {'all_services'})
+        self.assertEqual(entries[0]['filters'], ['category', 'search', 'sort'])
+        rendered = [entry for entry in entries if entry['template'] == 'services/all_services.html']
+        self.assertTrue(rendered)
+        self.assertTrue(all(entry['plan'] for entry in entries if entry['fingerprint'].startswith('SELECT')))
+        self.assertEqual(len(slow_queries.read_log()), len(entries))
+
+    def test_writes_are_never_explained(self):
+        """Test EXPLAIN is only run for SELECTs, since EXPLAIN ANALYZE executes the statement"""
+        capture = slow_queries.SlowQueryCapture(RequestFactory().get('/'))
+        with connection.execute_wrapper(capture):
+            Service.objects.filter(name='Pipe Repair').update(price_per_hour=60)
+        writes = [
+            entry for entry in slow_queries.recent()
+            if not entry['fingerprint'].startswith('SELECT')
+        ]
+        self.assertTrue(writes)
+        self.assertTrue(all(entry['plan'] is None for entry in writes))
+
+    def test_threshold_filters_fast_queries(self):
+        """Test queries under the threshold are not recorded"""
+        with override_settings(SLOW_QUERY_MS=60000):
+            Client().get(reverse('all_services'))
+        self.assertEqual(slow_queries.recent(), [])
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_disabled_capture(self):
+        """Test the middleware drops out when no threshold is set"""
+        self.client.get(reverse('all_services'))
+        self.assertEqual(slow_queries.recent(), [])
+
+    def test_command_summarizes_worst_offenders(self):
+        """Test slow_queries ranks shapes and lists the filter combinations behind them"""
+        self.client.get(reverse('all_services') + '?sort=price_low')
+        self.client.get(reverse('all_services') + '?category=Plumbing&max_price=80')
+        out = StringIO()
+        call_command('slow_queries', '--plans', '--clear', stdout=out)
+        output = out.getvalue()
+        self.assertIn('slow queries in', output)
+        self.assertIn('view=all_services filters=sort', output)
+        self.assertIn('view=all_services filters=category,max_price', output)
+        self.assertIn('plan (', output)
+        self.assertEqual(slow_queries.read_log(), [])
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TokenBucketTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_check_warns_on_per_process_cache(self):
+        """Test the system check flags rate limits kept separately by every worker"""
+        self.assertEqual([warning.id for warning in rate_limit_cache_check(None)], ['xpertshub_app.W002'])
+        with override_settings(RATE_LIMITS={'login': {'ip': '', 'identifier': ''}}):
+            self.assertEqual(rate_limit_cache_check(None), [])
+
+    def test_burst_then_refill(self):
+        """Test a full bucket allows its capacity at once, then one attempt per refill interval"""
+        limit = ratelimit.parse_limit('3/0.3')
+        self.assertEqual([ratelimit.consume('bucket', limit) for _ in range(3)], [0, 0, 0])
+        wait = ratelimit.consume('bucket', limit)
+        self.assertTrue(0 < wait <= 0.1)
+        time.sleep(0.11)
+        self.assertEqual(ratelimit.consume('bucket', limit), 0)
+        self.assertTrue(ratelimit.consume('bucket', limit))
+
+    def test_idle_credit_is_capped(self):
+        """Test an idle bucket refills to its capacity and no further"""
+        limit = ratelimit.parse_limit('2/0.2')
+        ratelimit.consume('bucket', limit)
+        time.sleep(0.5)
+        self.assertEqual([ratelimit.consume('bucket', limit) for _ in range(2)], [0, 0])
+        self.assertTrue(ratelimit.consume('bucket', limit))
+
+    def test_refused_attempts_do_not_spend_tokens(self):
+        """Test hammering an empty bucket does not push its refill further out"""
+        limit = ratelimit.parse_limit('1/0.1')
+        ratelimit.consume('bucket', limit)
+        for _ in range(20):
+            ratelimit.consume('bucket', limit)
+        time.sleep(0.11)
+        self.assertEqual(ratelimit.consume('bucket', limit), 0)
+
+    @override_settings(RATE_LIMIT_PROXY_COUNT=1)
+    def test_client_ip_behind_proxy(self):
+        """Test the address appended by the trusted proxy is used, not one the client forged"""
+        request = RequestFactory().post('/', HTTP_X_FORWARDED_FOR='6.6.6.6, 203.0.113.7', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(ratelimit.client_ip(request), '203.0.113.7')
+        with self.settings(RATE_LIMIT_PROXY_COUNT=0):
+            self.assertEqual(ratelimit.client_ip(request), '10.0.0.1')
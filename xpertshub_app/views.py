@@ -1,43 +1,55 @@
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.views import LogoutView
 from django.contrib.auth import logout
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
 from django.shortcuts import render, redirect
+from django.template.response import TemplateResponse
 from django.urls import reverse_lazy
-from services.views import get_most_requested_services
-from users.models import User
-from services.models import Service, ServiceRequest
+from services.page_cache import cache_anonymous_page
+from xpertshub import metrics as prometheus_metrics
+from .db_pool import pool_stats
+from .stats import aget_featured_services, aget_home_stats, get_featured_services, get_home_stats
 
 # Create your views here.
 
-def format_stat(count):
-    """Format statistics with + suffix"""
-    if count < 10:
-        return "1+"
-    elif count < 100:
-        return f"{(count // 10) * 10}+"
-    else:
-        return f"{(count // 100) * 100}+"
-
+@cache_anonymous_page('home')
 def home(request):
-    # Get database stats
-    company_count = User.objects.filter(user_type='company').count()
-    customer_count = User.objects.filter(user_type='customer').count()
-    service_count = Service.objects.filter(status='approved').count()
-    request_count = ServiceRequest.objects.count()
-    
     context = {
-        'featured_services': get_most_requested_services(),
-        'stats': {
-            'providers': format_stat(company_count),
-            'customers': format_stat(customer_count),
-            'services': format_stat(service_count),
-            'requests': format_stat(request_count)
-        }
+        'featured_services': get_featured_services(),
+        'stats': get_home_stats(),
     }
     return render(request, 'xpertshub_app/home.html', context)
 
+@cache_anonymous_page('home')
+async def async_home(request):
+    """home for ASGI deployments, loading stats and featured services with the async ORM"""
+    context = {
+        'featured_services': await aget_featured_services(),
+        'stats': await aget_home_stats(),
+    }
+    # Rendered by the handler off the event loop, where the navbar may still touch the database
+    return TemplateResponse(request, 'xpertshub_app/home.html', context)
+
 def about(request):
     return render(request, 'xpertshub_app/about.html')
 
+@staff_member_required
+def db_pool_stats(request):
+    """Database connection pool saturation for the worker serving this request"""
+    return JsonResponse(pool_stats())
+
+def metrics(request):
+    """Prometheus exposition of every worker's metrics, summed when running multiprocess"""
+    if not settings.METRICS_ENABLED:
+        raise Http404
+    token = settings.METRICS_TOKEN
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+    body, content_type = prometheus_metrics.render()
+    return HttpResponse(body, content_type=content_type)
+
 class UserLogoutView(LogoutView):
     http_method_names = ['get', 'post']
     